@@ -11,22 +11,244 @@ class Config:
     # --- Model Configuration ---
     MODEL_NAME = "ministral-3:3b-cloud"  # Local Ollama model
     TEMPERATURE = 0
-    OLLAMA_BASE_URL = "http://172.22.124.89:11434/api/generate"
-    
+    OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://172.22.124.89:11434")
+
+    # --- Ollama Endpoint Pool ---
+    # Comma-separated OLLAMA_BASE_URLS spreads LLM calls over several hosts: each
+    # call goes to the least-loaded healthy host that has the model, and calls of
+    # one conversation thread stay on the same host while it is not much busier
+    # than the rest. LLM_MAX_IN_FLIGHT and LLM_LANE_CAPS stay process-wide, so
+    # raise them with the number of hosts.
+    OLLAMA_BASE_URLS = [u.strip() for u in os.getenv("OLLAMA_BASE_URLS", "").split(",") if u.strip()] or [OLLAMA_BASE_URL]
+    OLLAMA_PROBE_INTERVAL_SECONDS = 15.0  # GET /api/tags health probe of every host
+    OLLAMA_PROBE_TIMEOUT_SECONDS = 3.0
+    OLLAMA_EJECT_AFTER_FAILURES = 2       # Consecutive failed calls that eject a host (one failed probe does)
+    OLLAMA_EJECT_SECONDS = 30.0           # Ejected hosts get no calls until re-probed after this
+    OLLAMA_STICKY_SLACK = 1               # Extra outstanding calls tolerated on a thread's host before spilling
+
+    # --- Per-node Model Cascade ---
+    # Models per LLM role, smallest first. Routing-type calls try the small model
+    # and escalate to the next one only if its answer does not parse or is missing
+    # or contradicting its routing fields. With the cascade off, each role uses
+    # the last model of its list.
+    # SMALL_MODEL_NAME is opt-in: unset, every role uses MODEL_NAME alone, so a stock
+    # install makes no calls to a model it never pulled.
+    SMALL_MODEL_NAME = os.getenv("SMALL_MODEL_NAME", "")
+    _SMALL_THEN_MAIN = [SMALL_MODEL_NAME, MODEL_NAME] if SMALL_MODEL_NAME else [MODEL_NAME]
+    MODEL_CASCADE_ENABLED = True
+    NODE_MODELS = {
+        "intent": _SMALL_THEN_MAIN,
+        "planner": _SMALL_THEN_MAIN,
+        "gap_analysis": _SMALL_THEN_MAIN,
+        "clarify": _SMALL_THEN_MAIN,
+        "quick": [MODEL_NAME],
+        "synthesis_map": _SMALL_THEN_MAIN,
+        "synthesis": [MODEL_NAME],
+    }
+
+    # --- LLM Client Registry ---
+    # All roles share one keep-alive HTTP pool per host and one in-flight limit.
+    LLM_MAX_IN_FLIGHT = 4                # Concurrent Ollama requests across all sessions
+    LLM_HTTP_POOL_SIZE = 8               # Keep-alive connections per host
+    LLM_REQUEST_TIMEOUT_SECONDS = 300.0
+    LLM_ROLE_OPTIONS = {}                # Per-role ChatOllama overrides, e.g. {"planner": {"num_predict": 16}}
+
+    # --- LLM Priority Lanes ---
+    # Free slots go to the highest-priority waiting lane (interactive > routing >
+    # research > background); each LLM_LANE_AGING_SECONDS of waiting raises a
+    # request by one lane so none starves. Caps bound each lane's share of the
+    # LLM_MAX_IN_FLIGHT slots.
+    LLM_LANE_CAPS = {"interactive": 4, "routing": 3, "research": 3, "background": 1}
+    LLM_LANE_AGING_SECONDS = 5.0
+    LLM_ROLE_LANES = {                   # Default lane of a role when a call is not tagged
+        "quick": "interactive",
+        "clarify": "interactive",
+        "intent": "routing",
+        "planner": "routing",
+        "gap_analysis": "research",
+        "synthesis_map": "research",
+        "synthesis": "research",
+        "warmup": "background",
+    }
+
+    # --- Model Warm-up / Keep-alive ---
+    # build_agent() preloads every configured model in the background and a keeper
+    # thread reloads any that Ollama evicted; every call also renews keep_alive.
+    OLLAMA_WARMUP_ENABLED = True
+    OLLAMA_KEEP_ALIVE = "30m"            # How long Ollama keeps a model resident after a call
+    OLLAMA_KEEPALIVE_INTERVAL_SECONDS = 300
+    OLLAMA_WARMUP_PRIME_PREFIX = True    # Also evaluate the triage system prompt so the first query reuses it
+
     # --- API Keys ---
     # Ensure these are set in your .env file
     TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
     
     # --- Phase 1: Budget & Constraints ---
     # These values define the 'Guard Layer' limits
-    MAX_TOKENS_PER_QUERY = 5000 
+    MAX_TOKENS_PER_QUERY = 16000  # Prompt + completion tokens of every LLM call in one run
+    TOKEN_BUDGET_SYNTHESIS_RESERVE = 4000  # Deep iterations stop once fewer tokens remain
+    SYNTHESIS_OUTPUT_RESERVE_TOKENS = 1500  # Kept free for the report when sizing its evidence
+    COMPLETION_TOKEN_CAP = 4096   # num_predict ceiling; lowered as the budget runs out
+    MIN_COMPLETION_TOKENS = 256   # num_predict floor
+    # Opt-in tiktoken encoding (e.g. "cl100k_base") for counts when Ollama reports no usage;
+    # unset, tokens are estimated from length. tiktoken is not a dependency, and it downloads
+    # an encoding on first use unless TIKTOKEN_CACHE_DIR already holds it.
+    TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "")
     MAX_ITERATIONS_DEEP_MODE = 3  # Max loops for research
     CONFIDENCE_THRESHOLD = 0.8    # Minimum confidence to stop deep research
+
+    # --- Phase 1/2: Pre-Processing ---
+    # One LLM call returns intent, clarity and quick/deep mode. False = the
+    # original intent_orchestrator -> planner_router two-call path.
+    FUSED_PREPROCESSING_ENABLED = True
+
+    # Local kNN fast path: a first-turn query is labelled from its nearest earlier
+    # LLM-labelled queries (Qdrant collection) when they are close and agree.
+    INTENT_KNN_ENABLED = True
+    INTENT_KNN_COLLECTION = "intent_examples"
+    INTENT_KNN_K = 5
+    INTENT_KNN_MIN_SIMILARITY = 0.85   # Cosine similarity for a neighbour to count
+    INTENT_KNN_MIN_AGREEMENT = 0.8     # Similarity-weighted share of neighbours that must agree
+    INTENT_KNN_MIN_NEIGHBOURS = 3      # Fewer is enough only for a near-identical query
+
+    # --- Phase 3: Deep Research Search Fan-out ---
+    # When enabled, each gap becomes its own sub-query and all sub-queries
+    # of an iteration are searched concurrently.
+    DEEP_FANOUT_ENABLED = True
+    DEEP_FANOUT_MAX_SUBQUERIES = 4     # Sub-queries issued per iteration
+    DEEP_FANOUT_MAX_CONCURRENCY = 3    # Searches in flight at once
+    DEEP_FANOUT_DEDUP_THRESHOLD = 0.8  # Jaccard similarity to skip a repeated sub-query
+
+    # Drops results already seen in the run (canonical URL or SimHash near-match)
+    EVIDENCE_DEDUP_ENABLED = True
+    EVIDENCE_DEDUP_MAX_DISTANCE = 6    # Max differing SimHash bits (of 64) for a near-duplicate
     
+    # --- Gap Analysis Evidence Digest ---
+    # Gap analysis sees an extractive digest (sentences most relevant to the query
+    # and open gaps) instead of the first 5000 raw characters.
+    GAP_ANALYSIS_COMPRESSION_ENABLED = True
+    GAP_ANALYSIS_DIGEST_CHARS = 1500
+    COMPRESSION_CENTRALITY_WEIGHT = 0.3  # Share of TextRank centrality vs. relevance
+
+    # --- Gap Analysis Routing ---
+    # Streams the gap check and stops generation as soon as the score (and, below
+    # CONFIDENCE_THRESHOLD, the gap list) has been parsed; trailing prose is not awaited.
+    GAP_ANALYSIS_EARLY_STOP = True
+
+    # --- Phase 4: Synthesis ---
+    SYNTHESIS_CONTEXT_CHARS = 9000       # Evidence budget of the synthesis prompt
+    # Splits evidence into passages, ranks them against the query and open gaps,
+    # and packs the best ones into the budget instead of truncating.
+    PASSAGE_RERANK_ENABLED = True
+    PASSAGE_MAX_CHARS = 800
+    PASSAGE_GAP_WEIGHT = 0.5             # Weight of the best gap match vs. the query match
+    PASSAGE_CROSS_ENCODER_MODEL = None   # e.g. "Xenova/ms-marco-MiniLM-L-6-v2" for a local re-rank
+    # Map-reduce: when the evidence exceeds one synthesis prompt, each source (or
+    # cluster of small sources) is condensed concurrently into a citation-keeping
+    # note, and the report is written from the notes instead of truncated evidence.
+    SYNTHESIS_MAP_REDUCE_ENABLED = True
+    SYNTHESIS_MAP_CHUNK_CHARS = 6000     # Evidence per note call
+    SYNTHESIS_MAP_CONCURRENCY = 4        # Note calls in flight (also bounded by the research lane cap)
+    SYNTHESIS_NOTE_TOKENS = 300          # num_predict of one note
+    # Section-parallel: the body sections are written concurrently from the same
+    # evidence and streamed in document order; the executive summary is written
+    # last from them. Costs the evidence once per section, so it is used only
+    # when the remaining token budget covers that.
+    SYNTHESIS_SECTION_PARALLEL_ENABLED = False
+    # Registers every web source under a compact ID (S1, S2, ...) during search; the
+    # report cites the IDs and the Evidence Trace is rendered from the registry
+    # instead of being typed out (and possibly invented) by the LLM.
+    SOURCE_REGISTRY_ENABLED = True
+
+    # --- Prompt Context Packing ---
+    # Token budgets for the variable part of each node's prompt (query, history,
+    # evidence), packed on sentence / block boundaries. Also bounded by the model's
+    # context window (minus MIN_COMPLETION_TOKENS).
+    MODEL_CONTEXT_WINDOWS = {"default": 8192}
+    CONTEXT_TOKEN_BUDGETS = {
+        "intent_orchestrator": 1500,
+        "planner": 800,
+        "quick_mode": 3000,
+        "gap_analysis": 1500,
+        "synthesize": 3500,
+        "clarify_user": 600,
+        "memory": 600,           # Report excerpt saved to long-term memory
+    }
+
+    # --- Embeddings (FastEmbed, same default model as Qdrant memory) ---
+    EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+
     # --- Path Configuration ---
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     QDRANT_PATH = os.path.join(BASE_DIR, "qdrant_db")
     OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+    CACHE_DIR = os.path.join(BASE_DIR, "cache")
+
+    # --- Search Providers ---
+    # With a Tavily key, DuckDuckGo is kept as a hedge: it is also queried when
+    # Tavily has not answered within its own SEARCH_HEDGE_PERCENTILE latency.
+    SEARCH_HEDGING_ENABLED = True
+    SEARCH_HEDGE_PERCENTILE = 90
+    SEARCH_HEDGE_DEFAULT_DELAY_SECONDS = 2.0  # Used until enough latency samples exist
+    SEARCH_TIMEOUT_SECONDS = 20.0
+    SEARCH_BREAKER_FAILURE_THRESHOLD = 3      # Consecutive failures before a provider is skipped
+    SEARCH_BREAKER_COOLDOWN_SECONDS = 60.0
+    SEARCH_SLOW_CALL_SECONDS = 10.0           # Slower answers count as failures
+
+    # Process-wide token buckets per provider, shared by all sessions/threads.
+    # 'rate_per_second' is the sustained rate, 'burst' the bucket size.
+    SEARCH_RATE_LIMIT_ENABLED = True
+    SEARCH_RATE_LIMITS = {
+        "tavily": {"rate_per_second": 2.0, "burst": 5},
+        "duckduckgo": {"rate_per_second": 0.5, "burst": 3},
+    }
+    SEARCH_RATE_LIMIT_DEFAULT = {"rate_per_second": 1.0, "burst": 3}
+    SEARCH_RATE_LIMIT_MAX_WAIT_SECONDS = 15.0  # Queue wait before a search gives up
+
+    # --- Local Document Corpus ---
+    # "off" = web only, "only" = local corpus only, "mixed" = local hits first, then web
+    LOCAL_CORPUS_MODE = os.getenv("LOCAL_CORPUS_MODE", "off")
+    LOCAL_CORPUS_DIR = os.getenv("LOCAL_CORPUS_DIR")  # Re-indexed incrementally on first search
+    LOCAL_CORPUS_COLLECTION = "local_corpus"
+    LOCAL_CORPUS_EXTENSIONS = (".md", ".markdown", ".txt", ".rst", ".py", ".js", ".ts", ".go",
+                               ".java", ".rs", ".yaml", ".yml", ".toml", ".json", ".sql")
+    LOCAL_CORPUS_MAX_RESULTS = 3
+
+    # --- Search Record / Replay ---
+    # "record" wraps the real provider and writes every query -> results pair to a
+    # cassette; "replay" serves the cassette with no network. None = normal search.
+    SEARCH_RECORD_REPLAY_MODE = os.getenv("SEARCH_RECORD_REPLAY_MODE") or None
+    SEARCH_CASSETTE_NAME = os.getenv("SEARCH_CASSETTE_NAME", "default")
+    SEARCH_CASSETTE_DIR = os.path.join(BASE_DIR, "cassettes")
+    SEARCH_REPLAY_LATENCY = None  # None = instant, seconds as float, or "recorded"
+
+    # --- Search Result Cache ---
+    SEARCH_CACHE_ENABLED = True
+    SEARCH_CACHE_PATH = os.path.join(CACHE_DIR, "search_cache.sqlite")
+    SEARCH_CACHE_TTL_SECONDS = 24 * 60 * 60
+    SEARCH_CACHE_MAX_ENTRIES = 5000
+
+    # --- LLM Response Cache (intent classification and quick/deep planning) ---
+    # Exact tier: same model parameters and prompt. Semantic tier: same earlier
+    # history and a query embedding at least this cosine-similar to a cached one.
+    LLM_CACHE_ENABLED = True
+    LLM_CACHE_PATH = os.path.join(CACHE_DIR, "llm_cache.sqlite")
+    LLM_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+    LLM_CACHE_MAX_ENTRIES = 10000
+    LLM_CACHE_SEMANTIC_ENABLED = True
+    LLM_CACHE_SEMANTIC_THRESHOLD = 0.95
+
+    # --- Page Fetch Stage (Deep Mode) ---
+    # Fetches the top result pages of each search and adds their main text
+    # to the evidence instead of only the provider snippets.
+    PAGE_FETCH_ENABLED = False
+    PAGE_FETCH_TOP_N = 2                 # Pages fetched per sub-query
+    PAGE_FETCH_MAX_CONCURRENCY = 4
+    PAGE_FETCH_MAX_BYTES = 1_000_000     # Body size cap per page
+    PAGE_FETCH_TIMEOUT_SECONDS = 5.0     # Time cap per page
+    PAGE_FETCH_MAX_CHARS = 3000          # Extracted text kept per page
+    PAGE_CACHE_DIR = os.path.join(CACHE_DIR, "pages")
+    PAGE_CACHE_TTL_SECONDS = 24 * 60 * 60
 
     @staticmethod
     def validate():
@@ -36,4 +258,5 @@ class Config:
             
 # Create directories if they don't exist
 os.makedirs(Config.QDRANT_PATH, exist_ok=True)
-os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
\ No newline at end of file
+os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
+os.makedirs(Config.CACHE_DIR, exist_ok=True)
\ No newline at end of file
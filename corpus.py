@@ -0,0 +1,241 @@
+import hashlib
+import os
+import re
+import sys
+import uuid
+import zlib
+from collections import Counter
+from config import Config
+from qdrant_client.http import models
+from utils.embeddings import embed_texts
+
+DENSE_VECTOR = "dense"
+LEXICAL_VECTOR = "bm25"  # Sparse term weights; Qdrant applies the IDF at query time
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_AVG_TERMS = 150  # Typical terms per chunk, for length normalization
+
+STOPWORDS = frozenset("""
+a about an and are as at be been but by can could do does for from had has have how i if in into is it
+its me my no not of on or our should so than that the their them then there these they this those to
+was we were what when where which while who why will with would you your
+""".split())
+
+
+def lexical_terms(text: str) -> list:
+    """Lower-cased word tokens without stopwords and single characters."""
+    return [t for t in re.findall(r"\w+", text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def bm25_vector(text: str, query: bool = False) -> models.SparseVector:
+    """
+    BM25 term-frequency weights of a chunk (saturated and length-normalized), or
+    unit weights for a query; with the collection's IDF modifier the sparse dot
+    product is the BM25 score.
+    """
+    counts = Counter(lexical_terms(text))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * sum(counts.values()) / BM25_AVG_TERMS)
+    weights = {}
+    for term, tf in counts.items():
+        term_id = zlib.crc32(term.encode("utf-8"))
+        weights[term_id] = weights.get(term_id, 0.0) + (1.0 if query else tf * (BM25_K1 + 1) / (tf + norm))
+    return models.SparseVector(indices=list(weights), values=list(weights.values()))
+
+
+class LocalCorpus:
+    """
+    Indexes a directory of Markdown / text / code files into its own Qdrant
+    collection and serves hybrid (dense vector + BM25 sparse vector) search over it.
+    Re-indexing is incremental: files whose content hash is unchanged are skipped.
+    """
+
+    def __init__(self, client, collection_name: str = "local_corpus", embed_fn=embed_texts):
+        # Shares memory.py's embedded client: a local Qdrant path allows only one client
+        self.client = client
+        self.collection_name = collection_name
+        self.embed_fn = embed_fn
+
+    def _ensure_collection(self, dim: int):
+        if not self.client.collection_exists(self.collection_name):
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                vectors_config={DENSE_VECTOR: models.VectorParams(size=dim, distance=models.Distance.COSINE)},
+                sparse_vectors_config={LEXICAL_VECTOR: models.SparseVectorParams(modifier=models.Modifier.IDF)},
+            )
+
+    def _has_lexical_index(self) -> bool:
+        params = self.client.get_collection(self.collection_name).config.params
+        return LEXICAL_VECTOR in (params.sparse_vectors or {})
+
+    def _indexed_hashes(self) -> dict:
+        """Map of relative path -> content hash for files already in the collection."""
+        if not self.client.collection_exists(self.collection_name):
+            return {}
+        hashes = {}
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=models.Filter(must=[
+                    models.FieldCondition(key="chunk_index", match=models.MatchValue(value=0))
+                ]),
+                with_payload=["path", "content_hash"],
+                limit=256,
+                offset=offset,
+            )
+            for record in records:
+                hashes[record.payload["path"]] = record.payload["content_hash"]
+            if offset is None:
+                return hashes
+
+    def _delete_path(self, rel_path: str):
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter(must=[
+                models.FieldCondition(key="path", match=models.MatchValue(value=rel_path))
+            ])),
+        )
+
+    @staticmethod
+    def chunk_text(text: str, max_chars: int) -> list:
+        """Splits on blank lines (paragraphs / code blocks), falling back to lines."""
+        chunks, current = [], ""
+        for block in re.split(r"\n\s*\n", text):
+            pieces = [block] if len(block) <= max_chars else block.splitlines()
+            for piece in pieces:
+                if current and len(current) + len(piece) + 2 > max_chars:
+                    chunks.append(current)
+                    current = ""
+                current = f"{current}\n\n{piece}" if current else piece[:max_chars]
+        if current.strip():
+            chunks.append(current)
+        return [c for c in chunks if c.strip()]
+
+    def index_directory(self, root: str, extensions=None, max_chunk_chars: int = 1000) -> dict:
+        """
+        Incrementally indexes every matching file under root.
+        Returns counts of indexed, unchanged and removed files.
+        """
+        extensions = tuple(extensions or Config.LOCAL_CORPUS_EXTENSIONS)
+        root = os.path.abspath(root)
+        if self.client.collection_exists(self.collection_name) and not self._has_lexical_index():
+            print(f"⚠️ Corpus: {self.collection_name} predates the BM25 index, rebuilding it")
+            self.client.delete_collection(self.collection_name)
+        indexed_hashes = self._indexed_hashes()
+        seen = set()
+        stats = {"indexed": 0, "unchanged": 0, "removed": 0, "chunks": 0}
+
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".") and d not in ("node_modules", "__pycache__")]
+            for filename in filenames:
+                if not filename.endswith(extensions):
+                    continue
+                path = os.path.join(dirpath, filename)
+                rel_path = os.path.relpath(path, root)
+                seen.add(rel_path)
+                try:
+                    with open(path, "rb") as f:
+                        raw = f.read()
+                except OSError as e:
+                    print(f"⚠️ Corpus: cannot read {path}: {e}")
+                    continue
+
+                content_hash = hashlib.sha256(raw).hexdigest()
+                if indexed_hashes.get(rel_path) == content_hash:
+                    stats["unchanged"] += 1
+                    continue
+
+                chunks = self.chunk_text(raw.decode("utf-8", errors="replace"), max_chunk_chars)
+                if rel_path in indexed_hashes:
+                    self._delete_path(rel_path)
+                if not chunks:
+                    continue
+                vectors = self.embed_fn(chunks)
+                self._ensure_collection(vectors.shape[1])
+                self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=[
+                        models.PointStruct(
+                            id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"{root}/{rel_path}#{i}")),
+                            vector={DENSE_VECTOR: vector.tolist(), LEXICAL_VECTOR: bm25_vector(chunk)},
+                            payload={
+                                "path": rel_path,
+                                "abs_path": path,
+                                "chunk_index": i,
+                                "content_hash": content_hash,
+                                "text": chunk,
+                            },
+                        )
+                        for i, (chunk, vector) in enumerate(zip(chunks, vectors))
+                    ],
+                )
+                stats["indexed"] += 1
+                stats["chunks"] += len(chunks)
+
+        for rel_path in set(indexed_hashes) - seen:
+            self._delete_path(rel_path)
+            stats["removed"] += 1
+
+        print(f"DEBUG: Corpus index of {root}: {stats}")
+        return stats
+
+    def _keyword_hits(self, query: str, candidates: int) -> list:
+        """Best BM25 matches of the query's non-stopword terms."""
+        vector = bm25_vector(query, query=True)
+        if not vector.indices:
+            return []
+        return self.client.query_points(
+            collection_name=self.collection_name,
+            query=vector,
+            using=LEXICAL_VECTOR,
+            limit=candidates,
+            with_payload=True,
+        ).points
+
+    def search(self, query: str, limit: int = 3, candidates: int = 20) -> list:
+        """
+        Hybrid retrieval: dense vector hits and BM25 keyword hits are merged with
+        reciprocal rank fusion. Returns {title, url, content, score} dicts.
+        """
+        if not self.client.collection_exists(self.collection_name):
+            return []
+        if not self._has_lexical_index():
+            print(f"⚠️ Corpus: {self.collection_name} needs re-indexing (python corpus.py <dir>)")
+            return []
+
+        dense = self.client.query_points(
+            collection_name=self.collection_name,
+            query=self.embed_fn([query])[0].tolist(),
+            using=DENSE_VECTOR,
+            limit=candidates,
+            with_payload=True,
+        ).points
+        keyword = self._keyword_hits(query, candidates)
+
+        fused = {}
+        payloads = {}
+        for ranking in (dense, keyword):
+            for rank, point in enumerate(ranking):
+                fused[point.id] = fused.get(point.id, 0.0) + 1.0 / (60 + rank + 1)
+                payloads[point.id] = point.payload
+
+        best = sorted(fused, key=fused.get, reverse=True)[:limit]
+        return [
+            {
+                "title": payloads[pid]["path"],
+                "url": "file://" + payloads[pid]["abs_path"],
+                "content": payloads[pid]["text"],
+                "score": fused[pid],
+            }
+            for pid in best
+        ]
+
+
+if __name__ == "__main__":
+    # Re-index the configured (or given) directory: python corpus.py [path]
+    from memory import memory
+    target = sys.argv[1] if len(sys.argv) > 1 else Config.LOCAL_CORPUS_DIR
+    if not target:
+        print("Usage: python corpus.py <directory>  (or set LOCAL_CORPUS_DIR)")
+        sys.exit(1)
+    LocalCorpus(memory.client, Config.LOCAL_CORPUS_COLLECTION).index_directory(target)
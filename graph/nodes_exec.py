@@ -1,35 +1,222 @@
 # graph/nodes_exec.py
-from langchain_ollama import ChatOllama
 from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage
 from state import AgentState
 from config import Config
 import os
 import re
-from prompts.research_prompts import GAP_ANALYSIS_PROMPT, RESEARCH_SYNTHESIS_PROMPT
-from utils.streaming import get_streaming_buffer
-
-llm = ChatOllama(model=Config.MODEL_NAME)
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from prompts.research_prompts import (
+    CITED_REPORT_SECTIONS, EXECUTIVE_SUMMARY_CITED_PROMPT, EXECUTIVE_SUMMARY_PROMPT, GAP_ANALYSIS_PROMPT,
+    PLANNER_PROMPT, REPORT_SECTIONS, RESEARCH_SYNTHESIS_CITED_PROMPT, RESEARCH_SYNTHESIS_PROMPT,
+    SECTION_CITED_PROMPT, SECTION_PROMPT, SOURCE_NOTE_PROMPT,
+)
+from utils.streaming import OrderedSectionWriter, get_streaming_buffer
+from utils.search_cache import get_search_cache, normalize_query
+from utils.page_fetch import get_page_fetcher
+from utils.hedged_search import HedgedSearch
+from utils.rate_limit import get_rate_limiter
+from utils.evidence_dedup import EvidenceDeduplicator
+from utils.passage_rank import build_ranked_context, get_passage_ranker
+from utils.compression import extractive_digest
+from utils.llm_registry import get_llm
+from utils.endpoint_pool import routing_key
+from utils.llm_cache import cached_invoke
+from utils.stream_json import IncrementalJSONObject
+from utils.context_packer import Segment, context_budget, pack_context, prompt_budget, split_units
+from utils.model_cascade import get_model_cascade, node_models
+from utils.source_registry import SourceRegistry
+from utils.token_budget import (
+    CHARS_PER_TOKEN, budget_exhausted, call_usage, completion_cap, count_message_tokens, count_tokens,
+    record_calls, record_usage, remaining_budget,
+)
 
 # Custom DDG Tool to bypass langchain-community import issues
 from duckduckgo_search import DDGS
 
 class CustomDuckDuckGoSearch:
+    name = "duckduckgo"
+
     def invoke(self, query):
-        try:
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=3))
-                return str(results)
-        except Exception as e:
-            return f"Search error: {e}"
+        with DDGS() as ddgs:
+            return list(ddgs.text(query, max_results=3))
+
+
+class RecordReplaySearch:
+    """
+    Search provider for reproducible runs.
+    - record: forwards to the real provider and writes query -> results (and the
+      observed latency) to a JSON cassette.
+    - replay: answers from the cassette without touching the network, optionally
+      sleeping a fixed time or the recorded latency.
+    """
+    name = "record_replay"
+
+    def __init__(self, mode, cassette_path, inner=None, replay_latency=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown record/replay mode: {mode!r}")
+        if mode == "record" and inner is None:
+            raise ValueError("Record mode needs a real provider to wrap")
+        self.mode = mode
+        self.cassette_path = cassette_path
+        self.inner = inner
+        self.replay_latency = replay_latency
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(cassette_path):
+            with open(cassette_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cassette_path) or ".", exist_ok=True)
+        tmp_path = self.cassette_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.cassette_path)
+
+    def invoke(self, query):
+        key = normalize_query(query)
+        if self.mode == "replay":
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                raise LookupError(f"No cassette entry for {query!r}")
+            self.hits += 1
+            delay = entry.get("latency", 0.0) if self.replay_latency == "recorded" else self.replay_latency
+            if delay:
+                time.sleep(delay)
+            return entry["results"]
+
+        start = time.monotonic()
+        results = self.inner(query)
+        latency = time.monotonic() - start
+        with self._lock:
+            self.entries[key] = {"query": query, "results": results, "latency": round(latency, 4)}
+            self._save()
+        return results
+
+
+class LocalCorpusSearch:
+    """
+    Search provider over the local document corpus (see corpus.py).
+    The configured directory is incrementally re-indexed on first use in the process.
+    """
+    name = "local_corpus"
+
+    def __init__(self, corpus, corpus_dir=None, max_results=3):
+        self.corpus = corpus
+        self.corpus_dir = corpus_dir
+        self.max_results = max_results
+        self._indexed = False
+        self._lock = threading.Lock()
+
+    def invoke(self, query):
+        if self.corpus_dir and not self._indexed:
+            with self._lock:
+                if not self._indexed:
+                    self.corpus.index_directory(self.corpus_dir)
+                    self._indexed = True
+        return self.corpus.search(query, limit=self.max_results)
+
+
+_local_search = None
+_local_search_lock = threading.Lock()
+
+def _get_local_search():
+    """Builds the local corpus provider on first use (it needs the Qdrant memory client)."""
+    global _local_search
+    with _local_search_lock:
+        if _local_search is None:
+            from memory import memory
+            from corpus import LocalCorpus
+            _local_search = LocalCorpusSearch(
+                LocalCorpus(memory.client, Config.LOCAL_CORPUS_COLLECTION),
+                corpus_dir=Config.LOCAL_CORPUS_DIR,
+                max_results=Config.LOCAL_CORPUS_MAX_RESULTS,
+            )
+    return _local_search
+
+
+def _provider_name(tool):
+    """Short provider name used for cache keys and rate limits."""
+    if isinstance(tool, TavilySearchResults):
+        return "tavily"
+    return getattr(tool, "name", type(tool).__name__)
+
+
+def _acquire_search_slot(provider):
+    """
+    Waits for the provider's shared token bucket in the current conversation
+    thread's queue, logging noticeable queueing.
+    """
+    waited = get_rate_limiter(provider).acquire(routing_key())
+    if waited > 0.5:
+        print(f"DEBUG [rate_limit]: Waited {waited:.2f}s for a {provider} search slot")
+
+
+def _provider_call(tool):
+    """
+    Wraps a raw provider for HedgedSearch: returns normalized results and raises
+    on error strings so they count against the provider's circuit breaker.
+    """
+    def call(query):
+        if isinstance(tool, TavilySearchResults):
+            raw = tool.invoke({"query": query})
+        else:
+            raw = tool.invoke(query)
+        if not isinstance(raw, list):
+            raise RuntimeError(str(raw))
+        return _normalize_results(raw)
+    return call
+
+
+def _rate_limited_call(tool):
+    """Like _provider_call, but waits for the provider's token bucket first."""
+    call = _provider_call(tool)
+    if not Config.SEARCH_RATE_LIMIT_ENABLED or isinstance(tool, HedgedSearch):
+        return call  # HedgedSearch rate-limits each provider itself
+    name = _provider_name(tool)
 
-# Initialize Search Tools
+    def limited(query):
+        _acquire_search_slot(name)
+        return call(query)
+    return limited
+
+
+# Initialize Search Tools (Tavily first when configured, DuckDuckGo as fallback)
 tavily_api_key = os.getenv("TAVILY_API_KEY")
+search_providers = []
 if tavily_api_key:
-    search_tool = TavilySearchResults(max_results=3)
+    search_providers.append(("tavily", TavilySearchResults(max_results=3)))
+search_providers.append(("duckduckgo", CustomDuckDuckGoSearch()))
+
+if Config.SEARCH_HEDGING_ENABLED and len(search_providers) > 1:
+    search_tool = HedgedSearch(
+        [(name, _provider_call(tool)) for name, tool in search_providers],
+        hedge_percentile=Config.SEARCH_HEDGE_PERCENTILE,
+        default_hedge_delay=Config.SEARCH_HEDGE_DEFAULT_DELAY_SECONDS,
+        timeout_seconds=Config.SEARCH_TIMEOUT_SECONDS,
+        failure_threshold=Config.SEARCH_BREAKER_FAILURE_THRESHOLD,
+        cooldown_seconds=Config.SEARCH_BREAKER_COOLDOWN_SECONDS,
+        slow_call_seconds=Config.SEARCH_SLOW_CALL_SECONDS,
+        acquire=_acquire_search_slot if Config.SEARCH_RATE_LIMIT_ENABLED else None,
+    )
 else:
-    search_tool = CustomDuckDuckGoSearch()
+    search_tool = search_providers[0][1]
+
+if Config.SEARCH_RECORD_REPLAY_MODE:
+    search_tool = RecordReplaySearch(
+        Config.SEARCH_RECORD_REPLAY_MODE,
+        os.path.join(Config.SEARCH_CASSETTE_DIR, f"{Config.SEARCH_CASSETTE_NAME}.json"),
+        inner=_rate_limited_call(search_tool),
+        replay_latency=Config.SEARCH_REPLAY_LATENCY,
+    )
 
 
 def planner_router(state: AgentState):
@@ -38,29 +225,32 @@ def planner_router(state: AgentState):
     """
     history = state.get("history", [])
     history_text = ""
+    packed = pack_context(
+        [Segment("query", state["query"], required=True),
+         Segment("history", units=[f"{msg['role'].capitalize()}: {msg['content']}" for msg in history], keep="tail")],
+        context_budget("planner"), label="planner",
+    )
+    history_lines = packed["units"]["history"]
     if history:
-        history_text = "\n\nPrevious conversation:\n" + "\n".join([
-            f"{msg['role'].capitalize()}: {msg['content']}" for msg in history[-4:]
-        ]) + "\n"
-
-    prompt = ChatPromptTemplate.from_template(
-        "Analyze the query complexity. "
-        "If it requires simple fact checking or a short code snippet, choose 'quick'. "
-        "If it requires extensive research, comparison, or architectural design, choose 'deep'. "
-        "Return ONLY the single word: 'quick' or 'deep'.\n\n"
-        "{history_context}"
-        "Current Query: {query}"
+        history_text = "Previous conversation:\n" + "\n".join(history_lines) + "\n\n"
+
+    messages = PLANNER_PROMPT.format_messages(query=state["query"], history_context=history_text)
+    usages = []
+
+    def attempt(model):
+        response = cached_invoke(get_llm("planner", lane="routing", model=model), messages,
+                                 semantic_text=state["query"], scope="\n".join(history_lines[:-1]))
+        usages.append(call_usage(messages, response))
+        return response
+
+    # Escalate when the small model does not answer with exactly one of the two words
+    response, _ = get_model_cascade().run(
+        "planner", attempt, lambda r: ("deep" in r.content.lower()) != ("quick" in r.content.lower())
     )
-    chain = prompt | llm
-    response = chain.invoke({"query": state["query"], "history_context": history_text})
     mode_raw = response.content.strip().lower()
 
-    tokens_used = 0
-    if hasattr(response, 'usage_metadata') and response.usage_metadata:
-        tokens_used = response.usage_metadata.get('total_tokens', 0)
-
     mode = "deep" if "deep" in mode_raw else "quick"
-    return {"mode": mode, "token_usage": state.get("token_usage", 0) + tokens_used}
+    return {"mode": mode, **record_calls(state, "planner", usages)}
 
 
 def quick_mode_executor(state: AgentState):
@@ -72,23 +262,31 @@ def quick_mode_executor(state: AgentState):
 
     full_response = ""
 
-    # Build conversation history for context
-    history = state.get("history", [])
-    messages = []
+    # Build conversation history for context (the current query is added last)
+    history = [m for m in state.get("history", []) if m['role'] in ('user', 'assistant')]
+    if history and history[-1]['role'] == 'user' and history[-1]['content'] == state["query"]:
+        history = history[:-1]
 
-    # Add conversation history (skip the very last user message — it's the current query)
-    for msg in history[-6:]:
+    # Most recent turns that fit the token budget; the oldest kept one may be cut short
+    packed = pack_context(
+        [Segment("query", state["query"], required=True),
+         Segment("history", units=[m['content'] for m in history], keep="tail")],
+        context_budget("quick_mode"), label="quick_mode",
+    )
+    kept = packed["units"]["history"]
+    messages = []
+    for msg, content in zip(history[len(history) - len(kept):], kept):
         if msg['role'] == 'user':
-            messages.append(HumanMessage(content=msg['content']))
-        elif msg['role'] == 'assistant':
-            messages.append(SystemMessage(content=msg['content']))
-
-    # Add current query if not already last in history
-    if not messages or not isinstance(messages[-1], HumanMessage) or messages[-1].content != state["query"]:
-        messages.append(HumanMessage(content=state["query"]))
+            messages.append(HumanMessage(content=content))
+        else:
+            messages.append(SystemMessage(content=content))
+    messages.append(HumanMessage(content=state["query"]))
 
-    # Stream response
+    # Stream response; the final chunk carries Ollama's usage metadata
+    llm = get_llm("quick", lane="interactive", model=node_models("quick")[0], num_predict=completion_cap(state, count_message_tokens(messages)))
+    aggregate = None
     for chunk in llm.stream(messages):
+        aggregate = chunk if aggregate is None else aggregate + chunk
         token = chunk.content
         full_response += token
         if buffer:
@@ -97,60 +295,283 @@ def quick_mode_executor(state: AgentState):
     if buffer:
         buffer.mark_complete()
 
-    tokens_used = len(full_response.split()) * 2  # Rough estimate
-
     return {
         "research_data": [{"content": full_response, "source": "LLM Knowledge"}],
         "final_report": full_response,
-        "token_usage": state.get("token_usage", 0) + tokens_used,
+        **record_usage(state, "quick_mode", *call_usage(messages, aggregate)),
         "confidence_score": 0.9,  # Quick mode is always confident
     }
 
 
+def _normalize_results(results):
+    """
+    Converts Tavily / DDG output into a list of {title, url, content} dicts.
+    """
+    if not isinstance(results, list):
+        return [{"title": "", "url": "", "content": str(results)}] if results else []
+    normalized = []
+    for r in results:
+        if isinstance(r, dict):
+            url = r.get('url', r.get('href', ''))
+            normalized.append({
+                "title": r.get('title', url or 'Untitled'),
+                "url": url,
+                "content": r.get('content', r.get('snippet', r.get('body', ''))),
+            })
+        else:
+            normalized.append({"title": "", "url": "", "content": str(r)})
+    return normalized
+
+
+def _format_results(results, registry=None):
+    """
+    Renders normalized search results as markdown evidence. With a source
+    registry, each source is cited by its registry ID instead of its URL.
+    """
+    formatted_content = []
+    for r in results:
+        if not r['url']:
+            formatted_content.append(r['content'])
+            continue
+        source, also = r['url'], r.get('also_reported_by') or []
+        source_id = registry.add(r['url'], r['title']) if registry is not None else None
+        if source_id:
+            source = f"[{source_id}]"
+            also = [f"[{i}]" for i in dict.fromkeys(registry.add(u) for u in also) if i and i != source_id]
+        source_line = f"Source: {source}"
+        if also:
+            source_line += f" (also: {', '.join(also)})"
+        formatted_content.append(f"**{r['title']}**\n{r['content']}\n{source_line}\n")
+    return "\n---\n".join(formatted_content)
+
+
+def _search(search_query):
+    """
+    Searches the configured provider, serving fresh results from the search cache.
+    """
+    provider = _provider_name(search_tool)
+    # Record/replay must see every query, so it bypasses the cache
+    use_cache = Config.SEARCH_CACHE_ENABLED and not isinstance(search_tool, RecordReplaySearch)
+    cache = get_search_cache() if use_cache else None
+
+    if cache:
+        cached = cache.get(search_query, provider)
+        if cached is not None:
+            print(f"DEBUG [search_cache]: Hit for {search_query!r} ({provider})")
+            return cached
+
+    if isinstance(search_tool, (HedgedSearch, RecordReplaySearch)):
+        raw = search_tool.invoke(search_query)  # Rate-limits the providers it calls
+    else:
+        if Config.SEARCH_RATE_LIMIT_ENABLED:
+            _acquire_search_slot(provider)
+        if isinstance(search_tool, TavilySearchResults):
+            raw = search_tool.invoke({"query": search_query})
+        else:
+            raw = search_tool.invoke(search_query)
+    results = _normalize_results(raw)
+
+    # Only cache real result lists; providers report some errors as plain strings
+    if cache and isinstance(raw, list) and results:
+        cache.set(search_query, provider, results)
+    return results
+
+
+def _add_page_text(results):
+    """
+    Replaces the snippets of the top results with the main text of their pages.
+    """
+    top = [r for r in results if r.get("url", "").startswith(("http://", "https://"))][:Config.PAGE_FETCH_TOP_N]
+    pages = get_page_fetcher().fetch_many([r["url"] for r in top])
+    enriched = []
+    for r in results:
+        page_text = pages.get(r.get("url"))
+        if page_text:
+            r = dict(r, content=page_text[:Config.PAGE_FETCH_MAX_CHARS])
+        enriched.append(r)
+    return enriched
+
+
+def _search_evidence(search_query):
+    """
+    Runs a single search plus the optional page fetch stage; returns normalized results.
+    Depending on Config.LOCAL_CORPUS_MODE, local corpus hits replace or precede web results.
+    """
+    local_results = []
+    if Config.LOCAL_CORPUS_MODE in ("only", "mixed"):
+        try:
+            local_results = _get_local_search().invoke(search_query)
+        except Exception as e:
+            if Config.LOCAL_CORPUS_MODE == "only":
+                raise
+            print(f"⚠️ Local corpus search failed: {e}")
+        if Config.LOCAL_CORPUS_MODE == "only":
+            return local_results
+
+    results = _search(search_query)
+    if Config.PAGE_FETCH_ENABLED:
+        results = _add_page_text(results)
+    return local_results + results
+
+
+def _query_terms(text):
+    """Lower-cased word set used to compare sub-queries."""
+    return set(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+def _is_near_duplicate(candidate, previous, threshold):
+    """True if candidate's Jaccard similarity to any previous query reaches threshold."""
+    terms = _query_terms(candidate)
+    if not terms:
+        return True
+    for prev in previous:
+        prev_terms = _query_terms(prev)
+        union = terms | prev_terms
+        if union and len(terms & prev_terms) / len(union) >= threshold:
+            return True
+    return False
+
+
+def _build_sub_queries(query, gaps, history):
+    """
+    Turns the query and each open gap into its own targeted search query.
+    """
+    base_query = query
+    if history:
+        last_user_msgs = [msg['content'] for msg in history[-2:] if msg['role'] == 'user']
+        # The current query is usually the last user message; only add real context
+        last_user_msgs = [m for m in last_user_msgs if m != query]
+        if last_user_msgs:
+            base_query = query + " (context: " + "; ".join(last_user_msgs) + ")"
+
+    sub_queries = [base_query]
+    sub_queries += [f"{query} {gap}" for gap in gaps if str(gap).strip()]
+    return sub_queries
+
+
 def deep_mode_orchestrator(state: AgentState):
     """
     Deep mode executor: performs web search and evidence gathering.
+
+    With Config.DEEP_FANOUT_ENABLED, the query and every open gap are searched as
+    separate sub-queries in parallel (bounded by DEEP_FANOUT_MAX_CONCURRENCY).
+    Sub-queries that nearly repeat one from an earlier iteration are skipped.
+    With Config.EVIDENCE_DEDUP_ENABLED, results already seen in this run (same
+    canonical URL or near-identical text) are dropped before entering research_data.
     """
     query = state["query"]
     iteration = state.get("iterations", 0)
     gaps = state.get("gaps", [])
     history = state.get("history", [])
+    searched = list(state.get("searched_queries") or [])
+
+    if Config.DEEP_FANOUT_ENABLED:
+        sub_queries = []
+        for candidate in _build_sub_queries(query, gaps, history):
+            if len(sub_queries) >= Config.DEEP_FANOUT_MAX_SUBQUERIES:
+                break
+            if _is_near_duplicate(candidate, searched + sub_queries, Config.DEEP_FANOUT_DEDUP_THRESHOLD):
+                print(f"DEBUG [deep_mode]: Skipping repeated sub-query: {candidate!r}")
+                continue
+            sub_queries.append(candidate)
+        print(f"DEBUG [deep_mode]: Fan-out of {len(sub_queries)} sub-queries (iteration {iteration})")
+    else:
+        # Single combined query per iteration
+        search_query = query
+        if gaps:
+            search_query = f"{query} focusing on: {', '.join(gaps[:3])}"
+        elif history:
+            last_user_msgs = [msg['content'] for msg in history[-2:] if msg['role'] == 'user']
+            if last_user_msgs:
+                search_query = query + " (context: " + "; ".join(last_user_msgs) + ")"
+        sub_queries = [search_query]
+        print(f"DEBUG [deep_mode]: Searching for: {search_query!r} (iteration {iteration})")
+
+    dedup = None
+    if Config.EVIDENCE_DEDUP_ENABLED:
+        dedup = EvidenceDeduplicator(
+            state.get("evidence_fingerprints"),
+            max_distance=Config.EVIDENCE_DEDUP_MAX_DISTANCE,
+        )
+
+    registry = SourceRegistry(state.get("source_registry")) if Config.SOURCE_REGISTRY_ENABLED else None
+
+    new_data = []
+    if sub_queries:
+        workers = max(1, min(Config.DEEP_FANOUT_MAX_CONCURRENCY, len(sub_queries)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Workers run in the node's context so rate-limit queueing is per conversation thread
+            futures = {pool.submit(copy_context().run, _search_evidence, q): q for q in sub_queries}
+            # Merge in completion order so slow searches don't hold up the rest
+            for future in as_completed(futures):
+                sub_query = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    new_data.append({"content": f"Search failed: {e}", "source": "Web Search", "query": sub_query})
+                    continue
+                if dedup:
+                    results = dedup.filter(results)
+                    if not results:
+                        continue  # Nothing new: every result repeated earlier evidence
+                new_data.append({
+                    "content": _format_results(results, registry),
+                    "source": "Web Search",
+                    "query": sub_query,
+                })
+
+    update = {
+        "research_data": new_data,
+        "searched_queries": searched + sub_queries,
+        "iterations": iteration + 1,
+    }
+    if registry is not None:
+        update["source_registry"] = registry.entries
+    if dedup:
+        run_stats = dict(state.get("dedup_stats") or {})
+        for key, value in dedup.stats().items():
+            run_stats[key] = run_stats.get(key, 0) + value
+        print(
+            f"DEBUG [evidence_dedup]: Iteration {iteration} dropped {dedup.dropped}, merged {dedup.merged} "
+            f"({dedup.bytes_saved} bytes / ~{dedup.tokens_saved} tokens); run total "
+            f"{run_stats['bytes_saved']} bytes / ~{run_stats['tokens_saved']} tokens saved"
+        )
+        update["evidence_fingerprints"] = list(state.get("evidence_fingerprints") or []) + dedup.new_fingerprints
+        update["dedup_stats"] = run_stats
+    return update
+
+
+def _gap_fields_complete(fields: dict) -> bool:
+    """
+    True once gap analysis can be routed: the score is in and either it clears
+    the threshold (synthesis next, gaps unused) or the gap list is complete too.
+    """
+    score = fields.get("confidence_score")
+    if not isinstance(score, (int, float)):
+        return False
+    return score >= Config.CONFIDENCE_THRESHOLD or "gaps" in fields
 
-    # Build context-aware search query
-    search_query = query
-    if gaps:
-        search_query = f"{query} focusing on: {', '.join(gaps[:3])}"
-    elif history:
-        last_user_msgs = [msg['content'] for msg in history[-2:] if msg['role'] == 'user']
-        if last_user_msgs:
-            search_query = query + " (context: " + "; ".join(last_user_msgs) + ")"
-
-    print(f"DEBUG [deep_mode]: Searching for: {search_query!r} (iteration {iteration})")
 
+def _stream_gap_json(llm, messages):
+    """
+    Streams the gap check and reads the JSON fields as they complete; stops
+    generating once the routing decision is known instead of waiting for
+    trailing prose. Returns (parser, raw text, aggregated message).
+    """
+    parser = IncrementalJSONObject()
+    raw_content = ""
+    aggregate = None
+    stream = llm.stream(messages)
     try:
-        if isinstance(search_tool, TavilySearchResults):
-            results = search_tool.invoke({"query": search_query})
-            if isinstance(results, list):
-                formatted_content = []
-                for r in results:
-                    if isinstance(r, dict):
-                        title = r.get('title', r.get('url', 'Untitled'))
-                        content_text = r.get('content', r.get('snippet', ''))
-                        url = r.get('url', '')
-                        formatted_content.append(f"**{title}**\n{content_text}\nSource: {url}\n")
-                content = "\n---\n".join(formatted_content) if formatted_content else str(results)
-            else:
-                content = str(results)
-        else:
-            content = search_tool.invoke(search_query)
-    except Exception as e:
-        content = f"Search failed: {e}"
-
-    existing_data = state.get("research_data", [])
-    return {
-        "research_data": existing_data + [{"content": content, "source": "Web Search"}],
-        "iterations": iteration + 1,
-    }
+        for chunk in stream:
+            aggregate = chunk if aggregate is None else aggregate + chunk
+            raw_content += chunk.content
+            fields = parser.feed(chunk.content)
+            if Config.GAP_ANALYSIS_EARLY_STOP and _gap_fields_complete(fields):
+                break
+    finally:
+        stream.close()  # Ends the HTTP stream and frees the LLM slot
+    return parser, raw_content, aggregate
 
 
 def gap_analysis_node(state: AgentState):
@@ -163,41 +584,83 @@ def gap_analysis_node(state: AgentState):
     combined_content = "\n".join([d["content"] for d in data])
 
     history = state.get("history", [])
-    history_text = ""
-    if history:
-        history_text = "\nConversation context: " + "; ".join([
-            f"{msg['role']}: {msg['content'][:100]}" for msg in history[-3:]
-        ])
 
-    chain = GAP_ANALYSIS_PROMPT | llm
-    response = chain.invoke({
-        "query": state["query"] + history_text,
-        "research_data": combined_content[:5000]
-    })
+    if budget_exhausted(state, Config.TOKEN_BUDGET_SYNTHESIS_RESERVE):
+        # Keep the rest of the budget for synthesis: no more gap checks or iterations
+        print(f"DEBUG [gap_analysis]: Token budget nearly spent "
+              f"({state.get('token_usage', 0)}/{state.get('budget_limit')}), skipping to synthesis")
+        return {"budget_exhausted": True}
+
+    # Context shrinks when the remaining budget (minus the synthesis reserve) is small
+    overhead = count_message_tokens(GAP_ANALYSIS_PROMPT.format_messages(
+        query="\nConversation context: ", research_data=""))
+    context_tokens = prompt_budget(state, "gap_analysis", overhead, Config.TOKEN_BUDGET_SYNTHESIS_RESERVE,
+                                   min_tokens=125)
+    evidence_chars_budget = min(
+        Config.GAP_ANALYSIS_DIGEST_CHARS if Config.GAP_ANALYSIS_COMPRESSION_ENABLED else 5000,
+        context_tokens * CHARS_PER_TOKEN,
+    )
 
-    tokens_used = 0
-    if hasattr(response, 'usage_metadata') and response.usage_metadata:
-        tokens_used = response.usage_metadata.get('total_tokens', 0)
+    if Config.GAP_ANALYSIS_COMPRESSION_ENABLED:
+        # Compact digest for the gap check; research_data itself stays complete for synthesis
+        research_text = extractive_digest(
+            data,
+            state["query"],
+            state.get("gaps", []),
+            budget_chars=evidence_chars_budget,
+            centrality_weight=Config.COMPRESSION_CENTRALITY_WEIGHT,
+        )
+        print(f"DEBUG [gap_analysis]: Digest {len(research_text)} chars from {len(combined_content)}")
+    else:
+        research_text = combined_content
+
+    # Recent turns get a small share; evidence is cut on sentence boundaries to the rest
+    packed = pack_context(
+        [Segment("query", state["query"], required=True),
+         Segment("history", units=[f"{msg['role']}: {msg['content']}" for msg in history],
+                 keep="tail", separator="; ", max_tokens=context_tokens // 5),
+         Segment("evidence", research_text, priority=2)],
+        context_tokens, label="gap_analysis",
+    )
+    history_text = ""
+    if packed["segments"]["history"]:
+        history_text = "\nConversation context: " + packed["segments"]["history"]
 
-    raw_content = response.content.strip()
-    print(f"DEBUG [gap_analysis]: Raw response: {raw_content[:300]}")
+    messages = GAP_ANALYSIS_PROMPT.format_messages(
+        query=state["query"] + history_text,
+        research_data=packed["segments"]["evidence"],
+    )
+    num_predict = completion_cap(state, count_message_tokens(messages))
+    usages = []
+
+    def attempt(model):
+        parser, raw, aggregate = _stream_gap_json(
+            get_llm("gap_analysis", lane="research", model=model, num_predict=num_predict), messages
+        )
+        usages.append(call_usage(messages, aggregate))
+        return parser, raw
+
+    # Escalate only when the small model's answer has no usable score; a low
+    # score is a valid verdict on the research, not on the model
+    (parser, raw_content), _ = get_model_cascade().run(
+        "gap_analysis", attempt, lambda result: isinstance(result[0].fields.get("confidence_score"), (int, float))
+    )
+    raw_content = raw_content.strip()
+    stopped_early = bool(parser.fields) and not parser.done
+    print(f"DEBUG [gap_analysis]: Raw response{' (stopped early)' if stopped_early else ''}: {raw_content[:300]}")
 
     # Parse confidence and gaps
     score = 0.5
     gaps = []
 
     try:
-        import json
-        # Try JSON parsing first (preferred — we ask for JSON in the prompt)
-        json_match = re.search(r'\{.*\}', raw_content, re.DOTALL)
-        if json_match:
-            parsed = json.loads(json_match.group())
-            score = float(parsed.get("confidence_score", 0.5))
-            gaps = parsed.get("gaps", [])
-            if isinstance(gaps, list):
-                gaps = [str(g) for g in gaps]
-        else:
+        fields = parser.fields
+        if "confidence_score" not in fields:
             raise ValueError("No JSON found")
+        score = float(fields["confidence_score"])
+        gaps = fields.get("gaps", [])
+        if isinstance(gaps, list):
+            gaps = [str(g) for g in gaps]
     except Exception:
         # Fallback: look for "Confidence: 0.X" pattern
         score_match = re.search(r'[Cc]onfidence[:\s]+([0-9.]+)', raw_content)
@@ -217,19 +680,23 @@ def gap_analysis_node(state: AgentState):
         "confidence_score": score,
         "research_confidence_score": score,  # Also set this for completeness
         "gaps": gaps,
-        "token_usage": state.get("token_usage", 0) + tokens_used,
+        **record_calls(state, "gap_analysis", usages),
     }
 
 
 def structured_synthesis_node(state: AgentState):
     """
     Structured synthesis with streaming: compiles research data into a final report.
-    Passes URLs from search results explicitly so the LLM can produce real hyperlinks.
+    With a source registry the LLM cites source IDs and format_output renders the
+    Evidence Trace; otherwise URLs from search results are passed explicitly so
+    the LLM can produce real hyperlinks.
     """
     query_id = state.get("query_id", "")
     buffer = get_streaming_buffer(query_id) if query_id else None
 
     data = state.get("research_data", [])
+    cited = Config.SOURCE_REGISTRY_ENABLED and bool(state.get("source_registry"))
+    synthesis_prompt = RESEARCH_SYNTHESIS_CITED_PROMPT if cited else RESEARCH_SYNTHESIS_PROMPT
 
     # Build enriched context: include content AND a URL reference block
     content_parts = []
@@ -240,32 +707,89 @@ def structured_synthesis_node(state: AgentState):
         source = item.get("source", "Unknown")
         content_parts.append(f"[Source {i+1}: {source}]\n{content}")
 
+        if cited:
+            continue  # Sources are cited by registry ID, no URL block needed
         # Extract URLs from the content for the evidence section
-        urls_in_content = re.findall(r'https?://[^\s\)\]"\'<>]+', content)
+        urls_in_content = re.findall(r'https?://[^\s\)\]"\'<>,]+', content)
         for url in urls_in_content[:5]:  # Cap per source
             url_references.append(url)
 
-    combined_content = "\n\n---\n\n".join(content_parts)
-
-    # Append a deduplicated URL list at the end of context so LLM can cite them
-    if url_references:
-        unique_urls = list(dict.fromkeys(url_references))  # deduplicate, preserve order
-        url_block = "\n\nAVAILABLE URLS FOR EVIDENCE TRACE (use these verbatim in your links):\n"
-        url_block += "\n".join(f"- {u}" for u in unique_urls[:20])
-        combined_content += url_block
-
+    # Deduplicated URL list appended after the evidence so the LLM can cite them
+    unique_urls = list(dict.fromkeys(url_references))[:20]  # deduplicate, preserve order
+    url_header = "\n\nAVAILABLE URLS FOR EVIDENCE TRACE (use these verbatim in your links):\n"
     history = state.get("history", [])
-    history_context = ""
-    if history:
-        history_context = "\n\nConversation context:\n" + "\n".join([
-            f"{msg['role'].capitalize()}: {msg['content']}" for msg in history[-4:]
-        ]) + "\n"
 
-    chain = RESEARCH_SYNTHESIS_PROMPT | llm
+    # Context budget: the node's token budget, shrunk to what the run's budget still allows
+    overhead = count_message_tokens(synthesis_prompt.format_messages(
+        query="\n\nConversation context:\n", context=url_header if unique_urls else ""))
+    context_tokens = prompt_budget(state, "synthesize", overhead, Config.SYNTHESIS_OUTPUT_RESERVE_TOKENS)
+    context_chars = min(Config.SYNTHESIS_CONTEXT_CHARS, context_tokens * CHARS_PER_TOKEN)
+
+    map_usage = {}
+    evidence = None
+    if Config.SYNTHESIS_MAP_REDUCE_ENABLED and sum(len(p) for p in content_parts) > context_chars:
+        # Too much evidence for one prompt: condense it into per-source notes concurrently
+        chunks = _affordable_chunks(
+            _evidence_chunks(data, Config.SYNTHESIS_MAP_CHUNK_CHARS),
+            remaining_budget(state) - overhead - context_tokens - Config.SYNTHESIS_OUTPUT_RESERVE_TOKENS,
+            state["query"], state.get("gaps", []),
+        )
+        if chunks:
+            notes, usages = _map_source_notes(state["query"], chunks)
+            map_usage = record_calls(state, "synthesize_map", usages)
+            if notes is None:
+                # Raw chunks would be head-truncated below; rank the passages instead
+                evidence = build_ranked_context(data, state["query"], state.get("gaps", []), context_chars)
+            else:
+                evidence = "\n\n".join(notes)
+                print(f"DEBUG [synthesize]: {len(notes)} notes ({len(evidence)} chars) from {len(chunks)} chunks")
+    state = {**state, **map_usage}  # Completion cap and usage below include the note calls
+
+    if evidence is None:
+        if Config.PASSAGE_RERANK_ENABLED:
+            # Keep the passages most relevant to the query and open gaps instead of the earliest ones
+            evidence = build_ranked_context(data, state["query"], state.get("gaps", []), context_chars)
+        else:
+            evidence = "\n\n---\n\n".join(content_parts)
+
+    # Whole URL lines and whole recent turns only; evidence is cut on sentence boundaries
+    packed = pack_context(
+        [Segment("query", state["query"], required=True),
+         Segment("urls", units=[f"- {u}" for u in unique_urls], max_tokens=context_tokens // 4),
+         Segment("history", units=[f"{msg['role'].capitalize()}: {msg['content']}" for msg in history],
+                 priority=2, keep="tail", max_tokens=context_tokens // 5),
+         Segment("evidence", evidence, priority=3)],
+        context_tokens, label="synthesize",
+    )
+    history_context = ""
+    if packed["segments"]["history"]:
+        history_context = "\n\nConversation context:\n" + packed["segments"]["history"] + "\n"
     query_with_context = state["query"] + history_context
+    combined_content = packed["segments"]["evidence"]
+    if packed["segments"]["urls"]:
+        combined_content += url_header + packed["segments"]["urls"]
+
+    if Config.SYNTHESIS_SECTION_PARALLEL_ENABLED:
+        section_prompt = SECTION_CITED_PROMPT if cited else SECTION_PROMPT
+        sections = [(title, section_prompt.format_messages(query=query_with_context, context=combined_content,
+                                                           section=title, instructions=instructions))
+                    for title, instructions in (CITED_REPORT_SECTIONS if cited else REPORT_SECTIONS)]
+        # Every section repeats the evidence: only when the token budget pays for it
+        needed = sum(count_message_tokens(m) for _, m in sections) + (len(sections) + 1) * Config.MIN_COMPLETION_TOKENS
+        if remaining_budget(state) >= needed:
+            summary_prompt = EXECUTIVE_SUMMARY_CITED_PROMPT if cited else EXECUTIVE_SUMMARY_PROMPT
+            report, usages = _write_sections(state, query_with_context, sections, buffer, summary_prompt)
+            return {"final_report": report, **record_calls(state, "synthesize", usages)}
+        print(f"DEBUG [synthesize]: Section-parallel needs ~{needed} tokens, writing the report in one call")
+
+    messages = synthesis_prompt.format_messages(query=query_with_context, context=combined_content)
+    llm = get_llm("synthesis", lane="research", model=node_models("synthesis")[0],
+                  num_predict=completion_cap(state, count_message_tokens(messages)))
 
     full_response = ""
-    for chunk in chain.stream({"query": query_with_context, "context": combined_content[:9000]}):
+    aggregate = None
+    for chunk in llm.stream(messages):
+        aggregate = chunk if aggregate is None else aggregate + chunk
         token = chunk.content
         full_response += token
         if buffer:
@@ -275,9 +799,143 @@ def structured_synthesis_node(state: AgentState):
         buffer.mark_complete()
 
     cleaned_report = full_response.strip()
-    tokens_used = len(cleaned_report.split()) * 2
 
     return {
         "final_report": cleaned_report,
-        "token_usage": state.get("token_usage", 0) + tokens_used,
+        **record_usage(state, "synthesize", *call_usage(messages, aggregate)),
     }
+
+
+def _write_sections(state, query_with_context, sections, buffer, summary_prompt):
+    """
+    Section-parallel synthesis: the body sections ((title, messages) pairs) are
+    generated concurrently and streamed in document order; the executive summary
+    is written last from them and placed first in the report. Returns (report,
+    per-call usages).
+    """
+    count = len(sections)
+    writer = OrderedSectionWriter(buffer, count + 1)
+    prompt_tokens = sum(count_message_tokens(m) for _, m in sections)
+    cap = max(Config.MIN_COMPLETION_TOKENS, completion_cap(state, prompt_tokens) // count // 256 * 256)
+    llm = get_llm("synthesis", lane="research", model=node_models("synthesis")[0], num_predict=cap)
+    usages = [(0, 0)] * (count + 1)
+
+    def write(index, messages):
+        aggregate = None
+        try:
+            for chunk in llm.stream(messages):
+                aggregate = chunk if aggregate is None else aggregate + chunk
+                writer.add_chunk(index, chunk.content)
+        finally:
+            writer.finish(index)  # A failed section must not hold back the ones after it
+        usages[index] = call_usage(messages, aggregate)
+
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        futures = [pool.submit(copy_context().run, write, i, messages) for i, (_, messages) in enumerate(sections)]
+        for (title, _), future in zip(sections, futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"⚠️ Section '{title}' failed: {e}")
+
+    body = [text.strip() for text in writer.sections[:count] if text.strip()]
+    summary_messages = summary_prompt.format_messages(query=query_with_context, sections="\n\n".join(body))
+    summary = ""
+    try:
+        write(count, summary_messages)
+        summary = writer.sections[count].strip()
+    except Exception as e:
+        print(f"⚠️ Executive summary failed: {e}")  # The sections are still a usable report
+    finally:
+        if buffer:
+            buffer.mark_complete()
+
+    return "\n\n".join(([summary] if summary else []) + body), usages
+
+
+def _evidence_chunks(data, chunk_chars):
+    """
+    Groups '[Source N: ...]'-tagged evidence into chunks of about chunk_chars:
+    small sources share a chunk, a long one is split on sentence boundaries
+    with its tag repeated on every piece.
+    """
+    chunks, current = [], ""
+    for i, item in enumerate(data):
+        tag = f"[Source {i+1}: {item.get('source', 'Unknown')}]\n"
+        pieces, piece = [], ""
+        for unit in split_units(item.get("content", "")):
+            if piece and len(tag) + len(piece) + len(unit) > chunk_chars:
+                pieces.append(piece)
+                piece = ""
+            piece += unit
+        if piece:
+            pieces.append(piece)
+        for piece in pieces:
+            block = tag + piece
+            if current and len(current) + len(block) + 2 > chunk_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{block}" if current else block
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _affordable_chunks(chunks, token_allowance, query, gaps):
+    """
+    Chunks whose note calls (prompt + note) fit the token allowance. When not
+    all fit, the chunks most relevant to the query and open gaps are kept
+    (in document order) instead of the earliest ones.
+    """
+    overhead = count_message_tokens(SOURCE_NOTE_PROMPT.format_messages(query="", material=""))
+    costs = [overhead + count_tokens(chunk) + Config.SYNTHESIS_NOTE_TOKENS for chunk in chunks]
+    if sum(costs) <= token_allowance:
+        return chunks
+
+    ranked = get_passage_ranker().rank(query, gaps, [{"text": c, "order": i} for i, c in enumerate(chunks)])
+    kept, spent = [], 0
+    for p in ranked:
+        if spent + costs[p["order"]] <= token_allowance:
+            kept.append(p["order"])
+            spent += costs[p["order"]]
+    print(f"⚠️ Token budget covers notes for {len(kept)}/{len(chunks)} chunks; "
+          f"dropping the least relevant")
+    return [chunks[i] for i in sorted(kept)]
+
+
+def _map_source_notes(query, chunks):
+    """
+    Map step: condenses each chunk into a note concurrently, escalating through
+    the synthesis_map models. Notes keep chunk order; a failed call keeps its raw
+    chunk. Returns (notes, per-call usages), with notes None when most calls failed.
+    """
+    def note(chunk):
+        messages = SOURCE_NOTE_PROMPT.format_messages(query=query, material=chunk)
+        call_usages = []
+
+        def attempt(model):
+            response = get_llm("synthesis_map", lane="research", model=model,
+                               num_predict=Config.SYNTHESIS_NOTE_TOKENS).invoke(messages)
+            call_usages.append(call_usage(messages, response))
+            return response
+
+        response, _ = get_model_cascade().run("synthesis_map", attempt, lambda r: bool(r.content.strip()))
+        return response.content.strip(), call_usages
+
+    notes, usages, failed = list(chunks), [], 0
+    workers = max(1, min(Config.SYNTHESIS_MAP_CONCURRENCY, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Workers run in the node's context so their calls keep the thread's Ollama host
+        futures = {pool.submit(copy_context().run, note, chunk): i for i, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                notes[i], call_usages = future.result()
+                usages.extend(call_usages)
+            except Exception as e:
+                failed += 1
+                print(f"⚠️ Source note {i + 1}/{len(chunks)} failed, keeping raw evidence: {e}")
+    if failed * 2 > len(chunks):
+        print(f"⚠️ {failed}/{len(chunks)} source notes failed, falling back to passage ranking")
+        return None, usages
+    return [n for n in notes if n and n.upper() != "NONE"], usages
@@ -5,13 +5,18 @@ import os
 from datetime import datetime
 from config import Config
 from prompts.report_templates import OUTPUT_WRAPPER
+from utils.context_packer import Segment, context_budget, pack_context
+from utils.source_registry import SourceRegistry
 
 
 def format_output(state: AgentState):
     """
     Formats the final output report and saves it to disk and memory.
+    Deep reports citing registry IDs get their Evidence Trace rendered here.
     """
     report = state.get("final_report", "No report generated.")
+    if Config.SOURCE_REGISTRY_ENABLED and state.get("source_registry") and state.get("mode") == "deep":
+        report = SourceRegistry(state["source_registry"]).finalize_report(report)
     sources = list({d.get("source", "Unknown") for d in state.get("research_data", [])})
     confidence = state.get("confidence_score", 0.0)
     mode = state.get("mode", "unknown")
@@ -26,10 +31,11 @@ def format_output(state: AgentState):
         token_usage=int(token_usage),
     )
 
-    # Save interaction to long-term memory (Qdrant)
+    # Save interaction to long-term memory (Qdrant); the excerpt ends on a sentence boundary
+    excerpt = pack_context([Segment("report", report)], context_budget("memory"), label="memory")
     try:
         memory.add_memory(
-            text=f"Query: {state.get('query')}\nResponse: {report[:2000]}",
+            text=f"Query: {state.get('query')}\nResponse: {excerpt['segments']['report']}",
             metadata={
                 "intent_confidence": float(confidence),
                 "research_confidence": float(state.get("research_confidence_score", 0.0)),
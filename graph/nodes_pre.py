@@ -1,26 +1,35 @@
-from langchain_ollama import ChatOllama
 from state import AgentState
 from config import Config
 from memory import memory
-from prompts.clarification_prompts import INTENT_ORCHESTRATOR_PROMPT
+from prompts.clarification_prompts import INTENT_ORCHESTRATOR_PROMPT, FUSED_TRIAGE_PROMPT
+from utils.llm_registry import get_llm
+from utils.llm_cache import cached_invoke
+from intent_index import get_intent_index
+from utils.model_cascade import get_model_cascade
+from utils.token_budget import call_usage, record_calls
+from utils.context_packer import Segment, context_budget, pack_context
 # Removed unused import: from prompts.analysis_prompts import QUERY_INTEGRITY_PROMPT
 import uuid
 import json
 import re
 
-llm = ChatOllama(model=Config.MODEL_NAME)
-
 def guard_layer(state: AgentState):
     """
     Guard Budget and Token and telemetry.
-    Initializes the state if needed.
+    Initializes the state if needed. The source registry is kept for the whole
+    thread: research_data accumulates across turns, so its [S#] IDs must stay stable.
     """
     return {
         "token_usage": 0,
-        "budget_limit": 5000,
+        "token_usage_by_node": {},
+        "budget_limit": Config.MAX_TOKENS_PER_QUERY,
+        "budget_exhausted": False,
         "research_data": [],
         "gaps": [],
         "iterations": 0,
+        "searched_queries": [],
+        "evidence_fingerprints": [],
+        "dedup_stats": {},
         "clarification_question": "",
         "history": [{"role": "user", "content": state["query"]}],
         "query_id": str(uuid.uuid4())  # Generate unique ID for streaming
@@ -29,19 +38,90 @@ def guard_layer(state: AgentState):
 
 
 
+_CATEGORY_MAP = {
+    "BUG": "Bug Fix",
+    "ARCHITECTURE": "Architecture",
+    "CONCEPT": "General Question",
+    "COMPARISON": "Research",
+    "RESEARCH": "Research",
+    "GENERAL": "General Question",
+    "NON_TECHNICAL": "Non-Technical",
+}
+
+def _usable_triage(response, fused: bool) -> bool:
+    """
+    True if a triage answer parses, has the routing fields and an is_clear that
+    agrees with its score. A low score is a valid verdict (a vague or off-topic
+    query), not model uncertainty, so it is not escalated.
+    """
+    try:
+        json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
+        parsed = json.loads(json_match.group() if json_match else response.content)
+        score, is_clear = float(parsed["confidence_score"]), parsed["is_clear"]
+        if not isinstance(is_clear, bool) or not str(parsed.get("category", "")).strip():
+            return False
+        if fused and is_clear and str(parsed.get("mode", "")).strip().lower() not in ("quick", "deep"):
+            return False
+        return is_clear == (score >= 0.8)
+    except (json.JSONDecodeError, KeyError, ValueError, TypeError, AttributeError):
+        return False
+
+
 def intent_orchestrator(state: AgentState):
     """
     Unified Intent classification, scoring, and clarification orchestration.
+    With FUSED_PREPROCESSING_ENABLED the same call also picks quick/deep mode,
+    replacing the separate planner_router round trip.
     """
+    fused = Config.FUSED_PREPROCESSING_ENABLED
     history = state.get("history", [])
-    history_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history[-5:]]) if history else "No history."
-
-    chain = INTENT_ORCHESTRATOR_PROMPT | llm
-    response = chain.invoke({"query": state["query"], "history": history_text})
-
-    tokens_used = 0
-    if hasattr(response, 'usage_metadata') and response.usage_metadata:
-        tokens_used = response.usage_metadata.get('total_tokens', 0)
+    history_lines = [f"{msg['role']}: {msg['content']}" for msg in history]
+    # Most recent turns first, cut on sentence boundaries to the node's token budget
+    packed = pack_context(
+        [Segment("query", state["query"], required=True),
+         Segment("history", units=history_lines, keep="tail")],
+        context_budget("intent_orchestrator"), label="intent_orchestrator",
+    )
+    history_text = packed["segments"]["history"] if history else "No history."
+
+    # kNN fast path over earlier labelled queries; only for a first turn, since
+    # follow-ups depend on the conversation the index knows nothing about
+    index, vector = None, None
+    decision = None
+    if Config.INTENT_KNN_ENABLED and len(history) <= 1:
+        try:
+            index = get_intent_index()
+            vector = index.embed(state["query"])
+            decision = index.classify(vector, require_mode=fused)
+        except Exception as e:
+            print(f"⚠️ Intent index lookup failed, using the LLM: {e}")
+        if decision and decision["is_clear"]:
+            print(f"DEBUG [intent_orchestrator] kNN decision: {decision}")
+            result = {
+                "confidence_score": decision["confidence_score"],
+                "intent": _CATEGORY_MAP.get(decision["category"], "Research"),
+                "is_clarified": True,
+                "clarification_question": "",
+                "token_usage": state.get("token_usage", 0),
+            }
+            if fused:
+                result["mode"] = decision["mode"]
+            return result
+
+    prompt = FUSED_TRIAGE_PROMPT if fused else INTENT_ORCHESTRATOR_PROMPT
+    messages = prompt.format_messages(query=state["query"], history=history_text)
+    usages = []
+
+    def attempt(model):
+        # The last history line is the current query, so the earlier turns scope semantic reuse
+        response = cached_invoke(get_llm("intent", lane="routing", model=model), messages,
+                                 semantic_text=state["query"], scope="\n".join(packed["units"]["history"][:-1]))
+        usages.append(call_usage(messages, response))
+        return response
+
+    # Small model first; the larger one only if the answer is unparsable or inconsistent
+    response, _ = get_model_cascade().run("intent", attempt, lambda r: _usable_triage(r, fused))
+    usage = record_calls(state, "intent_orchestrator", usages)
 
     content = response.content.strip()
     print(f"DEBUG [intent_orchestrator] Raw LLM output: {content}")
@@ -51,6 +131,8 @@ def intent_orchestrator(state: AgentState):
     score = 0.5
     is_clarified = True
     clarification_question = ""
+    mode = ""  # Empty in fused mode = planner_router decides
+    raw_category = None
 
     try:
         json_match = re.search(r'\{.*\}', content, re.DOTALL)
@@ -60,33 +142,37 @@ def intent_orchestrator(state: AgentState):
         is_clarified = bool(parsed.get("is_clear", score >= 0.8))
         clarification_question = parsed.get("clarification_question", "").strip()
         raw_category = parsed.get("category", "Research")
+        intent = _CATEGORY_MAP.get(raw_category.upper(), "Research")
 
-        category_map = {
-            "BUG": "Bug Fix",
-            "ARCHITECTURE": "Architecture",
-            "CONCEPT": "General Question",
-            "COMPARISON": "Research",
-            "RESEARCH": "Research",
-            "GENERAL": "General Question",
-            "NON_TECHNICAL": "Non-Technical",
-        }
-        intent = category_map.get(raw_category.upper(), "Research")
+        raw_mode = str(parsed.get("mode", "")).strip().lower()
+        if raw_mode in ("quick", "deep"):
+            mode = raw_mode
 
     except (json.JSONDecodeError, ValueError) as e:
         print(f"DEBUG [intent_orchestrator] Parse failed ({e}), using fallback.")
         # Minimal fallback logic
         if score < 0.8: is_clarified = False
 
+    if vector is not None and raw_category is not None:
+        # Online learning: the LLM's label becomes a neighbour for future queries
+        try:
+            index.learn(state["query"], raw_category, is_clarified, score, mode=mode or None, vector=vector)
+        except Exception as e:
+            print(f"⚠️ Intent index update failed: {e}")
+
     if not is_clarified and not clarification_question:
         clarification_question = "Could you please provide more context about your query?"
 
-    return {
+    result = {
         "confidence_score": score,
         "intent": intent,
         "is_clarified": is_clarified,
         "clarification_question": clarification_question,
-        "token_usage": state.get("token_usage", 0) + tokens_used,
+        **usage,
     }
+    if fused:
+        result["mode"] = mode
+    return result
 
 def context_retrieval(state: AgentState):
     """
@@ -100,4 +186,16 @@ def context_retrieval(state: AgentState):
 
     return {"context": [formatted_context]}
 
+def preprocess_join(state: AgentState):
+    """
+    Fan-in of the parallel pre-processing branches (context retrieval and intent).
+    Logs how much the parallel layout took off the critical path.
+    """
+    timings = state.get("node_timings", {})
+    branches = [timings.get("context", 0.0), timings.get("intent_orchestrator", 0.0)]
+    sequential, critical = sum(branches), max(branches)
+    print(f"DEBUG [preprocess_join]: critical path {critical:.3f}s vs {sequential:.3f}s sequential "
+          f"(saved {sequential - critical:.3f}s)")
+    return {"node_timings": {"preprocess_saved": sequential - critical}}
+
 # Removed intent_classifier as it is merged into intent_orchestrator
\ No newline at end of file
@@ -0,0 +1,131 @@
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Optional
+
+from config import Config
+from qdrant_client.http import models
+from utils.embeddings import embed_texts
+from utils.search_cache import normalize_query
+
+
+class IntentIndex:
+    """
+    Nearest-neighbour intent / clarity / mode classifier over a Qdrant collection
+    of previously labelled queries. Answers only when the nearest neighbours are
+    similar enough and agree; otherwise the caller falls back to the LLM.
+    Learns online from the LLM's labels.
+    """
+
+    def __init__(self, client, collection_name: str = "intent_examples", embed_fn=embed_texts,
+                 k: int = 5, min_similarity: float = 0.85, min_agreement: float = 0.8,
+                 min_neighbours: int = 3, exact_similarity: float = 0.98):
+        # Shares memory.py's embedded client: a local Qdrant path allows only one client
+        self.client = client
+        self.collection_name = collection_name
+        self.embed_fn = embed_fn
+        self.k = k
+        self.min_similarity = min_similarity
+        self.min_agreement = min_agreement
+        self.min_neighbours = min_neighbours
+        self.exact_similarity = exact_similarity
+        self.disabled = False
+
+    def embed(self, query: str):
+        """Query vector, or None if embedding is unavailable (the index then stays off)."""
+        if self.disabled:
+            return None
+        try:
+            return self.embed_fn([query])[0]
+        except Exception as e:
+            # e.g. the model cannot be downloaded: don't retry on every query
+            print(f"⚠️ Intent index disabled, query embedding failed: {e}")
+            self.disabled = True
+            return None
+
+    def classify(self, vector, require_mode: bool = False) -> Optional[dict]:
+        """
+        Similarity-weighted vote of the k nearest labelled queries on
+        (category, is_clear[, mode]). Returns the winning label, or None when the
+        neighbours are too far, too few or disagree.
+        """
+        if vector is None or not self.client.collection_exists(self.collection_name):
+            return None
+        hits = self.client.query_points(
+            collection_name=self.collection_name,
+            query=vector.tolist(),
+            limit=self.k,
+            score_threshold=self.min_similarity,
+            with_payload=True,
+        ).points
+        # A near-identical earlier query is enough on its own
+        if not hits or (len(hits) < self.min_neighbours and hits[0].score < self.exact_similarity):
+            return None
+
+        votes = defaultdict(float)
+        for hit in hits:
+            p = hit.payload
+            votes[(p["category"], p["is_clear"], p.get("mode") if require_mode else None)] += hit.score
+        label, weight = max(votes.items(), key=lambda kv: kv[1])
+        agreement = weight / sum(votes.values())
+        if agreement < self.min_agreement or (require_mode and label[2] is None):
+            return None
+
+        agreeing = [h for h in hits if (h.payload["category"], h.payload["is_clear"]) == label[:2]]
+        return {
+            "category": label[0],
+            "is_clear": label[1],
+            "mode": label[2],
+            "confidence_score": sum(h.payload["confidence_score"] for h in agreeing) / len(agreeing),
+            "similarity": hits[0].score,
+            "agreement": agreement,
+            "neighbours": len(hits),
+        }
+
+    def learn(self, query: str, category: str, is_clear: bool, confidence_score: float,
+              mode: Optional[str] = None, vector=None):
+        """Stores (or relabels) a query with the labels the LLM gave it."""
+        vector = self.embed(query) if vector is None else vector
+        if vector is None:
+            return
+        if not self.client.collection_exists(self.collection_name):
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                vectors_config=models.VectorParams(size=len(vector), distance=models.Distance.COSINE),
+            )
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[models.PointStruct(
+                id=str(uuid.uuid5(uuid.NAMESPACE_URL, normalize_query(query))),
+                vector=vector.tolist(),
+                payload={
+                    "query": query,
+                    "category": category.upper(),
+                    "is_clear": bool(is_clear),
+                    "confidence_score": float(confidence_score),
+                    "mode": mode,
+                    "labelled_at": time.time(),
+                },
+            )],
+        )
+
+
+_intent_index = None
+_intent_index_lock = threading.Lock()
+
+def get_intent_index() -> IntentIndex:
+    """Get or create the shared intent index (on memory.py's Qdrant client)."""
+    global _intent_index
+    with _intent_index_lock:
+        if _intent_index is None:
+            from memory import memory
+            _intent_index = IntentIndex(
+                memory.client,
+                Config.INTENT_KNN_COLLECTION,
+                k=Config.INTENT_KNN_K,
+                min_similarity=Config.INTENT_KNN_MIN_SIMILARITY,
+                min_agreement=Config.INTENT_KNN_MIN_AGREEMENT,
+                min_neighbours=Config.INTENT_KNN_MIN_NEIGHBOURS,
+            )
+    return _intent_index
@@ -4,7 +4,7 @@ from langgraph.graph import StateGraph, END
 from state import AgentState
 
 # Import node functions
-from graph.nodes_pre import guard_layer, context_retrieval, intent_orchestrator
+from graph.nodes_pre import guard_layer, context_retrieval, intent_orchestrator, preprocess_join
 from graph.nodes_exec import (
     planner_router,
     quick_mode_executor,
@@ -13,24 +13,34 @@ from graph.nodes_exec import (
     structured_synthesis_node
 )
 from graph.nodes_post import format_output
-from langchain_ollama import ChatOllama
 from prompts.clarification_prompts import CLARIFICATION_RESPONSE_PROMPT
 from config import Config
 from persistence import get_checkpointer
-
-
-_llm = ChatOllama(model=Config.MODEL_NAME)
+from utils.context_packer import Segment, context_budget, pack_context
+from utils.llm_registry import get_llm, get_llm_registry
+from utils.model_cascade import get_model_cascade
+from utils.model_warmup import start_model_warmup
+from utils.node_timing import timed_node
+from utils.token_budget import budget_exhausted, call_usage, record_calls
 
 
 
 def build_agent():
     """Compiles the Phase 1-4 logic into a LangGraph workflow."""
+    # Load the models in the background so the first query does not pay for it
+    start_model_warmup()
+    # Health-probe the Ollama hosts when there are several
+    get_llm_registry().pool.start()
+
     workflow = StateGraph(AgentState)
 
     # --- Phase 1: Pre-Processing ---
+    # Context retrieval and intent classification are independent: both run
+    # after the guard and join before routing.
     workflow.add_node("guard", guard_layer)
-    workflow.add_node("context", context_retrieval)
-    workflow.add_node("intent_orchestrator", intent_orchestrator)
+    workflow.add_node("context", timed_node("context", context_retrieval))
+    workflow.add_node("intent_orchestrator", timed_node("intent_orchestrator", intent_orchestrator))
+    workflow.add_node("preprocess_join", preprocess_join)
 
     # --- Phase 2: Planning ---
     workflow.add_node("planner", planner_router)
@@ -47,7 +57,8 @@ def build_agent():
     # --- Define Logic Flow (Edges) ---
     workflow.set_entry_point("guard")
     workflow.add_edge("guard", "context")
-    workflow.add_edge("context", "intent_orchestrator")
+    workflow.add_edge("guard", "intent_orchestrator")
+    workflow.add_edge(["context", "intent_orchestrator"], "preprocess_join")
 
 
     # ── Clarification Node ────────────────────────────────────────────────
@@ -62,15 +73,24 @@ def build_agent():
             "clarification_question",
             "Could you provide more context about your query?"
         )
-        query = state.get("query", "")
+        # A pasted document as the query is cut on a sentence boundary to the node's budget
+        query = pack_context([Segment("query", state.get("query", ""))],
+                             context_budget("clarify_user"), label="clarify_user")["segments"]["query"]
 
         # Use LLM to phrase a polished, friendly clarification response
+        messages = CLARIFICATION_RESPONSE_PROMPT.format_messages(
+            query=query,
+            clarification_question=clarification_question,
+        )
+        usages = []
+
+        def attempt(model):
+            response = get_llm("clarify", lane="interactive", model=model).invoke(messages)
+            usages.append(call_usage(messages, response))
+            return response
+
         try:
-            chain = CLARIFICATION_RESPONSE_PROMPT | _llm
-            response = chain.invoke({
-                "query": query,
-                "clarification_question": clarification_question,
-            })
+            response, _ = get_model_cascade().run("clarify", attempt, lambda r: bool(r.content.strip()))
             msg = response.content.strip()
         except Exception as e:
             # Safe fallback if LLM call fails
@@ -81,33 +101,33 @@ def build_agent():
             )
             print(f"DEBUG [clarify_user] LLM call failed: {e}")
 
-        tokens_used = 0
-        if hasattr(response if 'response' in dir() else object(), 'usage_metadata') and getattr(response, 'usage_metadata', None):
-            tokens_used = response.usage_metadata.get('total_tokens', 0)
-
         return {
             "final_report": msg,
             "is_clarified": False,   # stays False — user hasn't answered yet
             "mode": "clarification",
-            "token_usage": state.get("token_usage", 0) + tokens_used,
+            **record_calls(state, "clarify_user", usages),
             "history": [{"role": "assistant", "content": msg}]
         }
 
 
     # ── Intent Router ─────────────────────────────────────────────────────
     def intent_route(state):
-        """Route based on clarity."""
+        """Route based on clarity; a fused pre-processing result goes straight to its mode."""
         if state.get("is_clarified") and state.get("confidence_score", 0.0) >= 0.8:
+            if Config.FUSED_PREPROCESSING_ENABLED and state.get("mode") in ("quick", "deep"):
+                return "quick_mode" if state["mode"] == "quick" else "deep_research"
             return "planner"
         return "clarify_user"
 
     workflow.add_node("clarify_user", ask_user_node)
 
     workflow.add_conditional_edges(
-        "intent_orchestrator",
+        "preprocess_join",
         intent_route,
         {
             "planner": "planner",
+            "quick_mode": "quick_mode",
+            "deep_research": "deep_research",
             "clarify_user": "clarify_user",
         }
     )
@@ -126,7 +146,12 @@ def build_agent():
     def gap_route(state):
         confidence = state.get("confidence_score", 0.0)
         iterations = state.get("iterations", 0)
-        if confidence < 0.8 and iterations < 3:
+        # Stop iterating once only the synthesis reserve of the token budget is left
+        out_of_budget = state.get("budget_exhausted") or budget_exhausted(
+            state, Config.TOKEN_BUDGET_SYNTHESIS_RESERVE
+        )
+        if (confidence < Config.CONFIDENCE_THRESHOLD and iterations < Config.MAX_ITERATIONS_DEEP_MODE
+                and not out_of_budget):
             return "deep_research"
         return "synthesize"
 
@@ -1,4 +1,7 @@
 # prompts/clarification_prompts.py
+# Same layout as research_prompts.py: static system prefix first, per-query
+# content last. The intent and fused triage prompts also share _TRIAGE_INSTRUCTIONS
+# as their leading text.
 from langchain_core.prompts import ChatPromptTemplate
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -6,7 +9,7 @@ from langchain_core.prompts import ChatPromptTemplate
 # Used by: intent_orchestrator node in nodes_pre.py
 # ─────────────────────────────────────────────────────────────────────────────
 
-INTENT_ORCHESTRATOR_SYSTEM = """
+_TRIAGE_INSTRUCTIONS = """
 You are a senior technical triage lead for a developer AI assistant. Your goal is to analyze a developer's query and decide how the system should handle it.
 
 Your task is to:
@@ -36,7 +39,9 @@ Your task is to:
    - Use the provided conversation history to resolve pronouns or missing context.
 
 CRITICAL RULE: Requests for technical definitions or explanations (e.g., "What is [X]", "How does [Y] work") are highly actionable and should ALWAYS have confidence_score >= 0.9 and is_clear = true.
+"""
 
+INTENT_ORCHESTRATOR_SYSTEM = _TRIAGE_INSTRUCTIONS + """
 IMPORTANT: Respond with ONLY a valid JSON object.
 Format:
 {{
@@ -53,6 +58,33 @@ INTENT_ORCHESTRATOR_PROMPT = ChatPromptTemplate.from_messages([
 ])
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Prompt 1b: Fused Triage + Planning (intent, clarity and quick/deep in one call)
+# Used by: intent_orchestrator node in nodes_pre.py when FUSED_PREPROCESSING_ENABLED
+# ─────────────────────────────────────────────────────────────────────────────
+
+FUSED_TRIAGE_SYSTEM = _TRIAGE_INSTRUCTIONS + """
+5. Choose the execution 'mode' (only matters when is_clear is true):
+   - "quick": simple fact checking, a definition, or a short code snippet.
+   - "deep" : extensive research, comparisons, or architectural design.
+
+IMPORTANT: Respond with ONLY a valid JSON object.
+Format:
+{{
+  "category": "<CATEGORY>",
+  "confidence_score": <float>,
+  "is_clear": <true/false>,
+  "clarification_question": "<question or empty string or 'NON_TECHNICAL'>",
+  "mode": "<quick/deep>"
+}}
+"""
+
+FUSED_TRIAGE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", FUSED_TRIAGE_SYSTEM),
+    ("user", "Conversation History:\n{history}\n\nAnalyze this current query:\n\n{query}")
+])
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Prompt 2: Clarification Response Formatter
 # Used by: clarify_user node in main.py
@@ -1,16 +1,17 @@
 # prompts/research_prompts.py
+# Static instructions go in the system message and everything per-query in the
+# user message after it, so consecutive calls share a prompt prefix that Ollama
+# can reuse from its KV cache instead of re-evaluating it.
 from langchain_core.prompts import ChatPromptTemplate
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Gap Analysis Prompt
 # ─────────────────────────────────────────────────────────────────────────────
-GAP_ANALYSIS_PROMPT = ChatPromptTemplate.from_template("""
+GAP_ANALYSIS_SYSTEM = """
 You are a technical analyst evaluating research completeness.
+You will be given a query and the current research findings.
 
-Current Research Findings:
-{research_data}
-
-Evaluate how well the research answers this query: "{query}"
+Evaluate how well the research answers the query.
 
 Return ONLY a valid JSON object with NO extra text, in this exact format:
 {{
@@ -26,25 +27,28 @@ Scoring guide:
 - 0.0–0.3: Barely relevant data found
 
 Return ONLY the JSON object, nothing else.
-""")
+"""
+
+GAP_ANALYSIS_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", GAP_ANALYSIS_SYSTEM),
+    ("user", "Query: \"{query}\"\n\nCurrent Research Findings:\n{research_data}")
+])
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Research Synthesis Prompt
 # ─────────────────────────────────────────────────────────────────────────────
-RESEARCH_SYNTHESIS_PROMPT = ChatPromptTemplate.from_template("""
+_SYNTHESIS_ROLE = """
 You are a world-class Technical Documentation Engineer.
-Synthesize the following research data into a production-grade report for a senior developer.
-
-Research Context:
-{context}
-
-Original Query: {query}
+"""
 
+_RULES_BANNER = """
 ═══════════════════════════════════════════════════
 OUTPUT RULES — READ EVERY RULE CAREFULLY
 ═══════════════════════════════════════════════════
+"""
 
+_REPORT_STRUCTURE = """
 1. MANDATORY REPORT STRUCTURE — use exactly these headings:
 
    # Executive Summary
@@ -58,7 +62,9 @@ OUTPUT RULES — READ EVERY RULE CAREFULLY
 
    # Evidence Trace
    (List of sources used — see Rule 5 below)
+"""
 
+_STYLE_RULES = """
 2. OUTPUT FORMAT:
    - Output plain markdown directly. Do NOT wrap your entire response in any code fence.
    - WRONG: ```markdown\\n# Executive Summary\\n...\\n```
@@ -97,7 +103,9 @@ OUTPUT RULES — READ EVERY RULE CAREFULLY
 
 4. TONE: Senior developer readability. High signal-to-noise. No filler phrases.
 
-5. EVIDENCE TRACE RULES — produce real, clickable hyperlinks:
+"""
+
+_EVIDENCE_TRACE_RULES = """5. EVIDENCE TRACE RULES — produce real, clickable hyperlinks:
    - For every source URL found in the research context, create a markdown hyperlink.
    - Format each source as:  - [Title or Domain](URL)
    - If you have the actual URL from search results, use it verbatim.
@@ -108,7 +116,150 @@ OUTPUT RULES — READ EVERY RULE CAREFULLY
      - [LangChain Documentation](https://python.langchain.com/docs/introduction)
      - [Tavily AI Search](https://tavily.com)
      - LLM Knowledge Base (no URL available)
+"""
 
+_CLOSING_BANNER = """
 ═══════════════════════════════════════════════════
-""")
+"""
+
+_FORMAT_RULES = _STYLE_RULES + _EVIDENCE_TRACE_RULES + _CLOSING_BANNER
+
+# With the source registry the LLM cites compact IDs and the Evidence Trace is
+# rendered from the registry afterwards, so the model never re-types a URL.
+_CITED_REPORT_STRUCTURE = """
+1. MANDATORY REPORT STRUCTURE — use exactly these headings:
+
+   # Executive Summary
+   (High-level answer to the query — 3–5 sentences)
+
+   # Technical Deep Analysis
+   (In-depth exploration of the technologies, architectures, or concepts involved)
+
+   # Key Findings & Trade-offs
+   (Critical insights, pros/cons, recommendations)
+"""
+
+_CITATION_RULES = """5. CITATIONS — cite sources by their IDs:
+   - Every source in the research context (web page or local document) is marked with an ID such as [S3].
+   - Cite the ID right after the claim it supports, e.g. "Pulsar stores segments in BookKeeper [S2]."
+   - Only use IDs that appear in the research context. DO NOT write URLs.
+   - DO NOT write an Evidence Trace section; it is added automatically from the cited IDs.
+"""
+
+_CITED_FORMAT_RULES = _STYLE_RULES + _CITATION_RULES + _CLOSING_BANNER
+
+RESEARCH_SYNTHESIS_SYSTEM = (
+    _SYNTHESIS_ROLE
+    + "Synthesize the research data you are given into a production-grade report for a senior developer.\n"
+    + _RULES_BANNER + _REPORT_STRUCTURE + _FORMAT_RULES
+)
+
+_SYNTHESIS_USER = "Original Query: {query}\n\nResearch Context:\n{context}"
+
+RESEARCH_SYNTHESIS_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", RESEARCH_SYNTHESIS_SYSTEM),
+    ("user", _SYNTHESIS_USER)
+])
+
+RESEARCH_SYNTHESIS_CITED_SYSTEM = (
+    _SYNTHESIS_ROLE
+    + "Synthesize the research data you are given into a production-grade report for a senior developer.\n"
+    + _RULES_BANNER + _CITED_REPORT_STRUCTURE + _CITED_FORMAT_RULES
+)
+
+RESEARCH_SYNTHESIS_CITED_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", RESEARCH_SYNTHESIS_CITED_SYSTEM),
+    ("user", _SYNTHESIS_USER)
+])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Section Prompts (section-parallel synthesis)
+# The body sections are written concurrently from the same evidence; the
+# executive summary is written last from them. Section-specific text comes
+# after the shared evidence so the concurrent calls share the longest prefix.
+# ─────────────────────────────────────────────────────────────────────────────
+REPORT_SECTIONS = [
+    ("Technical Deep Analysis", "In-depth exploration of the technologies, architectures, or concepts involved."),
+    ("Key Findings & Trade-offs", "Critical insights, pros/cons, recommendations."),
+    ("Evidence Trace", "List of sources used, following Rule 5."),
+]
+
+_SECTION_INTRO = (
+    "You write ONE section of a production-grade report for a senior developer; "
+    "other writers produce the remaining sections in parallel.\n"
+)
+
+_SECTION_USER = (
+    "Original Query: {query}\n\nResearch Context:\n{context}\n\n"
+    "Write ONLY the '# {section}' section ({instructions}). "
+    "Start with the heading line '# {section}' and do not write any other section."
+)
+
+_SUMMARY_USER = (
+    "Original Query: {query}\n\nReport sections:\n{sections}\n\n"
+    "Write ONLY the '# Executive Summary' section: a high-level answer to the query in 3–5 "
+    "sentences, consistent with the sections above. Start with the heading line '# Executive Summary'."
+)
+
+SECTION_SYSTEM = _SYNTHESIS_ROLE + _SECTION_INTRO + _RULES_BANNER + _FORMAT_RULES
+
+SECTION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SECTION_SYSTEM),
+    ("user", _SECTION_USER)
+])
+
+EXECUTIVE_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SECTION_SYSTEM),
+    ("user", _SUMMARY_USER)
+])
+
+# Cited variants: no Evidence Trace section to write, sources cited by ID
+CITED_REPORT_SECTIONS = [s for s in REPORT_SECTIONS if s[0] != "Evidence Trace"]
+
+SECTION_CITED_SYSTEM = _SYNTHESIS_ROLE + _SECTION_INTRO + _RULES_BANNER + _CITED_FORMAT_RULES
+
+SECTION_CITED_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SECTION_CITED_SYSTEM),
+    ("user", _SECTION_USER)
+])
+
+EXECUTIVE_SUMMARY_CITED_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SECTION_CITED_SYSTEM),
+    ("user", _SUMMARY_USER)
+])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Source Note Prompt (map step of map-reduce synthesis)
+# ─────────────────────────────────────────────────────────────────────────────
+SOURCE_NOTE_SYSTEM = """
+You condense research material into a compact note for a report writer.
+
+Rules:
+- Keep only facts relevant to the query: claims, numbers, versions, names, trade-offs.
+- Keep every "[Source N: ...]" tag in front of the facts taken from that source.
+- Keep source IDs such as [S3] next to the facts they support.
+- Copy URLs verbatim; never invent one.
+- Use terse bullet points, at most 150 words in total.
+- If nothing is relevant to the query, reply with exactly: NONE
+"""
+
+SOURCE_NOTE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SOURCE_NOTE_SYSTEM),
+    ("user", "Query: {query}\n\nResearch material:\n{material}")
+])
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Planner Prompt (quick vs deep), used when the fused triage did not pick a mode
+# ─────────────────────────────────────────────────────────────────────────────
+PLANNER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "Analyze the query complexity. "
+     "If it requires simple fact checking or a short code snippet, choose 'quick'. "
+     "If it requires extensive research, comparison, or architectural design, choose 'deep'. "
+     "Return ONLY the single word: 'quick' or 'deep'."),
+    ("user", "{history_context}Current Query: {query}")
+])
 
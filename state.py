@@ -14,8 +14,15 @@ class AgentState(TypedDict):
     research_data: Annotated[list, operator.add]
     final_report: str
     token_usage: int
+    token_usage_by_node: dict  # {node: {"prompt", "completion", "calls"}} for this run
     budget_limit: int
+    budget_exhausted: bool  # Set when deep research stopped early to stay within budget_limit
     gaps: list
     iterations: int
+    searched_queries: list  # Sub-queries already run in deep mode
+    evidence_fingerprints: list  # Canonical URLs / SimHashes of evidence already collected
+    dedup_stats: dict  # Near-duplicate evidence dropped this run (count, bytes, tokens)
+    source_registry: list  # Deduplicated web and local corpus sources {"id", "url", "title", "domain", ...} cited as [S1], [S2], ...; kept for the thread
+    node_timings: Annotated[dict, operator.or_]  # Seconds per node; merged across parallel branches
     streaming_chunk: str  # For real-time token streaming
     query_id: str  # Unique ID for streaming buffer
\ No newline at end of file
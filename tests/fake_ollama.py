@@ -0,0 +1,160 @@
+# fake_ollama.py
+"""
+Minimal stand-in for the Ollama HTTP API used by the offline tests.
+Serves /api/chat (streaming NDJSON or single JSON), /api/generate, /api/tags and /api/ps.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllama:
+    """
+    Runs a fake Ollama server on a free local port.
+    `reply` is a string or a callable(request_json) -> string; replies are streamed word by word,
+    and a callable that raises makes the request fail with HTTP 500.
+    `load_delay` is paid by the first request for a model that is not loaded.
+    """
+
+    def __init__(self, reply="Hello from fake Ollama.", delay=0.0, token_delay=0.0, models=("fake-model",),
+                 load_delay=0.0):
+        self.reply = reply
+        self.delay = delay
+        self.token_delay = token_delay
+        self.load_delay = load_delay
+        self.models = list(models)
+        self.requests = []
+        self.connections = set()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.healthy = True
+        self.loaded = set()
+        self._lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Client closed the connection (e.g. stopped reading a stream)
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                fake.connections.add(self.client_address)
+                if not fake.healthy:
+                    self._send_json(503, {"error": "unhealthy"})
+                elif self.path == "/api/tags":
+                    self._send_json(200, {"models": [{"name": m, "model": m} for m in fake.models]})
+                elif self.path == "/api/ps":
+                    self._send_json(200, {"models": [{"name": m, "model": m} for m in sorted(fake.loaded)]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                fake.connections.add(self.client_address)
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with fake._lock:
+                    fake.requests.append({"path": self.path, "json": request, "time": time.time()})
+                    fake.in_flight += 1
+                    fake.peak_in_flight = max(fake.peak_in_flight, fake.in_flight)
+                try:
+                    if not fake.healthy:
+                        self._send_json(503, {"error": "unhealthy"})
+                        return
+                    if self.path == "/api/generate":
+                        fake._load(request.get("model"))
+                        self._send_json(200, {"model": request.get("model"), "response": "", "done": True})
+                        return
+                    if self.path != "/api/chat":
+                        self._send_json(404, {"error": "not found"})
+                        return
+                    fake._load(request.get("model"))
+                    time.sleep(fake.delay)
+                    self._chat(request)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def _chat(self, request):
+                try:
+                    reply = fake.reply(request) if callable(fake.reply) else fake.reply
+                except Exception as e:  # A raising reply callable simulates a server-side error
+                    self._send_json(500, {"error": str(e)})
+                    return
+                model = request.get("model", "fake-model")
+                prompt_chars = sum(len(m.get("content", "")) for m in request.get("messages", []))
+                words = reply.split(" ")
+                tokens = [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+                final = {
+                    "model": model,
+                    "created_at": "2026-01-01T00:00:00Z",
+                    "message": {"role": "assistant", "content": ""},
+                    "done": True,
+                    "done_reason": "stop",
+                    "total_duration": 1,
+                    "load_duration": 1,
+                    "prompt_eval_count": max(1, prompt_chars // 4),
+                    "prompt_eval_duration": 1,
+                    "eval_count": len(tokens),
+                    "eval_duration": 1,
+                }
+                if not request.get("stream", True):
+                    final["message"]["content"] = reply
+                    self._send_json(200, final)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for token in tokens:
+                        self._write_chunk({
+                            "model": model,
+                            "created_at": "2026-01-01T00:00:00Z",
+                            "message": {"role": "assistant", "content": token},
+                            "done": False,
+                        })
+                        time.sleep(fake.token_delay)
+                    self._write_chunk(final)
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Client stopped reading (e.g. early termination)
+
+            def _write_chunk(self, payload):
+                data = json.dumps(payload).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _load(self, model):
+        if model not in self.loaded:
+            time.sleep(self.load_delay)
+            self.loaded.add(model)
+
+    def chat_requests(self):
+        return [r for r in self.requests if r["path"] == "/api/chat"]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
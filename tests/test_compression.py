@@ -0,0 +1,64 @@
+# test_compression.py
+"""
+Tests for extractive compression of evidence before gap analysis.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.compression import extractive_digest, split_sentences
+from utils.embeddings import hashing_embed
+
+
+BOILERPLATE = " ".join(
+    f"Subscribe to our newsletter for weekly updates number {i} and exclusive offers." for i in range(40)
+)
+RESEARCH_DATA = [
+    {"source": "Web Search", "content": (
+        "**Kafka vs RabbitMQ**\n"
+        f"{BOILERPLATE}\n"
+        "Kafka keeps an append-only log so consumers can replay ledger events after a failure.\n"
+        "Source: https://example.com/kafka\n"
+        "\n---\n"
+        "**Delivery guarantees**\n"
+        "RabbitMQ acknowledges messages per consumer and deletes them once processed.\n"
+        "Kafka transactions provide exactly-once delivery for ledger event processing.\n"
+        "Source: https://example.com/eos\n"
+    )},
+]
+
+
+def test_split_sentences_drops_titles_and_sources():
+    sentences = split_sentences(RESEARCH_DATA[0]["content"])
+    assert not any(s.startswith(("Source:", "**")) for s in sentences)
+    assert "Kafka transactions provide exactly-once delivery for ledger event processing." in sentences
+
+
+def test_digest_is_compact_and_relevant():
+    full = RESEARCH_DATA[0]["content"]
+    digest = extractive_digest(
+        RESEARCH_DATA,
+        "Kafka vs RabbitMQ for a financial ledger",
+        ["exactly-once delivery"],
+        budget_chars=400,
+        embed_fn=hashing_embed,
+    )
+    assert len(digest) <= 400
+    assert len(full) / len(digest) > 5
+    assert "exactly-once delivery" in digest
+    assert "replay ledger events" in digest
+    # Repeated boilerplate is deduplicated rather than filling the budget
+    assert digest.count("newsletter") <= 1
+
+
+def test_short_evidence_passes_through():
+    data = [{"content": "Kafka stores records in partitions for ordering guarantees."}]
+    assert extractive_digest(data, "kafka", budget_chars=1000, embed_fn=hashing_embed) == \
+        "Kafka stores records in partitions for ordering guarantees."
+
+
+if __name__ == "__main__":
+    test_split_sentences_drops_titles_and_sources()
+    test_digest_is_compact_and_relevant()
+    test_short_evidence_passes_through()
+    print("✅ All compression tests passed!")
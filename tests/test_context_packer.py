@@ -0,0 +1,102 @@
+# test_context_packer.py
+"""
+Tests for token-aware prompt packing: boundary-safe cuts, head/tail keeping,
+priorities, and quick mode's history packing against a local fake Ollama server.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+import utils.llm_registry as llm_registry
+from config import Config
+from graph.nodes_exec import quick_mode_executor
+from utils.context_packer import Segment, context_budget, pack_context, split_units
+
+
+def _words(text):
+    """Deterministic token count for the tests: one token per whitespace-separated word."""
+    return len(text.split())
+
+
+def test_split_units_round_trips_and_keeps_code_fences_whole():
+    text = ("Kafka stores logs. See https://kafka.apache.org/docs for details.\n\n"
+            "```python\nproducer.send('t', b'x')\n# done. Next line.\n```\nPulsar uses BookKeeper.")
+    units = split_units(text)
+    assert "".join(units) == text
+    assert any(u.startswith("```python") and u.rstrip().endswith("```") for u in units)
+    assert any("https://kafka.apache.org/docs" in u for u in units)  # "." inside the URL is not a boundary
+
+
+def test_evidence_cut_on_sentence_boundary_never_mid_url():
+    evidence = "First fact. Second fact with https://example.com/a.b/c link. Third fact is long here."
+    packed = pack_context([Segment("evidence", evidence)], 8, count_fn=_words)
+    kept = packed["segments"]["evidence"]
+    assert kept == "First fact. Second fact with https://example.com/a.b/c link. "
+    assert packed["dropped"]["evidence"]["units"] == 1
+
+
+def test_history_keeps_most_recent_turns():
+    turns = [f"user: question {i}" for i in range(6)]
+    packed = pack_context([Segment("history", units=turns, keep="tail")], 9, count_fn=_words)
+    assert packed["units"]["history"] == turns[-3:]
+    assert packed["dropped"]["history"] == {"units": 3, "tokens": 9}
+
+
+def test_required_and_priority_order():
+    segments = [
+        Segment("evidence", "one two three four five six.", priority=2),
+        Segment("history", units=["a b", "c d"], keep="tail", priority=1, max_tokens=2),
+        Segment("query", "what is cdc", required=True),
+    ]
+    packed = pack_context(segments, 8, count_fn=_words)
+    assert packed["segments"]["query"] == "what is cdc"
+    assert packed["segments"]["history"] == "c d"  # Capped by max_tokens
+    assert packed["segments"]["evidence"] == ""  # Sentence does not fit the 3 tokens left
+    assert packed["tokens"] <= 8
+
+
+def test_context_budget_bounded_by_model_window():
+    saved = dict(Config.MODEL_CONTEXT_WINDOWS)
+    try:
+        Config.MODEL_CONTEXT_WINDOWS[Config.MODEL_NAME] = 2048
+        assert context_budget("synthesize") == min(Config.CONTEXT_TOKEN_BUDGETS["synthesize"],
+                                                   2048 - Config.MIN_COMPLETION_TOKENS)
+    finally:
+        Config.MODEL_CONTEXT_WINDOWS.clear()
+        Config.MODEL_CONTEXT_WINDOWS.update(saved)
+
+
+def test_quick_mode_sends_recent_history_within_budget():
+    history = []
+    for i in range(40):
+        history.append({"role": "user", "content": f"Question {i} about streaming systems and their trade-offs?"})
+        history.append({"role": "assistant", "content": f"Answer {i}. " + "Kafka partitions scale reads. " * 20})
+    history.append({"role": "user", "content": "What is CDC?"})
+
+    server = FakeOllama(reply="Change data capture.")
+    saved = llm_registry._registry, Config.CONTEXT_TOKEN_BUDGETS["quick_mode"]
+    llm_registry._registry = llm_registry.LLMRegistry(base_url=server.url)
+    Config.CONTEXT_TOKEN_BUDGETS["quick_mode"] = 400
+    try:
+        quick_mode_executor({"query": "What is CDC?", "history": history, "token_usage": 0})
+    finally:
+        llm_registry._registry, Config.CONTEXT_TOKEN_BUDGETS["quick_mode"] = saved
+        server.close()
+
+    sent = server.chat_requests()[0]["json"]["messages"]
+    assert sent[-1] == {"role": "user", "content": "What is CDC?"}
+    assert "Answer 39." in sent[-2]["content"]  # Most recent turn kept
+    assert not any("Question 0 " in m["content"] for m in sent)  # Oldest turns dropped
+    assert sum(len(m["content"]) for m in sent[1:]) < 400 * 4 * 1.2
+
+
+if __name__ == "__main__":
+    test_split_units_round_trips_and_keeps_code_fences_whole()
+    test_evidence_cut_on_sentence_boundary_never_mid_url()
+    test_history_keeps_most_recent_turns()
+    test_required_and_priority_order()
+    test_context_budget_bounded_by_model_window()
+    test_quick_mode_sends_recent_history_within_budget()
+    print("✅ All context packer tests passed!")
@@ -0,0 +1,90 @@
+# test_deep_fanout.py
+"""
+Tests for the concurrent sub-query fan-out in deep_mode_orchestrator.
+Uses a fake search tool, so no network or LLM is needed.
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import graph.nodes_exec as nodes_exec
+from config import Config
+
+
+class FakeSearch:
+    """Records queries and the peak number of concurrent calls."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.queries = []
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, query):
+        with self.lock:
+            self.queries.append(query)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return f"results for {query}"
+
+
+def _state(**overrides):
+    state = {
+        "query": "Kafka vs RabbitMQ for a financial ledger",
+        "iterations": 0,
+        "gaps": [],
+        "history": [],
+        "searched_queries": [],
+    }
+    state.update(overrides)
+    return state
+
+
+def test_fanout_runs_sub_queries_concurrently():
+    fake = FakeSearch()
+    nodes_exec.search_tool = fake
+    gaps = ["exactly-once delivery guarantees", "consumer ordering", "operational cost"]
+
+    # Measure the fan-out itself, not provider rate limiting
+    Config.SEARCH_RATE_LIMIT_ENABLED = False
+    try:
+        start = time.time()
+        result = nodes_exec.deep_mode_orchestrator(_state(gaps=gaps))
+        elapsed = time.time() - start
+    finally:
+        Config.SEARCH_RATE_LIMIT_ENABLED = True
+
+    assert len(fake.queries) == Config.DEEP_FANOUT_MAX_SUBQUERIES
+    assert 1 < fake.peak <= Config.DEEP_FANOUT_MAX_CONCURRENCY
+    # Bounded concurrency: far less than the serial cost of every search
+    assert elapsed < fake.delay * len(fake.queries)
+    assert len(result["research_data"]) == len(fake.queries)
+    assert set(result["searched_queries"]) == set(fake.queries)
+    assert result["iterations"] == 1
+
+
+def test_fanout_skips_near_duplicate_sub_queries():
+    fake = FakeSearch(delay=0)
+    nodes_exec.search_tool = fake
+    query = "Kafka vs RabbitMQ for a financial ledger"
+
+    result = nodes_exec.deep_mode_orchestrator(_state(
+        gaps=["consumer ordering"],
+        iterations=1,
+        searched_queries=[query],
+    ))
+
+    assert fake.queries == [f"{query} consumer ordering"]
+    assert result["searched_queries"] == [query, f"{query} consumer ordering"]
+
+
+if __name__ == "__main__":
+    test_fanout_runs_sub_queries_concurrently()
+    test_fanout_skips_near_duplicate_sub_queries()
+    print("✅ All fan-out tests passed!")
@@ -0,0 +1,133 @@
+# test_endpoint_pool.py
+"""
+Tests for the multi-host Ollama endpoint pool: least-outstanding routing,
+sticky routing per thread, per-host model availability, and ejection and
+retry of unhealthy hosts, against several local fake Ollama servers.
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+from utils.endpoint_pool import sticky_routing
+from utils.llm_registry import LLMRegistry
+
+DELAY = 0.3
+
+
+def _registry(servers, **pool_options):
+    registry = LLMRegistry(base_urls=[s.url for s in servers], max_in_flight=8, lane_caps={"research": 8})
+    for name, value in pool_options.items():
+        setattr(registry.pool, name, value)
+    return registry
+
+
+def _close(servers):
+    for server in servers:
+        server.close()
+
+
+def test_concurrent_calls_spread_over_hosts():
+    servers = [FakeOllama(reply="ok", delay=DELAY) for _ in range(3)]
+    try:
+        llm = _registry(servers).get("synthesis")
+        threads = [threading.Thread(target=llm.invoke, args=("hi",)) for _ in range(6)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        _close(servers)
+
+    counts = [len(s.chat_requests()) for s in servers]
+    print(f"6 concurrent calls in {elapsed:.2f}s, per host: {counts}")
+    assert counts == [2, 2, 2]
+    assert all(s.peak_in_flight <= 2 for s in servers)
+
+
+def test_threads_stick_to_one_host_until_it_is_busy():
+    servers = [FakeOllama(reply="ok") for _ in range(2)]
+    try:
+        registry = _registry(servers)
+        llm = registry.get("quick")
+        for key in ("thread-a", "thread-b", "thread-a", "thread-b", "thread-a"):
+            with sticky_routing(key):
+                llm.invoke(f"question from {key}")
+        by_host = [{r["json"]["messages"][-1]["content"] for r in s.chat_requests()} for s in servers]
+        assert sorted(map(sorted, by_host)) == [["question from thread-a"], ["question from thread-b"]]
+
+        # Home host busier than the other by more than the slack: the call spills over
+        home = next(e for e in registry.pool.endpoints if e.host == registry.pool._sticky[("thread-a", llm.model)])
+        home.outstanding += 2
+        with sticky_routing("thread-a"):
+            spilled = registry.pool.pick(llm.model)
+            home.outstanding -= 2
+            back = registry.pool.pick(llm.model)
+        assert spilled is not home and back is home  # Binding kept once the load evens out
+        registry.pool.release(spilled)
+        registry.pool.release(back)
+    finally:
+        _close(servers)
+
+
+def test_calls_go_to_hosts_that_have_the_model():
+    small = FakeOllama(reply="small", models=("small-model",))
+    large = FakeOllama(reply="large", models=("large-model:latest",))
+    try:
+        registry = _registry([small, large])
+        assert registry.pool.probe_all() == 2
+        assert registry.get("planner", model="small-model").invoke("hi").content == "small"
+        assert registry.get("synthesis", model="large-model").invoke("hi").content == "large"
+        assert registry.stats()["endpoints"][large.url]["models"] == ["large-model:latest"]
+    finally:
+        _close([small, large])
+
+
+def test_unhealthy_host_is_ejected_retried_and_restored():
+    servers = [FakeOllama(reply="ok") for _ in range(2)]
+    down = servers[0]
+    try:
+        registry = _registry(servers, eject_after=1, eject_seconds=0.3)
+        llm = registry.get("synthesis")
+        down.healthy = False
+
+        # The failing host's 503 is retried on the other host, then the host is ejected
+        assert [llm.invoke("hi").content for _ in range(4)] == ["ok"] * 4
+        assert len(down.chat_requests()) == 1 and len(servers[1].chat_requests()) == 4
+        stats = registry.stats()["endpoints"][down.url]
+        assert not stats["healthy"] and stats["ejections"] == 1
+
+        # Probes skip it while ejected; once the window passes a probe restores it
+        down.healthy = True
+        assert registry.pool.probe_all() == 1
+        time.sleep(0.35)
+        assert registry.pool.probe_all() == 2
+        llm.invoke("hi")
+        assert len(down.chat_requests()) == 2
+    finally:
+        _close(servers)
+
+
+def test_single_host_keeps_the_direct_client():
+    server = FakeOllama(reply="pong")
+    try:
+        registry = LLMRegistry(base_url=server.url)
+        llm = registry.get("planner")
+        assert llm._pool is None and llm.invoke("ping").content == "pong"
+        assert registry.pool.start()._thread is None  # Nothing to probe
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_spread_over_hosts()
+    test_threads_stick_to_one_host_until_it_is_busy()
+    test_calls_go_to_hosts_that_have_the_model()
+    test_unhealthy_host_is_ejected_retried_and_restored()
+    test_single_host_keeps_the_direct_client()
+    print("✅ All endpoint pool tests passed!")
@@ -0,0 +1,86 @@
+# test_evidence_dedup.py
+"""
+Tests for near-duplicate evidence elimination across deep-research iterations.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import graph.nodes_exec as nodes_exec
+from utils.evidence_dedup import EvidenceDeduplicator, canonicalize_url, hamming_distance, simhash
+
+
+ARTICLE = (
+    "Apache Kafka stores records in an append-only partitioned log, which lets consumers "
+    "replay history and gives strong ordering guarantees within a partition. RabbitMQ "
+    "routes messages through exchanges to queues and deletes them once acknowledged."
+)
+SYNDICATED = ARTICLE.replace("RabbitMQ routes", "RabbitMQ, by contrast, routes")
+UNRELATED = (
+    "PostgreSQL logical replication streams row changes from the write-ahead log to "
+    "subscribers, which makes it a common building block for change data capture."
+)
+
+
+def test_canonicalize_url():
+    assert canonicalize_url("http://www.Example.com/blog/post/?utm_source=x&b=2&a=1#intro") == \
+        "https://example.com/blog/post?a=1&b=2"
+    assert canonicalize_url("https://example.com/blog/post/amp/") == canonicalize_url("https://example.com/blog/post")
+    assert canonicalize_url("https://m.example.com/blog/post") == "https://example.com/blog/post"
+
+
+def test_simhash_similarity():
+    assert hamming_distance(simhash(ARTICLE), simhash(SYNDICATED)) <= 6
+    assert hamming_distance(simhash(ARTICLE), simhash(UNRELATED)) > 20
+
+
+def test_duplicates_dropped_across_iterations():
+    first = EvidenceDeduplicator()
+    kept = first.filter([
+        {"title": "Kafka vs RabbitMQ", "url": "https://blog.example.com/kafka", "content": ARTICLE},
+        {"title": "Syndicated", "url": "https://news.example.org/kafka-copy", "content": SYNDICATED},
+    ])
+    assert len(kept) == 1
+    assert kept[0]["also_reported_by"] == ["https://news.example.org/kafka-copy"]
+    assert first.merged == 1
+
+    # Next iteration starts from the fingerprints stored in graph state
+    second = EvidenceDeduplicator(first.new_fingerprints)
+    kept = second.filter([
+        {"title": "Same page", "url": "http://www.blog.example.com/kafka/?utm_medium=rss", "content": "short"},
+        {"title": "Another copy", "url": "https://mirror.example.net/k", "content": SYNDICATED},
+        {"title": "CDC", "url": "https://pg.example.com/cdc", "content": UNRELATED},
+    ])
+    assert [r["title"] for r in kept] == ["CDC"]
+    assert second.dropped == 2
+    assert second.stats()["bytes_saved"] == len("short") + len(SYNDICATED)
+    assert second.stats()["tokens_saved"] > 0
+
+
+class RepeatingSearch:
+    name = "repeat"
+
+    def invoke(self, query):
+        return [{"title": "Kafka", "url": "https://blog.example.com/kafka", "content": ARTICLE}]
+
+
+def test_deep_mode_reports_savings():
+    nodes_exec.search_tool = RepeatingSearch()
+    state = {"query": "kafka ordering", "iterations": 0, "gaps": [], "history": [], "searched_queries": []}
+
+    first = nodes_exec.deep_mode_orchestrator(state)
+    assert len(first["research_data"]) == 1
+
+    state.update(first, gaps=["consumer replay"])
+    second = nodes_exec.deep_mode_orchestrator(state)
+    assert second["research_data"] == []
+    assert second["dedup_stats"]["dropped"] == 1
+    assert second["dedup_stats"]["bytes_saved"] == len(ARTICLE)
+
+
+if __name__ == "__main__":
+    test_canonicalize_url()
+    test_simhash_similarity()
+    test_duplicates_dropped_across_iterations()
+    test_deep_mode_reports_savings()
+    print("✅ All evidence dedup tests passed!")
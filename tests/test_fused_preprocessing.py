@@ -0,0 +1,76 @@
+# test_fused_preprocessing.py
+"""
+Tests for fused intent + planning pre-processing, against a local fake Ollama server.
+"""
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+import utils.llm_registry as llm_registry
+from config import Config
+from graph.nodes_pre import intent_orchestrator
+from graph.nodes_exec import planner_router
+
+
+def _triage_reply(request):
+    """Answers the triage prompt (with a mode if asked for one) or the planner prompt."""
+    prompt = " ".join(m.get("content", "") for m in request["messages"])
+    if "Return ONLY the single word" in prompt:
+        return "deep"
+    answer = {"category": "COMPARISON", "confidence_score": 0.9, "is_clear": True, "clarification_question": ""}
+    if '"mode"' in prompt:
+        answer["mode"] = "deep"
+    return json.dumps(answer)
+
+
+def _run(fused, reply=_triage_reply):
+    server = FakeOllama(reply=reply)
+    saved = (Config.FUSED_PREPROCESSING_ENABLED, Config.LLM_CACHE_ENABLED, Config.INTENT_KNN_ENABLED,
+             llm_registry._registry)
+    Config.FUSED_PREPROCESSING_ENABLED = fused
+    Config.LLM_CACHE_ENABLED = False
+    Config.INTENT_KNN_ENABLED = False
+    llm_registry._registry = llm_registry.LLMRegistry(base_url=server.url)
+    try:
+        query = "Kafka vs Pulsar for event streaming"
+        state = {"query": query, "history": [{"role": "user", "content": query}], "token_usage": 0}
+        state.update(intent_orchestrator(state))
+        if state.get("mode") not in ("quick", "deep"):
+            state.update(planner_router(state))  # What the graph does without a fused mode
+        return state, len(server.chat_requests())
+    finally:
+        (Config.FUSED_PREPROCESSING_ENABLED, Config.LLM_CACHE_ENABLED, Config.INTENT_KNN_ENABLED,
+         llm_registry._registry) = saved
+        server.close()
+
+
+def test_fused_call_returns_intent_and_mode_in_one_round_trip():
+    state, calls = _run(fused=True)
+    assert calls == 1
+    assert state["mode"] == "deep"
+    assert state["intent"] == "Research" and state["is_clarified"] and state["confidence_score"] == 0.9
+
+
+def test_two_call_path_is_kept_behind_the_setting():
+    state, calls = _run(fused=False)
+    assert calls == 2
+    assert state["mode"] == "deep"
+    assert state["intent"] == "Research"
+
+
+def test_fused_reply_without_mode_falls_back_to_planner():
+    reply = lambda request: ("deep" if "Return ONLY the single word" in request["messages"][0]["content"]
+                             else '{"category": "BUG", "confidence_score": 0.95, "is_clear": true}')
+    state, calls = _run(fused=True, reply=reply)
+    assert calls == 2
+    assert state["mode"] == "deep" and state["intent"] == "Bug Fix"
+
+
+if __name__ == "__main__":
+    test_fused_call_returns_intent_and_mode_in_one_round_trip()
+    test_two_call_path_is_kept_behind_the_setting()
+    test_fused_reply_without_mode_falls_back_to_planner()
+    print("✅ All fused pre-processing tests passed!")
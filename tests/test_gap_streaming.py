@@ -0,0 +1,86 @@
+# test_gap_streaming.py
+"""
+Tests for incremental JSON parsing of the streamed gap analysis and early
+termination once the routing fields are known, against a local fake Ollama server.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+import utils.llm_registry as llm_registry
+from config import Config
+from graph.nodes_exec import gap_analysis_node
+from utils.stream_json import IncrementalJSONObject
+
+TOKEN_DELAY = 0.02
+PROSE = " ".join(["This assessment reflects the evidence gathered so far."] * 10)
+
+
+def test_parser_reads_fields_as_they_complete():
+    parser = IncrementalJSONObject()
+    text = 'Sure! ```json\n{"confidence_score": 0.45, "gaps": ["a, b", "c]"], "note": "say \\"hi\\""}\n``` Done.'
+    seen = []
+    for char in text:
+        fields = parser.feed(char)
+        if fields and (not seen or fields != seen[-1]):
+            seen.append(dict(fields))
+    assert seen[0] == {"confidence_score": 0.45}
+    assert seen[1]["gaps"] == ["a, b", "c]"]  # Complete at its closing bracket
+    assert parser.fields["note"] == 'say "hi"' and parser.done
+
+
+def test_parser_ignores_malformed_values():
+    parser = IncrementalJSONObject()
+    parser.feed('{"confidence_score": high, "gaps": []}')
+    assert parser.fields == {"gaps": []}
+
+
+def _run_gap(reply):
+    server = FakeOllama(reply=reply, token_delay=TOKEN_DELAY)
+    saved = llm_registry._registry, Config.GAP_ANALYSIS_COMPRESSION_ENABLED
+    llm_registry._registry = llm_registry.LLMRegistry(base_url=server.url)
+    Config.GAP_ANALYSIS_COMPRESSION_ENABLED = False
+    state = {"query": "Kafka vs Pulsar", "history": [], "research_data": [{"content": "Kafka stores logs."}],
+             "token_usage": 0, "budget_limit": 16000, "gaps": []}
+    try:
+        start = time.perf_counter()
+        result = gap_analysis_node(state)
+        elapsed = time.perf_counter() - start
+        return result, elapsed, llm_registry._registry.stats()
+    finally:
+        llm_registry._registry, Config.GAP_ANALYSIS_COMPRESSION_ENABLED = saved
+        server.close()
+
+
+def test_low_confidence_stops_after_gap_list():
+    reply = '{"confidence_score": 0.4, "gaps": ["latency", "cost"], "contradictions": []} ' + PROSE
+    full_stream = len(reply.split(" ")) * TOKEN_DELAY
+    result, elapsed, stats = _run_gap(reply)
+    print(f"gap analysis {elapsed:.3f}s vs {full_stream:.3f}s for the full stream")
+    assert result["confidence_score"] == 0.4 and result["gaps"] == ["latency", "cost"]
+    assert elapsed < full_stream / 2
+    assert stats["in_flight"] == 0  # Closing the stream released the slot
+    assert result["token_usage_by_node"]["gap_analysis"]["completion"] > 0
+
+
+def test_high_confidence_stops_after_score():
+    result, elapsed, _ = _run_gap('{"confidence_score": 0.92, "gaps": ["minor detail"]} ' + PROSE)
+    assert result["confidence_score"] == 0.92 and result["gaps"] == []
+    assert elapsed < 10 * TOKEN_DELAY + 1.0
+
+
+def test_prose_only_reply_uses_fallback():
+    result, _, _ = _run_gap("Confidence: 0.6 Gaps: latency, cost")
+    assert result["confidence_score"] == 0.6 and result["gaps"] == ["latency", "cost"]
+
+
+if __name__ == "__main__":
+    test_parser_reads_fields_as_they_complete()
+    test_parser_ignores_malformed_values()
+    test_low_confidence_stops_after_gap_list()
+    test_high_confidence_stops_after_score()
+    test_prose_only_reply_uses_fallback()
+    print("✅ All gap streaming tests passed!")
@@ -0,0 +1,140 @@
+# test_hedged_search.py
+"""
+Tests for hedged search and per-provider circuit breaking, using fake providers.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.hedged_search import CircuitBreaker, HedgedSearch
+from utils.rate_limit import RateLimitTimeout
+
+
+def provider(name, delay=0.0, fail=False, empty=False):
+    calls = []
+
+    def call(query):
+        calls.append(query)
+        time.sleep(delay)
+        if fail:
+            raise ConnectionError(f"{name} is down")
+        if empty:
+            return []
+        return [{"title": name, "url": f"https://{name}.example", "content": query}]
+
+    call.calls = calls
+    return call
+
+
+def test_fast_primary_does_not_hedge():
+    primary, secondary = provider("tavily", 0.01), provider("duckduckgo")
+    search = HedgedSearch([("tavily", primary), ("duckduckgo", secondary)], default_hedge_delay=0.5)
+
+    assert search.invoke("kafka")[0]["title"] == "tavily"
+    assert secondary.calls == []
+    assert search.hedges_fired == 0
+
+
+def test_slow_primary_is_hedged():
+    primary, secondary = provider("tavily", 1.0), provider("duckduckgo", 0.01)
+    search = HedgedSearch([("tavily", primary), ("duckduckgo", secondary)], default_hedge_delay=0.1)
+
+    start = time.time()
+    results = search.invoke("kafka")
+    assert time.time() - start < 0.5
+    assert results[0]["title"] == "duckduckgo"
+    assert search.hedges_fired == 1
+    assert search.hedge_wins == 1
+
+
+def test_failing_primary_falls_back_immediately():
+    primary, secondary = provider("tavily", fail=True), provider("duckduckgo")
+    search = HedgedSearch([("tavily", primary), ("duckduckgo", secondary)], default_hedge_delay=5.0)
+
+    start = time.time()
+    assert search.invoke("kafka")[0]["title"] == "duckduckgo"
+    assert time.time() - start < 1.0
+
+
+def test_circuit_opens_and_skips_degraded_provider():
+    primary, secondary = provider("tavily", fail=True), provider("duckduckgo")
+    search = HedgedSearch(
+        [("tavily", primary), ("duckduckgo", secondary)],
+        failure_threshold=2,
+        cooldown_seconds=60,
+    )
+    search.invoke("q1")
+    search.invoke("q2")
+    assert search.breakers["tavily"].state == CircuitBreaker.OPEN
+
+    search.invoke("q3")
+    assert primary.calls == ["q1", "q2"]
+    stats = search.stats()["providers"]
+    assert stats["tavily"]["errors"] == 2
+    assert stats["duckduckgo"]["successes"] == 3
+
+
+def test_half_open_trial_closes_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=0.05)
+    breaker.record(0.1, ok=False)
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()          # single trial call
+    assert not breaker.allow()
+    breaker.record(0.1, ok=True)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_rate_limit_timeout_frees_half_open_trial():
+    def acquire(name):
+        if name == "tavily" and limited:
+            raise RateLimitTimeout(name, 1.0)
+
+    primary, secondary = provider("tavily"), provider("duckduckgo")
+    search = HedgedSearch([("tavily", primary), ("duckduckgo", secondary)], acquire=acquire)
+    breaker = search.breakers["tavily"]
+    breaker.state, breaker.opened_at = CircuitBreaker.OPEN, time.monotonic() - breaker.cooldown_seconds
+
+    limited = True
+    assert search.invoke("q1")[0]["title"] == "duckduckgo"
+    assert breaker.state == CircuitBreaker.HALF_OPEN and not breaker._trial_in_flight
+
+    limited = False
+    assert search.invoke("q2")[0]["title"] == "tavily"  # The trial is sent once the limiter lets it
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_empty_results_do_not_trip_the_breaker():
+    primary, secondary = provider("tavily", empty=True), provider("duckduckgo")
+    search = HedgedSearch([("tavily", primary), ("duckduckgo", secondary)], failure_threshold=2)
+    for query in ("q1", "q2", "q3"):
+        assert search.invoke(query)[0]["title"] == "duckduckgo"  # The backup's hits still win
+    assert search.breakers["tavily"].state == CircuitBreaker.CLOSED
+    assert primary.calls == ["q1", "q2", "q3"]
+
+    nothing = HedgedSearch([("a", provider("a", empty=True)), ("b", provider("b", empty=True))])
+    assert nothing.invoke("niche sub-query") == []
+    assert nothing.stats()["providers"]["a"]["errors"] == 0
+
+
+def test_all_providers_failing_raises():
+    search = HedgedSearch([("a", provider("a", fail=True)), ("b", provider("b", fail=True))])
+    try:
+        search.invoke("kafka")
+    except RuntimeError as e:
+        assert "a is down" in str(e) and "b is down" in str(e)
+    else:
+        raise AssertionError("expected RuntimeError")
+
+
+if __name__ == "__main__":
+    test_fast_primary_does_not_hedge()
+    test_slow_primary_is_hedged()
+    test_failing_primary_falls_back_immediately()
+    test_circuit_opens_and_skips_degraded_provider()
+    test_half_open_trial_closes_breaker()
+    test_rate_limit_timeout_frees_half_open_trial()
+    test_empty_results_do_not_trip_the_breaker()
+    test_all_providers_failing_raises()
+    print("✅ All hedged search tests passed!")
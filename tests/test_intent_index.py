@@ -0,0 +1,96 @@
+# test_intent_index.py
+"""
+Tests for the local kNN intent classifier and its fast path in intent_orchestrator.
+Runs against a throwaway embedded Qdrant, a hashed bag-of-words embedder and a fake Ollama server.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from qdrant_client import QdrantClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+import intent_index
+import utils.llm_registry as llm_registry
+from config import Config
+from intent_index import IntentIndex
+from utils.embeddings import hashing_embed
+
+
+def _index(**kwargs):
+    params = {"min_similarity": 0.5, "min_agreement": 0.8, "min_neighbours": 3}
+    params.update(kwargs)
+    return IntentIndex(QdrantClient(path=tempfile.mkdtemp()), "test_intents", embed_fn=hashing_embed, **params)
+
+
+def test_agreeing_neighbours_decide():
+    index = _index()
+    for q in ("What is CDC in Postgres?", "What is CDC in MySQL?", "What is CDC in Kafka Connect?"):
+        index.learn(q, "CONCEPT", True, 0.95, mode="quick")
+    index.learn("Kafka vs Pulsar for event streaming", "COMPARISON", True, 0.9, mode="deep")
+
+    decision = index.classify(index.embed("What is CDC in Oracle?"), require_mode=True)
+    assert decision["category"] == "CONCEPT" and decision["mode"] == "quick"
+    assert decision["is_clear"] and decision["neighbours"] == 3
+
+    # Too far from anything labelled
+    assert index.classify(index.embed("How do I tune JVM garbage collection pauses?")) is None
+
+
+def test_disagreement_and_missing_mode_fall_back():
+    index = _index()
+    index.learn("What is CDC in Postgres?", "CONCEPT", True, 0.95, mode="quick")
+    index.learn("What is CDC in MySQL?", "RESEARCH", True, 0.9, mode="deep")
+    index.learn("What is CDC in Kafka Connect?", "CONCEPT", True, 0.95, mode="deep")
+    assert index.classify(index.embed("What is CDC in Oracle?")) is None
+
+    # A near-identical earlier query is enough on its own, but only with a mode when one is required
+    single = _index()
+    single.learn("Explain the saga pattern", "CONCEPT", True, 0.95)
+    assert single.classify(single.embed("explain the saga pattern"))["category"] == "CONCEPT"
+    assert single.classify(single.embed("explain the saga pattern"), require_mode=True) is None
+
+
+def test_intent_orchestrator_learns_then_skips_the_llm():
+    from graph.nodes_pre import intent_orchestrator
+
+    answer = {"category": "CONCEPT", "confidence_score": 0.95, "is_clear": True,
+              "clarification_question": "", "mode": "quick"}
+    server = FakeOllama(reply=json.dumps(answer))
+    saved = (Config.INTENT_KNN_ENABLED, Config.LLM_CACHE_ENABLED, Config.FUSED_PREPROCESSING_ENABLED,
+             llm_registry._registry, intent_index._intent_index)
+    Config.INTENT_KNN_ENABLED, Config.LLM_CACHE_ENABLED, Config.FUSED_PREPROCESSING_ENABLED = True, False, True
+    llm_registry._registry = llm_registry.LLMRegistry(base_url=server.url)
+    intent_index._intent_index = _index()
+    try:
+        query = "What is change data capture?"
+        state = {"query": query, "history": [{"role": "user", "content": query}], "token_usage": 0}
+        first = intent_orchestrator(state)
+        assert first["mode"] == "quick" and len(server.chat_requests()) == 1
+
+        start = time.perf_counter()
+        second = intent_orchestrator(state)
+        assert time.perf_counter() - start < 0.5
+        assert len(server.chat_requests()) == 1  # Served by the index
+        assert second["intent"] == "General Question" and second["mode"] == "quick"
+        assert second["is_clarified"] and second["confidence_score"] == 0.95
+
+        # Follow-up turns always go to the LLM
+        follow_up = dict(state, history=[{"role": "assistant", "content": "CDC is ..."}] + state["history"])
+        intent_orchestrator(follow_up)
+        assert len(server.chat_requests()) == 2
+    finally:
+        (Config.INTENT_KNN_ENABLED, Config.LLM_CACHE_ENABLED, Config.FUSED_PREPROCESSING_ENABLED,
+         llm_registry._registry, intent_index._intent_index) = saved
+        server.close()
+
+
+if __name__ == "__main__":
+    test_agreeing_neighbours_decide()
+    test_disagreement_and_missing_mode_fall_back()
+    test_intent_orchestrator_learns_then_skips_the_llm()
+    print("✅ All intent index tests passed!")
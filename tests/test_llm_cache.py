@@ -0,0 +1,136 @@
+# test_llm_cache.py
+"""
+Tests for the exact + semantic LLM response cache, against a local fake Ollama server.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+from utils.embeddings import hashing_embed
+from utils.llm_cache import LLMResponseCache
+from utils.llm_registry import LLMRegistry
+
+
+def _messages(query):
+    return [SystemMessage(content="Classify the query. Answer quick or deep."), HumanMessage(content=query)]
+
+
+def _make_cache(db_path, **kwargs):
+    params = {"ttl_seconds": 60, "max_entries": 100, "semantic_threshold": 0.9, "embed_fn": hashing_embed}
+    params.update(kwargs)
+    return LLMResponseCache(db_path, **params)
+
+
+def test_exact_hit_skips_the_llm_and_persists():
+    server = FakeOllama(reply="deep")
+    try:
+        llm = LLMRegistry(base_url=server.url).get("planner", model="fake-model")
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, "llm_cache.sqlite")
+            cache = _make_cache(db)
+            query = "Kafka vs Pulsar for event streaming"
+            assert cache.invoke(llm, _messages(query), semantic_text=query).content == "deep"
+            assert len(server.chat_requests()) == 1
+
+            start = time.perf_counter()
+            hit = cache.invoke(llm, _messages(query), semantic_text=query)
+            elapsed = time.perf_counter() - start
+            assert hit.content == "deep" and hit.response_metadata["cache"] == "exact"
+            assert elapsed < 0.01
+            assert len(server.chat_requests()) == 1
+
+            # A new process sees the stored answer
+            reopened = _make_cache(db)
+            assert reopened.invoke(llm, _messages(query), semantic_text=query).response_metadata["cache"] == "exact"
+            assert len(server.chat_requests()) == 1
+    finally:
+        server.close()
+
+
+def test_semantic_hit_respects_scope_and_model():
+    server = FakeOllama(reply="quick")
+    try:
+        registry = LLMRegistry(base_url=server.url)
+        llm = registry.get("intent", model="fake-model")
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = _make_cache(os.path.join(tmp, "llm_cache.sqlite"))
+            cache.invoke(llm, _messages("What is CDC?"), semantic_text="What is CDC?")
+
+            hit = cache.invoke(llm, _messages("what is CDC"), semantic_text="what is CDC")
+            assert hit.response_metadata["cache"] == "semantic"
+            assert len(server.chat_requests()) == 1
+
+            # Different earlier history, different query or different model: no reuse
+            cache.invoke(llm, _messages("what is CDC"), semantic_text="what is CDC", scope="user: we use Postgres")
+            cache.invoke(llm, _messages("How does Raft elect a leader?"), semantic_text="How does Raft elect a leader?")
+            other_model = registry.get("intent", model="other-model")
+            cache.invoke(other_model, _messages("What is CDC?"), semantic_text="What is CDC?")
+            assert len(server.chat_requests()) == 4
+
+            stats = cache.stats()
+            assert stats["semantic_hits"] == 1 and stats["misses"] == 4
+    finally:
+        server.close()
+
+
+def test_roles_and_prompt_templates_do_not_share_answers():
+    server = FakeOllama(reply=lambda request: request["messages"][0]["content"].split()[0])
+    try:
+        registry = LLMRegistry(base_url=server.url)
+        intent = registry.get("intent", lane="routing", model="fake-model")
+        planner = registry.get("planner", lane="routing", model="fake-model")
+        triage = [SystemMessage(content="Triage the query as JSON."), HumanMessage(content="Kafka vs Pulsar")]
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = _make_cache(os.path.join(tmp, "llm_cache.sqlite"))
+            assert cache.invoke(intent, triage, semantic_text="Kafka vs Pulsar").content == "Triage"
+            # Same query, same params and empty scope: the planner still asks the model
+            plan = cache.invoke(planner, _messages("Kafka vs Pulsar"), semantic_text="Kafka vs Pulsar")
+            assert plan.content == "Classify"
+            # Same prompt under another role, and another template under the same role
+            cache.invoke(planner, triage, semantic_text="Kafka vs Pulsar")
+            cache.invoke(intent, _messages("Kafka vs Pulsar"), semantic_text="Kafka vs Pulsar")
+            assert len(server.chat_requests()) == 4
+            assert cache.stats()["exact_hits"] == cache.stats()["semantic_hits"] == 0
+    finally:
+        server.close()
+
+
+def test_ttl_eviction_and_temperature_bypass():
+    server = FakeOllama(reply="quick")
+    try:
+        registry = LLMRegistry(base_url=server.url)
+        llm = registry.get("planner", model="fake-model")
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = _make_cache(os.path.join(tmp, "llm_cache.sqlite"), ttl_seconds=0.2, max_entries=2,
+                                semantic_threshold=None)
+            cache.invoke(llm, _messages("a"))
+            time.sleep(0.3)
+            cache.invoke(llm, _messages("a"))
+            assert len(server.chat_requests()) == 2  # Expired entry is not served
+
+            cache.ttl_seconds = 60
+            for q in ("a", "b", "c"):
+                cache.invoke(llm, _messages(q))
+            assert cache.stats()["entries"] == 2  # LRU bound
+
+            warm = registry.get("planner", model="fake-model", temperature=0.7)
+            before = len(server.chat_requests())
+            cache.invoke(warm, _messages("c"))
+            cache.invoke(warm, _messages("c"))
+            assert len(server.chat_requests()) == before + 2
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    test_exact_hit_skips_the_llm_and_persists()
+    test_semantic_hit_respects_scope_and_model()
+    test_roles_and_prompt_templates_do_not_share_answers()
+    test_ttl_eviction_and_temperature_bypass()
+    print("✅ All LLM cache tests passed!")
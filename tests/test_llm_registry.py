@@ -0,0 +1,82 @@
+# test_llm_registry.py
+"""
+Tests for the shared LLM client registry, against a local fake Ollama server.
+"""
+import os
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+from utils.llm_registry import LLMRegistry, ollama_host
+
+
+def test_ollama_host_strips_api_path():
+    assert ollama_host("http://10.0.0.5:11434/api/generate") == "http://10.0.0.5:11434"
+    assert ollama_host("localhost:11434") == "http://localhost:11434"
+
+
+def test_roles_are_cached_and_share_one_http_pool():
+    server = FakeOllama(reply="pong")
+    try:
+        registry = LLMRegistry(base_url=server.url + "/api/generate", max_in_flight=2)
+        planner = registry.get("planner")
+        assert registry.get("planner") is planner
+        synthesis = registry.get("synthesis", num_predict=64)
+        assert synthesis is not planner
+        assert synthesis._client is planner._client
+
+        for _ in range(3):
+            assert planner.invoke("ping").content == "pong"
+        assert "".join(c.content for c in synthesis.stream("ping")) == "pong"
+        # Four sequential calls reuse one keep-alive connection
+        assert len(server.connections) == 1
+        assert server.chat_requests()[-1]["json"]["options"]["num_predict"] == 64
+    finally:
+        server.close()
+
+
+def test_in_flight_limit_and_stats():
+    server = FakeOllama(reply="slow answer", delay=0.2)
+    try:
+        registry = LLMRegistry(base_url=server.url, max_in_flight=2)
+        llm = registry.get("deep")
+        threads = [threading.Thread(target=llm.invoke, args=("hi",)) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert server.peak_in_flight <= 2
+        stats = registry.stats()
+        assert stats["peak_in_flight"] == 2
+        assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+        role = stats["roles"]["deep"]
+        assert role["calls"] == 6 and role["errors"] == 0
+        assert role["p95_queue_wait"] >= 0.2  # Later calls waited for a slot
+        assert role["p50_latency"] >= 0.2
+    finally:
+        server.close()
+
+
+def test_early_stream_close_releases_slot():
+    server = FakeOllama(reply="one two three four five six")
+    try:
+        registry = LLMRegistry(base_url=server.url, max_in_flight=1)
+        stream = registry.get("gap").stream("hi")
+        next(stream)
+        stream.close()
+        assert registry.stats()["in_flight"] == 0
+        assert registry.get("gap").invoke("hi").content == "one two three four five six"
+        assert registry.stats()["roles"]["gap"]["errors"] == 0
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    test_ollama_host_strips_api_path()
+    test_roles_are_cached_and_share_one_http_pool()
+    test_in_flight_limit_and_stats()
+    test_early_stream_close_releases_slot()
+    print("✅ All LLM registry tests passed!")
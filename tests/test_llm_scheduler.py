@@ -0,0 +1,127 @@
+# test_llm_scheduler.py
+"""
+Tests for LLM priority lanes: priority order, per-lane caps, aging, and the
+per-lane queue-wait histograms, with the scheduler alone and through the
+registry against a local fake Ollama server.
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+from utils.llm_registry import LLMRegistry
+from utils.llm_scheduler import LLMScheduler
+
+
+def _queue(scheduler, lane, order, hold=0.0):
+    def run():
+        scheduler.acquire(lane)
+        order.append(lane)
+        time.sleep(hold)
+        scheduler.release(lane)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_queued(scheduler, lane, count=1):
+    deadline = time.monotonic() + 2
+    while scheduler.stats()[lane]["queued"] < count and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_interactive_lane_goes_first():
+    scheduler = LLMScheduler(max_in_flight=1, aging_seconds=60)
+    scheduler.acquire("research")  # A long synthesis holds the only slot
+    order = []
+    threads = []
+    for lane in ("background", "research", "routing", "interactive"):
+        threads.append(_queue(scheduler, lane, order))
+        _wait_queued(scheduler, lane)
+    scheduler.release("research")
+    for t in threads:
+        t.join()
+    assert order == ["interactive", "routing", "research", "background"]
+
+
+def test_lane_cap_limits_concurrency():
+    scheduler = LLMScheduler(max_in_flight=4, lane_caps={"research": 1}, aging_seconds=60)
+    peak = []
+    lock = threading.Lock()
+    running = [0]
+
+    def research():
+        scheduler.acquire("research")
+        with lock:
+            running[0] += 1
+            peak.append(running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        scheduler.release("research")
+
+    threads = [threading.Thread(target=research) for _ in range(4)]
+    for t in threads:
+        t.start()
+    # Interactive work still gets a slot while research is capped
+    start = time.monotonic()
+    scheduler.acquire("interactive")
+    assert time.monotonic() - start < 0.05
+    scheduler.release("interactive")
+    for t in threads:
+        t.join()
+    assert max(peak) == 1
+
+
+def test_aging_prevents_starvation():
+    scheduler = LLMScheduler(max_in_flight=1, aging_seconds=0.05)
+    scheduler.acquire("interactive")
+    order = []
+    background = _queue(scheduler, "background", order)
+    _wait_queued(scheduler, "background")
+    time.sleep(0.2)  # Aged by four lanes: now ahead of a fresh interactive request
+    interactive = _queue(scheduler, "interactive", order)
+    _wait_queued(scheduler, "interactive")
+    scheduler.release("interactive")
+    background.join()
+    interactive.join()
+    assert order == ["background", "interactive"]
+
+
+def test_registry_tags_calls_and_exports_wait_histograms():
+    server = FakeOllama(reply="ok", delay=0.1)
+    try:
+        registry = LLMRegistry(base_url=server.url, max_in_flight=1)
+        synthesis = registry.get("synthesis", lane="research")
+        quick = registry.get("quick")
+        assert quick.lane == "interactive" and synthesis.lane == "research"
+
+        threads = [threading.Thread(target=synthesis.invoke, args=("long report",)) for _ in range(3)]
+        for t in threads:
+            t.start()
+        _wait_queued(registry.scheduler, "research", 2)
+        start = time.monotonic()
+        quick.invoke("what is cdc?")
+        quick_wait = time.monotonic() - start
+        for t in threads:
+            t.join()
+
+        assert quick_wait < 0.35  # Behind at most the running synthesis, not the queued ones
+        lanes = registry.stats()["lanes"]
+        assert lanes["interactive"]["calls"] == 1 and lanes["research"]["calls"] == 3
+        histogram = lanes["research"]["wait_histogram"]
+        assert histogram["+Inf"] == 3 and histogram["0.01"] >= 1  # First call did not wait
+        assert lanes["research"]["p95_wait"] >= 0.1
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    test_interactive_lane_goes_first()
+    test_lane_cap_limits_concurrency()
+    test_aging_prevents_starvation()
+    test_registry_tags_calls_and_exports_wait_histograms()
+    print("✅ All LLM scheduler tests passed!")
@@ -0,0 +1,99 @@
+# test_local_corpus.py
+"""
+Tests for the local document corpus: incremental indexing and hybrid retrieval.
+Runs against a throwaway embedded Qdrant and a hashed bag-of-words embedder.
+"""
+import os
+import re
+import sys
+import tempfile
+import zlib
+
+import numpy as np
+from qdrant_client import QdrantClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from corpus import LocalCorpus, lexical_terms
+from graph.nodes_exec import LocalCorpusSearch
+
+
+def bow_embed(texts):
+    bow_embed.calls += len(texts)
+    vectors = np.zeros((len(texts), 256), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for word in re.findall(r"\w{3,}", text.lower()):
+            vectors[i, zlib.crc32(word.encode()) % 256] += 1
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _write(root, rel_path, text):
+    path = os.path.join(root, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _corpus():
+    bow_embed.calls = 0
+    client = QdrantClient(path=tempfile.mkdtemp())
+    return LocalCorpus(client, "test_corpus", embed_fn=bow_embed)
+
+
+def test_incremental_indexing():
+    docs = tempfile.mkdtemp()
+    _write(docs, "ledger.md", "# Ledger service\n\nThe ledger consumes payment events from Kafka.")
+    _write(docs, "src/outbox.py", "def publish_outbox():\n    # CDC relay for the outbox table\n    pass\n")
+    _write(docs, "image.png", "not text")
+    corpus = _corpus()
+
+    assert corpus.index_directory(docs)["indexed"] == 2
+    calls_after_first = bow_embed.calls
+
+    # Nothing changed: no files re-embedded
+    stats = corpus.index_directory(docs)
+    assert stats["indexed"] == 0 and stats["unchanged"] == 2
+    assert bow_embed.calls == calls_after_first
+
+    _write(docs, "ledger.md", "# Ledger service\n\nThe ledger now consumes payment events from Pulsar.")
+    os.remove(os.path.join(docs, "src/outbox.py"))
+    stats = corpus.index_directory(docs)
+    assert (stats["indexed"], stats["unchanged"], stats["removed"]) == (1, 0, 1)
+    assert corpus.search("outbox CDC relay")[0]["title"] == "ledger.md"  # outbox.py is gone
+    assert "Pulsar" in corpus.search("ledger payment events")[0]["content"]
+
+
+def test_hybrid_search_and_provider():
+    docs = tempfile.mkdtemp()
+    _write(docs, "runbooks/rabbitmq.md", "RabbitMQ cluster runbook: quorum queues and mirrored queues.")
+    _write(docs, "runbooks/kafka.md", "Kafka runbook: rebalancing consumer groups and ISR shrinkage.")
+    corpus = _corpus()
+
+    provider = LocalCorpusSearch(corpus, corpus_dir=docs, max_results=1)
+    results = provider.invoke("How do we handle ISR shrinkage in Kafka?")
+    assert results[0]["title"] == os.path.join("runbooks", "kafka.md")
+    assert results[0]["url"].startswith("file://")
+    assert "ISR shrinkage" in results[0]["content"]
+
+
+def test_keyword_leg_ranks_by_bm25_beyond_the_candidate_pool():
+    docs = tempfile.mkdtemp()
+    # Far more matching chunks than the keyword candidates (and the old 5x scroll limit)
+    for i in range(150):
+        _write(docs, f"notes/kafka_{i:03d}.md", f"How the Kafka consumer is deployed, part {i}. It is what it is.")
+    _write(docs, "notes/isr.md", "Kafka ISR shrinkage: the consumer lag grows when ISR shrinkage hits.")
+    corpus = _corpus()
+    corpus.index_directory(docs)
+
+    assert lexical_terms("How does the consumer handle it?") == ["consumer", "handle"]
+    hits = corpus._keyword_hits("How does the Kafka consumer handle ISR shrinkage?", candidates=20)
+    assert len(hits) == 20
+    assert hits[0].payload["path"] == os.path.join("notes", "isr.md")
+    assert corpus._keyword_hits("how is it what", candidates=20) == []  # Stopwords alone match nothing
+
+
+if __name__ == "__main__":
+    test_incremental_indexing()
+    test_hybrid_search_and_provider()
+    test_keyword_leg_ranks_by_bm25_beyond_the_candidate_pool()
+    print("✅ All local corpus tests passed!")
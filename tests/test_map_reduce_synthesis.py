@@ -0,0 +1,148 @@
+# test_map_reduce_synthesis.py
+"""
+Tests for map-reduce synthesis: evidence chunking, concurrent per-source notes,
+and the streamed reduce, against a local fake Ollama server.
+"""
+import os
+import re
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+import graph.nodes_exec as nodes_exec
+import utils.llm_registry as llm_registry
+from config import Config
+from graph.nodes_exec import _affordable_chunks, _evidence_chunks, structured_synthesis_node
+from prompts.research_prompts import SOURCE_NOTE_PROMPT
+from utils.streaming import clear_streaming_buffer, get_streaming_buffer
+from utils.token_budget import count_message_tokens, count_tokens
+
+NOTE_DELAY = 0.3
+
+
+def _reply(request):
+    messages = request["messages"]
+    if messages[0]["content"].strip().startswith("You condense"):
+        tags = sorted(set(re.findall(r"\[Source \d+", messages[-1]["content"])))
+        return " ".join(f"- {tag}] key fact." for tag in tags)
+    return "# Executive Summary Kafka and Pulsar compared."
+
+
+def _source(i, sentences=60):
+    return {"content": f"Source {i} fact about streaming https://example.com/{i}. " * sentences,
+            "source": "Web Search"}
+
+
+def test_chunks_group_small_sources_and_split_long_ones():
+    data = [{"content": "Short one.", "source": "A"}, {"content": "Short two.", "source": "B"},
+            {"content": "Long sentence here. " * 50, "source": "C"}]
+    chunks = _evidence_chunks(data, 300)
+    assert chunks[0].startswith("[Source 1: A]") and "[Source 2: B]" in chunks[0]
+    long_pieces = [c for c in chunks if "[Source 3: C]" in c]
+    assert len(long_pieces) > 1 and all(len(c) <= 300 for c in long_pieces)
+    text = "".join(c.replace("[Source 3: C]\n", "") for c in long_pieces)
+    assert text.count("Long sentence here.") == 50  # Nothing lost, no sentence cut
+
+
+def test_budget_keeps_the_most_relevant_chunks_in_order():
+    chunks = ["[Source 1: A]\nBananas ripen in warm kitchens.",
+              "[Source 2: B]\nKafka partitions replicate the streaming log.",
+              "[Source 3: C]\nTomatoes grow on vines in summer.",
+              "[Source 4: D]\nPulsar stores streaming segments in BookKeeper."]
+    query = "Kafka vs Pulsar streaming"
+    assert _affordable_chunks(chunks, 10**6, query, []) == chunks
+    overhead = count_message_tokens(SOURCE_NOTE_PROMPT.format_messages(query="", material=""))
+    two = 2 * (overhead + Config.SYNTHESIS_NOTE_TOKENS) + sum(count_tokens(c) for c in chunks[1::2])
+    # The late gap-filling chunk is kept over the early irrelevant ones
+    assert _affordable_chunks(chunks, two, query, []) == [chunks[1], chunks[3]]
+
+
+def _synthesize(data, reply=_reply):
+    server = FakeOllama(reply=reply, delay=NOTE_DELAY)
+    saved = llm_registry._registry, Config.PASSAGE_RERANK_ENABLED
+    llm_registry._registry = llm_registry.LLMRegistry(base_url=server.url, max_in_flight=4,
+                                                      lane_caps={"research": 4})
+    Config.PASSAGE_RERANK_ENABLED = False
+    state = {"query": "Kafka vs Pulsar", "history": [], "research_data": data, "gaps": [],
+             "token_usage": 0, "budget_limit": 100000, "query_id": "map_reduce_test"}
+    try:
+        result = structured_synthesis_node(state)
+        streamed = get_streaming_buffer("map_reduce_test").get_full_content()
+        return result, server, streamed
+    finally:
+        llm_registry._registry, Config.PASSAGE_RERANK_ENABLED = saved
+        clear_streaming_buffer("map_reduce_test")
+        server.close()
+
+
+def test_large_evidence_is_condensed_concurrently_without_dropping_sources():
+    data = [_source(i) for i in range(8)]
+    assert sum(len(d["content"]) for d in data) > Config.SYNTHESIS_CONTEXT_CHARS
+    result, server, streamed = _synthesize(data)
+
+    requests = server.chat_requests()
+    notes = [r for r in requests if r["json"]["messages"][0]["content"].strip().startswith("You condense")]
+    reduce_prompt = requests[-1]["json"]["messages"][-1]["content"]
+    # Timed on the fake's arrival stamps, from the first note call to the reduce call,
+    # so one-off setup in the node does not count
+    map_window = requests[-1]["time"] - notes[0]["time"]
+    sequential = len(notes) * NOTE_DELAY
+    print(f"map step {map_window:.2f}s for {len(notes)} notes vs {sequential:.2f}s sequential")
+
+    assert len(notes) >= 4 and server.peak_in_flight >= 3
+    assert notes[3]["time"] - notes[0]["time"] < NOTE_DELAY  # The first four notes start together
+    assert map_window < sequential / 2
+    assert all(f"[Source {i + 1}] key fact." in reduce_prompt for i in range(8))  # Every source reaches the reduce
+    assert streamed.startswith("# Executive Summary") and result["final_report"] == streamed.strip()
+    usage = result["token_usage_by_node"]
+    assert usage["synthesize_map"]["calls"] == len(notes) and usage["synthesize"]["calls"] == 1
+
+
+def test_small_evidence_uses_a_single_call():
+    result, server, _ = _synthesize([_source(0, sentences=3)])
+    assert len(server.chat_requests()) == 1
+    assert "synthesize_map" not in result["token_usage_by_node"]
+
+
+def _note_reply_failing_on(models):
+    def reply(request):
+        if request["model"] in models and request["messages"][0]["content"].strip().startswith("You condense"):
+            raise RuntimeError(f"model {request['model']} not found")
+        return _reply(request)
+    return reply
+
+
+def test_failed_small_model_notes_escalate_to_the_main_model():
+    data = [_source(i) for i in range(8)]
+    saved = Config.NODE_MODELS["synthesis_map"], Config.MODEL_CASCADE_ENABLED
+    Config.NODE_MODELS["synthesis_map"], Config.MODEL_CASCADE_ENABLED = ["small-model", "main-model"], True
+    try:
+        result, server, _ = _synthesize(data, reply=_note_reply_failing_on({"small-model"}))
+    finally:
+        Config.NODE_MODELS["synthesis_map"], Config.MODEL_CASCADE_ENABLED = saved
+    reduce_prompt = server.chat_requests()[-1]["json"]["messages"][-1]["content"]
+    assert all(f"[Source {i + 1}] key fact." in reduce_prompt for i in range(8))
+    assert result["token_usage_by_node"]["synthesize_map"]["calls"] >= 4
+
+
+def test_mostly_failed_notes_fall_back_to_ranked_passages():
+    data = [_source(i) for i in range(8)]
+    saved = nodes_exec.build_ranked_context
+    nodes_exec.build_ranked_context = lambda *args: "RANKED PASSAGES"
+    try:
+        _, server, _ = _synthesize(data, reply=_note_reply_failing_on(set(Config.NODE_MODELS["synthesis_map"])))
+    finally:
+        nodes_exec.build_ranked_context = saved
+    reduce_prompt = server.chat_requests()[-1]["json"]["messages"][-1]["content"]
+    assert "RANKED PASSAGES" in reduce_prompt and "Source 1 fact" not in reduce_prompt  # No head-truncated raw chunks
+
+
+if __name__ == "__main__":
+    test_chunks_group_small_sources_and_split_long_ones()
+    test_budget_keeps_the_most_relevant_chunks_in_order()
+    test_large_evidence_is_condensed_concurrently_without_dropping_sources()
+    test_small_evidence_uses_a_single_call()
+    test_failed_small_model_notes_escalate_to_the_main_model()
+    test_mostly_failed_notes_fall_back_to_ranked_passages()
+    print("✅ All map-reduce synthesis tests passed!")
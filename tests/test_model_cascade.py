@@ -0,0 +1,110 @@
+# test_model_cascade.py
+"""
+Tests for per-node model assignment and small-to-large escalation, against a
+local fake Ollama server whose answer depends on the requested model.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+import utils.llm_registry as llm_registry
+import utils.model_cascade as model_cascade
+from config import Config
+from graph.nodes_exec import gap_analysis_node, planner_router
+from graph.nodes_pre import intent_orchestrator
+from utils.model_cascade import ModelCascade
+
+MODELS = ["small-model", "large-model"]
+
+
+def _run(node, state, replies):
+    """Runs a node with both models answering from `replies` ({model: text}); returns (result, models asked, stats)."""
+    server = FakeOllama(reply=lambda request: replies[request["model"]])
+    saved = (llm_registry._registry, model_cascade._cascade, Config.NODE_MODELS, Config.LLM_CACHE_ENABLED,
+             Config.INTENT_KNN_ENABLED, Config.GAP_ANALYSIS_COMPRESSION_ENABLED)
+    llm_registry._registry = llm_registry.LLMRegistry(base_url=server.url)
+    model_cascade._cascade = ModelCascade()
+    Config.NODE_MODELS = {role: MODELS for role in ("intent", "planner", "gap_analysis", "clarify")}
+    Config.LLM_CACHE_ENABLED = Config.INTENT_KNN_ENABLED = Config.GAP_ANALYSIS_COMPRESSION_ENABLED = False
+    try:
+        result = node(state)
+        return result, [r["json"]["model"] for r in server.chat_requests()], model_cascade._cascade.stats()
+    finally:
+        (llm_registry._registry, model_cascade._cascade, Config.NODE_MODELS, Config.LLM_CACHE_ENABLED,
+         Config.INTENT_KNN_ENABLED, Config.GAP_ANALYSIS_COMPRESSION_ENABLED) = saved
+        server.close()
+
+
+def test_planner_escalates_unparsable_answer():
+    state = {"query": "Compare Kafka and Pulsar", "history": [], "token_usage": 0}
+    result, models, stats = _run(planner_router, state, {"small-model": "It depends on the use case.",
+                                                        "large-model": "deep"})
+    assert result["mode"] == "deep"
+    assert models == MODELS
+    assert stats["planner"]["escalations"] == 1 and stats["planner"]["reasons"] == {"rejected": 1}
+    assert set(stats["planner"]["p50_latency"]) == set(MODELS)
+    assert result["token_usage_by_node"]["planner"]["calls"] == 2  # Both calls are charged
+
+
+def test_intent_keeps_confident_small_model_answer():
+    state = {"query": "What is CDC?", "history": [{"role": "user", "content": "What is CDC?"}], "token_usage": 0}
+    reply = '{"category": "CONCEPT", "confidence_score": 0.95, "is_clear": true, "clarification_question": "", "mode": "quick"}'
+    result, models, stats = _run(intent_orchestrator, state, {"small-model": reply, "large-model": "unused"})
+    assert result["intent"] == "General Question" and result["confidence_score"] == 0.95
+    assert models == ["small-model"]
+    assert stats["intent"]["escalation_rate"] == 0.0
+
+
+def test_intent_keeps_clear_low_score_and_escalates_inconsistent_answer():
+    state = {"query": "fix it", "history": [{"role": "user", "content": "fix it"}], "token_usage": 0}
+    vague = ('{"category": "BUG", "confidence_score": 0.4, "is_clear": false, '
+             '"clarification_question": "Which error do you see?"}')
+    result, models, _ = _run(intent_orchestrator, state, {"small-model": vague, "large-model": "unused"})
+    assert models == ["small-model"]  # A vague query gets its clarification from one call
+    assert result["clarification_question"] == "Which error do you see?"
+
+    contradictory = '{"category": "GENERAL", "confidence_score": 0.2, "is_clear": true, "clarification_question": ""}'
+    result, models, _ = _run(intent_orchestrator, state, {"small-model": contradictory, "large-model": vague})
+    assert models == MODELS
+    assert result["is_clarified"] is False
+
+
+def test_gap_analysis_escalates_only_without_a_score():
+    state = {"query": "Kafka vs Pulsar", "history": [], "research_data": [{"content": "Kafka stores logs."}],
+             "token_usage": 0, "budget_limit": 16000, "gaps": []}
+    low = '{"confidence_score": 0.3, "gaps": ["latency"]}'
+    result, models, _ = _run(gap_analysis_node, state, {"small-model": low, "large-model": "unused"})
+    assert models == ["small-model"] and result["confidence_score"] == 0.3  # Low score is a valid verdict
+
+    result, models, _ = _run(gap_analysis_node, state, {"small-model": "The research looks fine.",
+                                                        "large-model": low})
+    assert models == MODELS and result["gaps"] == ["latency"]
+
+
+def test_cascade_escalates_on_error_and_can_be_disabled():
+    cascade = ModelCascade()
+    saved = Config.NODE_MODELS, Config.MODEL_CASCADE_ENABLED
+    Config.NODE_MODELS = {"planner": MODELS}
+    try:
+        def attempt(model):
+            if model == "small-model":
+                raise ConnectionError("model not found")
+            return model
+        assert cascade.run("planner", attempt, lambda r: True) == ("large-model", "large-model")
+        assert cascade.stats()["planner"]["reasons"] == {"ConnectionError": 1}
+
+        Config.MODEL_CASCADE_ENABLED = False
+        assert cascade.run("planner", lambda m: m, lambda r: False) == ("large-model", "large-model")
+    finally:
+        Config.NODE_MODELS, Config.MODEL_CASCADE_ENABLED = saved
+
+
+if __name__ == "__main__":
+    test_planner_escalates_unparsable_answer()
+    test_intent_keeps_confident_small_model_answer()
+    test_intent_keeps_clear_low_score_and_escalates_inconsistent_answer()
+    test_gap_analysis_escalates_only_without_a_score()
+    test_cascade_escalates_on_error_and_can_be_disabled()
+    print("✅ All model cascade tests passed!")
@@ -0,0 +1,154 @@
+# test_page_fetch.py
+"""
+Tests for the page fetch stage against a local HTTP stand-in server.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.page_fetch import PageFetcher, extract_main_text
+
+
+ARTICLE = """
+<html><head><title>Kafka</title><script>var tracking = 1;</script></head>
+<body>
+  <nav><a href="/">Home</a> <a href="/docs">Docs</a></nav>
+  <article>
+    <h1>Exactly-once semantics in Kafka</h1>
+    <p>Kafka provides exactly-once semantics through idempotent producers and transactions.</p>
+    <p>Consumers read committed messages only when isolation.level is set to read_committed.</p>
+    <p>Share</p>
+  </article>
+  <footer>Copyright 2026 Example Corp. All rights reserved worldwide.</footer>
+</body></html>
+"""
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        StandInHandler.hits[self.path] = StandInHandler.hits.get(self.path, 0) + 1
+        if self.path == "/article":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = ARTICLE.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/huge":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            for _ in range(200):
+                self.wfile.write(b"x" * 10_000 + b"\n")
+        elif self.path == "/slow":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            self.wfile.write(b"first part of a slow page\n")
+            self.wfile.flush()
+            time.sleep(2)
+            self.wfile.write(b"second part\n")
+        elif self.path == "/binary":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.end_headers()
+            self.wfile.write(b"%PDF-1.4")
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+
+def _server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _fetcher(**kwargs):
+    params = {"max_bytes": 50_000, "timeout_seconds": 0.5, "cache_ttl_seconds": 0}
+    params.update(kwargs)
+    return PageFetcher(tempfile.mkdtemp(), **params)
+
+
+def test_extract_main_text():
+    text = extract_main_text(ARTICLE)
+    assert "idempotent producers" in text
+    assert "read_committed" in text
+    assert "tracking" not in text
+    assert "Home" not in text
+    assert "Copyright" not in text
+
+
+def test_fetch_and_etag_revalidation():
+    server, base = _server()
+    try:
+        fetcher = _fetcher()
+        first = fetcher.fetch(f"{base}/article")
+        second = fetcher.fetch(f"{base}/article")
+        assert first == second
+        assert "idempotent producers" in first
+        assert fetcher.stats["fetched"] == 1
+        assert fetcher.stats["revalidated"] == 1
+
+        # Within the TTL the disk cache answers without any request
+        fresh = _fetcher(cache_ttl_seconds=3600)
+        fresh.cache_dir = fetcher.cache_dir
+        requests_before = StandInHandler.hits["/article"]
+        assert fresh.fetch(f"{base}/article") == first
+        assert StandInHandler.hits["/article"] == requests_before
+    finally:
+        server.shutdown()
+
+
+def test_size_and_time_caps():
+    server, base = _server()
+    try:
+        fetcher = _fetcher()
+        huge = fetcher.fetch(f"{base}/huge")
+        assert huge is not None and len(huge) <= 50_000
+
+        start = time.time()
+        slow = fetcher.fetch(f"{base}/slow")
+        assert time.time() - start < 1.5
+        assert slow == "first part of a slow page"
+        assert fetcher.stats["truncated"] == 2
+
+        assert fetcher.fetch(f"{base}/binary") is None
+        assert fetcher.fetch(f"{base}/missing") is None
+    finally:
+        server.shutdown()
+
+
+def test_fetch_many_concurrently():
+    server, base = _server()
+    try:
+        fetcher = _fetcher()
+        start = time.time()
+        pages = fetcher.fetch_many([f"{base}/article", f"{base}/slow", f"{base}/missing", f"{base}/article"])
+        # The slow page does not serialize the others
+        assert time.time() - start < 1.5
+        assert set(pages) == {f"{base}/article", f"{base}/slow"}
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_extract_main_text()
+    test_fetch_and_etag_revalidation()
+    test_size_and_time_caps()
+    test_fetch_many_concurrently()
+    print("✅ All page fetch tests passed!")
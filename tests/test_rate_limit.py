@@ -0,0 +1,99 @@
+# test_rate_limit.py
+"""
+Tests for the process-wide token-bucket search rate limiter.
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.rate_limit import RateLimitTimeout, TokenBucket
+
+
+def test_burst_then_sustained_rate():
+    bucket = TokenBucket(rate_per_second=20, burst=3)
+    start = time.time()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.time() - start < 0.05  # Burst is served immediately
+
+    for _ in range(4):
+        bucket.acquire()
+    # Four more tokens at 20/s take ~0.2s
+    assert 0.15 < time.time() - start < 0.5
+    assert bucket.stats()["acquired"] == 7
+    assert bucket.stats()["max_wait"] > 0
+
+
+def test_fifo_fairness_between_threads():
+    bucket = TokenBucket(rate_per_second=20, burst=1)
+    bucket.acquire()  # Drain the bucket so everyone queues
+    order = []
+    lock = threading.Lock()
+
+    def worker(name):
+        bucket.acquire()
+        with lock:
+            order.append(name)
+
+    threads = []
+    for name in ["a", "b", "c", "d"]:
+        t = threading.Thread(target=worker, args=(name,))
+        t.start()
+        threads.append(t)
+        time.sleep(0.01)  # Enforce arrival order
+    for t in threads:
+        t.join()
+
+    assert order == ["a", "b", "c", "d"]
+    assert bucket.stats()["queue_depth"] == 0
+    assert bucket.stats()["p95_wait"] > 0
+
+
+def test_callers_are_served_round_robin():
+    bucket = TokenBucket(rate_per_second=50, burst=1)
+    bucket.acquire()  # Drain the bucket so everyone queues
+    order = []
+    lock = threading.Lock()
+
+    def worker(caller, name):
+        bucket.acquire(caller)
+        with lock:
+            order.append(name)
+
+    # One session fans out six searches before two other sessions ask for one each
+    arrivals = [("deep", f"d{i}") for i in range(6)] + [("s1", "s1"), ("s2", "s2")]
+    threads = []
+    for caller, name in arrivals:
+        t = threading.Thread(target=worker, args=(caller, name))
+        t.start()
+        threads.append(t)
+        time.sleep(0.002)  # Enforce arrival order
+    for t in threads:
+        t.join()
+
+    assert order.index("s1") <= 2 and order.index("s2") <= 3  # Not behind the whole fan-out
+    assert [n for n in order if n.startswith("d")] == [f"d{i}" for i in range(6)]  # FIFO within a caller
+    assert bucket.stats()["queue_depth"] == 0 and bucket.stats()["waiting_callers"] == 0
+
+
+def test_max_wait_raises():
+    bucket = TokenBucket(rate_per_second=1, burst=1, max_wait_seconds=0.1)
+    bucket.acquire()
+    start = time.time()
+    try:
+        bucket.acquire()
+    except RateLimitTimeout:
+        assert time.time() - start < 0.5
+    else:
+        raise AssertionError("expected RateLimitTimeout")
+    assert bucket.stats()["timeouts"] == 1
+
+
+if __name__ == "__main__":
+    test_burst_then_sustained_rate()
+    test_fifo_fairness_between_threads()
+    test_callers_are_served_round_robin()
+    test_max_wait_raises()
+    print("✅ All rate limit tests passed!")
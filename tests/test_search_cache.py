@@ -0,0 +1,94 @@
+# test_search_cache.py
+"""
+Tests for the persistent search result cache (TTL, LRU eviction, key normalization).
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import graph.nodes_exec as nodes_exec
+from utils import search_cache
+from utils.search_cache import SearchCache, normalize_query
+
+
+RESULTS = [{"title": "Kafka docs", "url": "https://kafka.apache.org", "content": "Log-based broker"}]
+
+
+def _cache(**kwargs):
+    path = os.path.join(tempfile.mkdtemp(), "search_cache.sqlite")
+    params = {"ttl_seconds": 60, "max_entries": 100}
+    params.update(kwargs)
+    return SearchCache(path, **params)
+
+
+def test_normalized_keys():
+    assert normalize_query("  What is  Kafka? ") == normalize_query("what is kafka")
+    assert normalize_query("C++ vs C#") == "c++ vs c#"
+    assert normalize_query("node.js streams.") == "node.js streams"
+
+    cache = _cache()
+    cache.set("What is Kafka?", "tavily", RESULTS)
+    assert cache.get("what is   kafka", "tavily") == RESULTS
+    # Provider is part of the key
+    assert cache.get("what is kafka", "duckduckgo") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_expiry():
+    cache = _cache()
+    cache.set("kafka", "tavily", RESULTS, ttl_seconds=0.05)
+    assert cache.get("kafka", "tavily") == RESULTS
+    time.sleep(0.1)
+    assert cache.get("kafka", "tavily") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction():
+    cache = _cache(max_entries=2)
+    cache.set("a", "p", RESULTS)
+    time.sleep(0.01)
+    cache.set("b", "p", RESULTS)
+    time.sleep(0.01)
+    cache.get("a", "p")  # 'a' becomes most recently used
+    time.sleep(0.01)
+    cache.set("c", "p", RESULTS)
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get("b", "p") is None
+    assert cache.get("a", "p") == RESULTS
+    assert cache.get("c", "p") == RESULTS
+
+
+class CountingSearch:
+    name = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, query):
+        self.calls += 1
+        return [{"title": "RabbitMQ", "href": "https://www.rabbitmq.com", "body": "AMQP broker"}]
+
+
+def test_repeated_search_skips_network():
+    search_cache._search_cache = _cache()
+    fake = CountingSearch()
+    nodes_exec.search_tool = fake
+
+    first = nodes_exec._search("Kafka vs RabbitMQ")
+    second = nodes_exec._search("kafka vs rabbitmq?")
+
+    assert fake.calls == 1
+    assert first == second
+    assert first[0]["url"] == "https://www.rabbitmq.com"
+
+
+if __name__ == "__main__":
+    test_normalized_keys()
+    test_ttl_expiry()
+    test_lru_eviction()
+    test_repeated_search_skips_network()
+    print("✅ All search cache tests passed!")
@@ -0,0 +1,112 @@
+# test_section_synthesis.py
+"""
+Tests for section-parallel report generation: ordered streaming of concurrently
+written sections, the executive summary written last, and wall-clock time close
+to the slowest section, against a local fake Ollama server.
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+import utils.llm_registry as llm_registry
+from config import Config
+from graph.nodes_exec import structured_synthesis_node
+from utils.streaming import OrderedSectionWriter, StreamingBuffer, clear_streaming_buffer, get_streaming_buffer
+
+TOKEN_DELAY = 0.01
+# Later sections are shorter, so they finish first and must be held back
+SECTION_WORDS = {"Technical Deep Analysis": 60, "Key Findings & Trade-offs": 50, "Evidence Trace": 40}
+
+
+def _reply(request):
+    prompt = request["messages"][-1]["content"]
+    if "Write ONLY the '# Executive Summary'" in prompt:
+        assert all(f"# {title}" in prompt for title in SECTION_WORDS)  # Written from the finished sections
+        return "# Executive Summary Kafka suits log streaming."
+    title = re.search(r"Write ONLY the '# (.+?)' section", prompt).group(1)
+    return f"# {title} " + " ".join([title.split()[0].lower()] * SECTION_WORDS[title])
+
+
+def test_ordered_writer_holds_back_later_sections():
+    buffer = StreamingBuffer()
+    writer = OrderedSectionWriter(buffer, 3, separator="|")
+    writer.add_chunk(0, "a1")
+    writer.add_chunk(2, "c1")
+    writer.add_chunk(1, "b1")
+    writer.finish(2)
+    writer.finish(1)
+    assert buffer.get_full_content() == "a1"
+    writer.add_chunk(0, "a2")
+    writer.finish(0)
+    assert buffer.get_full_content() == "a1a2|b1|c1"
+    assert writer.sections == ["a1a2", "b1", "c1"]
+
+
+def test_sections_run_concurrently_and_stream_in_document_order():
+    server = FakeOllama(reply=_reply, token_delay=TOKEN_DELAY)
+    saved = llm_registry._registry, Config.PASSAGE_RERANK_ENABLED, Config.SYNTHESIS_SECTION_PARALLEL_ENABLED
+    llm_registry._registry = llm_registry.LLMRegistry(base_url=server.url)
+    Config.PASSAGE_RERANK_ENABLED = False
+    Config.SYNTHESIS_SECTION_PARALLEL_ENABLED = True
+    state = {"query": "Kafka vs Pulsar", "history": [], "gaps": [], "token_usage": 0, "budget_limit": 16000,
+             "research_data": [{"content": "Kafka stores logs. Pulsar uses BookKeeper.", "source": "Web Search"}],
+             "query_id": "section_test"}
+    try:
+        start = time.perf_counter()
+        result = structured_synthesis_node(state)
+        elapsed = time.perf_counter() - start
+        streamed = get_streaming_buffer("section_test").get_full_content()
+    finally:
+        llm_registry._registry, Config.PASSAGE_RERANK_ENABLED, Config.SYNTHESIS_SECTION_PARALLEL_ENABLED = saved
+        clear_streaming_buffer("section_test")
+        server.close()
+
+    sequential = sum(n + 2 for n in SECTION_WORDS.values()) * TOKEN_DELAY
+    longest = (max(SECTION_WORDS.values()) + 2) * TOKEN_DELAY
+    print(f"section-parallel synthesis {elapsed:.2f}s, longest section {longest:.2f}s, sequential {sequential:.2f}s")
+    assert server.peak_in_flight == 3
+    assert elapsed < sequential * 0.8
+
+    positions = [streamed.index(f"# {t}") for t in [*SECTION_WORDS, "Executive Summary"]]
+    assert positions == sorted(positions)  # Body in document order, summary streamed last
+    report = result["final_report"]
+    assert report.startswith("# Executive Summary")
+    assert [report.index(f"# {t}") for t in SECTION_WORDS] == sorted(report.index(f"# {t}") for t in SECTION_WORDS)
+    assert result["token_usage_by_node"]["synthesize"]["calls"] == 4
+
+
+def test_failed_summary_still_completes_the_stream():
+    def reply(request):
+        if "Write ONLY the '# Executive Summary'" in request["messages"][-1]["content"]:
+            raise RuntimeError("model crashed")
+        return _reply(request)
+
+    server = FakeOllama(reply=reply)
+    saved = llm_registry._registry, Config.PASSAGE_RERANK_ENABLED, Config.SYNTHESIS_SECTION_PARALLEL_ENABLED
+    llm_registry._registry = llm_registry.LLMRegistry(base_url=server.url)
+    Config.PASSAGE_RERANK_ENABLED = False
+    Config.SYNTHESIS_SECTION_PARALLEL_ENABLED = True
+    state = {"query": "Kafka vs Pulsar", "history": [], "gaps": [], "token_usage": 0, "budget_limit": 16000,
+             "research_data": [{"content": "Kafka stores logs.", "source": "Web Search"}],
+             "query_id": "section_failure_test"}
+    try:
+        result = structured_synthesis_node(state)
+        assert get_streaming_buffer("section_failure_test").complete
+    finally:
+        llm_registry._registry, Config.PASSAGE_RERANK_ENABLED, Config.SYNTHESIS_SECTION_PARALLEL_ENABLED = saved
+        clear_streaming_buffer("section_failure_test")
+        server.close()
+
+    assert result["final_report"].startswith("# Technical Deep Analysis")
+    assert "Executive Summary" not in result["final_report"]
+
+
+if __name__ == "__main__":
+    test_ordered_writer_holds_back_later_sections()
+    test_sections_run_concurrently_and_stream_in_document_order()
+    test_failed_summary_still_completes_the_stream()
+    print("✅ All section synthesis tests passed!")
@@ -0,0 +1,139 @@
+# test_source_registry.py
+"""
+Tests for the source registry: canonical-URL IDs kept across deep-research
+iterations, ID citations in the evidence and synthesis prompt, and the Evidence
+Trace rendered from the registry instead of by the LLM.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+import graph.nodes_exec as nodes_exec
+from graph.nodes_pre import guard_layer
+import utils.llm_registry as llm_registry
+from config import Config
+from utils.source_registry import SourceRegistry
+from utils.streaming import clear_streaming_buffer
+
+
+def test_ids_follow_canonical_urls_across_iterations():
+    registry = SourceRegistry()
+    assert registry.add("https://www.example.com/kafka/?utm_source=rss", "Kafka Guide") == "S1"
+    assert registry.add("https://pulsar.apache.org/docs") == "S2"
+    assert registry.add("http://example.com/kafka") == "S1"  # Same canonical URL
+    assert registry.add("Local corpus: notes.md") is None
+    assert registry.add("file:///srv/docs/kafka.md", "docs/kafka.md") == "S3"  # Local corpus files are citable
+    assert registry.get("S3")["domain"] == "local corpus"
+    assert registry.get("S2")["title"] == "pulsar.apache.org"  # Domain until a title is known
+
+    # The next iteration is rebuilt from the entries stored in graph state
+    later = SourceRegistry(registry.entries)
+    assert later.add("https://pulsar.apache.org/docs", "Pulsar Docs") == "S2"
+    assert later.add("https://bookkeeper.apache.org") == "S4"
+    assert later.get("S2")["title"] == "Pulsar Docs"
+    assert registry.get("S2")["title"] == "pulsar.apache.org"  # Stored entries are not mutated
+
+
+def test_finalize_report_replaces_the_llm_trace():
+    registry = SourceRegistry()
+    registry.add("https://kafka.apache.org/documentation", "Kafka Docs")
+    registry.add("https://pulsar.apache.org/docs", "Pulsar Docs")
+    registry.add("https://example.com/unused", "Unused")
+    report = (
+        "# Executive Summary\nPulsar tiers storage [S2]; Kafka keeps a log [S1] [S9].\n\n"
+        "# Evidence Trace\n- [Made up](https://invented.example.com)\n\n"
+        "# Key Findings & Trade-offs\nBoth scale [S1]."
+    )
+    final = registry.finalize_report(report)
+    assert "invented.example.com" not in final
+    assert "[[S2]](https://pulsar.apache.org/docs)" in final and "[S9]" in final  # Unknown IDs left as-is
+    trace = final[final.index("# Evidence Trace"):]
+    assert final.rstrip().endswith(trace.rstrip()) and "# Key Findings" in final[:final.index(trace)]
+    assert trace.splitlines()[1:] == [
+        "- **[S2]** [Pulsar Docs](https://pulsar.apache.org/docs) — pulsar.apache.org",
+        "- **[S1]** [Kafka Docs](https://kafka.apache.org/documentation) — kafka.apache.org",
+    ]
+
+    assert "Unused" in registry.finalize_report("# Executive Summary\nNo citations.")  # Falls back to every source
+    assert "LLM Knowledge Base" in SourceRegistry().finalize_report("# Executive Summary\nNone.")
+
+
+class PagedSearch:
+    """Returns the same Kafka page (with a tracking variant) plus one new page per call."""
+    name = "paged"
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, query):
+        self.calls += 1
+        return [
+            {"title": "Kafka", "url": f"https://blog.example.com/kafka?utm_campaign={self.calls}",
+             "content": "Kafka keeps an ordered log."},
+            {"title": f"Page {self.calls}", "url": f"https://docs.example.com/page{self.calls}",
+             "content": f"Fact number {self.calls}."},
+        ]
+
+
+def test_deep_mode_cites_registry_ids():
+    saved = (nodes_exec.search_tool, Config.EVIDENCE_DEDUP_ENABLED, Config.SEARCH_CACHE_ENABLED,
+             Config.DEEP_FANOUT_ENABLED)
+    nodes_exec.search_tool = PagedSearch()
+    Config.EVIDENCE_DEDUP_ENABLED = Config.SEARCH_CACHE_ENABLED = Config.DEEP_FANOUT_ENABLED = False
+    state = {"query": "source registry kafka", "iterations": 0, "gaps": [], "history": [],
+             "searched_queries": [], "source_registry": []}
+    try:
+        first = nodes_exec.deep_mode_orchestrator(state)
+        state.update(first, gaps=["ordering"])
+        second = nodes_exec.deep_mode_orchestrator(state)
+        # A follow-up turn on the same thread keeps the IDs cited in the earlier evidence
+        state.update(second)
+        state.update(guard_layer(state))
+        follow_up = nodes_exec.deep_mode_orchestrator(state)
+    finally:
+        (nodes_exec.search_tool, Config.EVIDENCE_DEDUP_ENABLED, Config.SEARCH_CACHE_ENABLED,
+         Config.DEEP_FANOUT_ENABLED) = saved
+
+    content = second["research_data"][0]["content"]
+    assert "Source: [S1]" in content and "Source: [S3]" in content
+    assert "https://" not in content
+    assert [e["id"] for e in second["source_registry"]] == ["S1", "S2", "S3"]
+    assert "Source: [S1]" in follow_up["research_data"][0]["content"]
+    assert [e["id"] for e in follow_up["source_registry"]] == ["S1", "S2", "S3", "S4"]
+
+
+def test_synthesis_prompt_carries_ids_not_urls():
+    server = FakeOllama(reply="# Executive Summary\nKafka keeps a log [S1].")
+    saved = llm_registry._registry, Config.PASSAGE_RERANK_ENABLED
+    llm_registry._registry = llm_registry.LLMRegistry(base_url=server.url)
+    Config.PASSAGE_RERANK_ENABLED = False
+    registry = SourceRegistry()
+    results = [{"title": "Kafka", "url": "https://blog.example.com/kafka", "content": "Kafka keeps a log.",
+                "also_reported_by": ["https://mirror.example.org/kafka"]}]
+    evidence = nodes_exec._format_results(results, registry)
+    assert evidence.endswith("Source: [S1] (also: [S2])\n")
+    state = {"query": "Kafka storage", "history": [], "gaps": [], "token_usage": 0, "budget_limit": 16000,
+             "research_data": [{"content": evidence, "source": "Web Search"}],
+             "source_registry": registry.entries, "query_id": "registry_test"}
+    try:
+        result = nodes_exec.structured_synthesis_node(state)
+    finally:
+        llm_registry._registry, Config.PASSAGE_RERANK_ENABLED = saved
+        clear_streaming_buffer("registry_test")
+        server.close()
+
+    system, user = (m["content"] for m in server.chat_requests()[0]["json"]["messages"])
+    assert "[S1]" in user and "http" not in user
+    assert "CITATIONS" in system and "# Evidence Trace" not in system  # The LLM no longer writes the trace
+    final = registry.finalize_report(result["final_report"])
+    assert "[[S1]](https://blog.example.com/kafka)" in final and "# Evidence Trace" in final
+
+
+if __name__ == "__main__":
+    test_ids_follow_canonical_urls_across_iterations()
+    test_finalize_report_replaces_the_llm_trace()
+    test_deep_mode_cites_registry_ids()
+    test_synthesis_prompt_carries_ids_not_urls()
+    print("✅ All source registry tests passed!")
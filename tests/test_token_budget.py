@@ -0,0 +1,92 @@
+# test_token_budget.py
+"""
+Tests for token accounting and per-run budget enforcement, against a local fake Ollama server.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fake_ollama import FakeOllama
+import utils.llm_registry as llm_registry
+from config import Config
+from graph.nodes_exec import gap_analysis_node, quick_mode_executor
+from langchain_core.messages import AIMessage, HumanMessage
+from utils.token_budget import (
+    budget_exhausted, call_usage, completion_cap, count_tokens, record_usage
+)
+
+
+def _with_fake_ollama(reply, fn):
+    server = FakeOllama(reply=reply)
+    saved = llm_registry._registry
+    llm_registry._registry = llm_registry.LLMRegistry(base_url=server.url)
+    try:
+        return fn(), server
+    finally:
+        llm_registry._registry = saved
+        server.close()
+
+
+def test_usage_metadata_preferred_over_local_count():
+    messages = [HumanMessage(content="What is CDC?")]
+    with_usage = AIMessage(content="Change data capture.",
+                           usage_metadata={"input_tokens": 11, "output_tokens": 4, "total_tokens": 15})
+    assert call_usage(messages, with_usage) == (11, 4)
+
+    without = AIMessage(content="Change data capture.")
+    prompt_tokens, completion_tokens = call_usage(messages, without)
+    assert prompt_tokens >= count_tokens("What is CDC?") and completion_tokens == count_tokens("Change data capture.")
+
+    cached = AIMessage(content="quick", response_metadata={"cache": "exact"})
+    assert call_usage(messages, cached) == (0, 0)
+
+
+def test_record_usage_accumulates_per_node():
+    state = {"token_usage": 100, "token_usage_by_node": {"intent_orchestrator": {"prompt": 80, "completion": 20, "calls": 1}}}
+    state.update(record_usage(state, "gap_analysis", 300, 50))
+    state.update(record_usage(state, "gap_analysis", 200, 40))
+    assert state["token_usage"] == 690
+    assert state["token_usage_by_node"]["gap_analysis"] == {"prompt": 500, "completion": 90, "calls": 2}
+    assert state["token_usage_by_node"]["intent_orchestrator"]["calls"] == 1
+
+
+def test_budget_caps_completions():
+    fresh = {"token_usage": 0, "budget_limit": 16000}
+    assert completion_cap(fresh, 2000) == Config.COMPLETION_TOKEN_CAP
+
+    tight = {"token_usage": 14000, "budget_limit": 16000}
+    assert completion_cap(tight, 1000) == 768  # 1000 left, rounded down to 256s
+    assert budget_exhausted(tight, Config.TOKEN_BUDGET_SYNTHESIS_RESERVE)
+
+    spent = {"token_usage": 16500, "budget_limit": 16000}
+    assert completion_cap(spent, 1000) == Config.MIN_COMPLETION_TOKENS
+
+
+def test_quick_mode_records_real_usage_and_sends_num_predict():
+    state = {"query": "What is CDC?", "history": [], "token_usage": 50, "budget_limit": 1200}
+    result, server = _with_fake_ollama("Change data capture streams row changes.",
+                                       lambda: quick_mode_executor(state))
+    request = server.chat_requests()[0]["json"]
+    expected_prompt = max(1, len("What is CDC?") // 4)  # Fake server's prompt_eval_count
+    assert result["token_usage_by_node"]["quick_mode"] == {"prompt": expected_prompt, "completion": 6, "calls": 1}
+    assert result["token_usage"] == 50 + expected_prompt + 6
+    assert request["options"]["num_predict"] == 1024  # 1200 - 50 - prompt, rounded down
+
+
+def test_gap_analysis_stops_iterating_when_budget_is_spent():
+    state = {"query": "Kafka vs Pulsar", "history": [], "research_data": [{"content": "evidence"}],
+             "token_usage": 15000, "budget_limit": 16000, "gaps": []}
+    result, server = _with_fake_ollama('{"confidence_score": 0.4, "gaps": ["latency"]}',
+                                       lambda: gap_analysis_node(state))
+    assert result == {"budget_exhausted": True}
+    assert server.chat_requests() == []
+
+
+if __name__ == "__main__":
+    test_usage_metadata_preferred_over_local_count()
+    test_record_usage_accumulates_per_node()
+    test_budget_caps_completions()
+    test_quick_mode_records_real_usage_and_sends_num_predict()
+    test_gap_analysis_stops_iterating_when_budget_is_spent()
+    print("✅ All token budget tests passed!")
@@ -0,0 +1,81 @@
+"""
+CPU-only extractive compression of research evidence for gap analysis.
+"""
+import re
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from utils.embeddings import embed_texts, hashing_embed
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_NOISE = re.compile(r"^(Source: |\*\*.*\*\*$|---$|\[Source \d+)")
+
+
+def split_sentences(text: str, min_chars: int = 25) -> List[str]:
+    """Sentences of the evidence, minus titles, source lines and fragments."""
+    sentences = []
+    for s in _SENTENCE_SPLIT.split(text):
+        s = s.strip()
+        if len(s) >= min_chars and not _NOISE.match(s):
+            sentences.append(s)
+    return sentences
+
+
+def _centrality(sims: np.ndarray, damping: float = 0.85, iterations: int = 30) -> np.ndarray:
+    """TextRank: PageRank over the sentence similarity graph (vectorized power iteration)."""
+    n = sims.shape[0]
+    weights = np.clip(sims, 0.0, None)
+    np.fill_diagonal(weights, 0.0)
+    row_sums = weights.sum(axis=1, keepdims=True)
+    transition = np.divide(weights, row_sums, out=np.full_like(weights, 1.0 / n), where=row_sums > 0)
+    rank = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(iterations):
+        rank = (1 - damping) / n + damping * (transition.T @ rank)
+    return rank / max(rank.max(), 1e-12)
+
+
+def extractive_digest(
+    research_data: List[dict],
+    query: str,
+    gaps: Optional[List[str]] = None,
+    budget_chars: int = 1500,
+    centrality_weight: float = 0.3,
+    redundancy_threshold: float = 0.9,
+    embed_fn: Callable[[List[str]], np.ndarray] = embed_texts,
+) -> str:
+    """
+    Picks the sentences most relevant to the query and open gaps (blended with
+    TextRank centrality), skips near-repeats, and returns them in original order
+    within budget_chars.
+    """
+    sentences = list(dict.fromkeys(
+        s for item in research_data for s in split_sentences(item.get("content", ""))
+    ))
+    if not sentences:
+        return ""
+    if sum(len(s) + 1 for s in sentences) <= budget_chars:
+        return "\n".join(sentences)
+
+    targets = [query] + [g for g in (gaps or []) if g]
+    try:
+        vectors = embed_fn(targets + sentences)
+    except Exception as e:
+        print(f"⚠️ Sentence embedding failed, using hashed term vectors: {e}")
+        vectors = hashing_embed(targets + sentences)
+    target_vecs, sent_vecs = vectors[:len(targets)], vectors[len(targets):]
+
+    relevance = (sent_vecs @ target_vecs.T).max(axis=1)
+    sims = sent_vecs @ sent_vecs.T
+    scores = (1 - centrality_weight) * relevance + centrality_weight * _centrality(sims) * relevance.max()
+
+    chosen, used = [], 0
+    for idx in np.argsort(-scores):
+        cost = len(sentences[idx]) + 1
+        if used + cost > budget_chars:
+            continue
+        if chosen and sims[idx, chosen].max() >= redundancy_threshold:
+            continue
+        chosen.append(int(idx))
+        used += cost
+    return "\n".join(sentences[i] for i in sorted(chosen))
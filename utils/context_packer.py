@@ -0,0 +1,127 @@
+"""
+Token-aware prompt packing: fits prioritized segments (query, history, memory,
+evidence) into a per-node token budget, cutting only at sentence, line or
+block boundaries and never inside a fenced code block.
+"""
+import re
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+from utils.token_budget import count_tokens, remaining_budget
+
+_FENCE = re.compile(r"```.*?(?:```|$)", re.DOTALL)
+_BOUNDARY = re.compile(r"(?<=[.!?])[ \t]+|\n+")
+
+
+def split_units(text: str) -> List[str]:
+    """
+    Splits text into consecutive pieces ending at sentence ends, line breaks or
+    blank lines; a fenced code block is one piece. "".join(units) == text.
+    """
+    if not text:
+        return []
+    fences = [m.span() for m in _FENCE.finditer(text)]
+    cuts = [
+        m.end() for m in _BOUNDARY.finditer(text)
+        if not any(start < m.start() < end for start, end in fences)
+    ]
+    units, prev = [], 0
+    for cut in cuts + [len(text)]:
+        if cut > prev:
+            units.append(text[prev:cut])
+            prev = cut
+    return units
+
+
+class Segment:
+    """
+    One part of a prompt. Lower priority numbers are packed first; required
+    segments always go in (cut to fit if they must). keep="head" keeps the
+    beginning (evidence), keep="tail" the end (history: most recent turns).
+    `units` are pre-split pieces (e.g. one per message) joined with `separator`;
+    `max_tokens` caps the segment's share of the budget.
+    """
+
+    def __init__(self, name: str, text: str = "", units: Optional[List[str]] = None, priority: int = 1,
+                 keep: str = "head", required: bool = False, separator: str = "\n",
+                 max_tokens: Optional[int] = None):
+        self.name = name
+        self.max_tokens = max_tokens
+        self.units = list(units) if units is not None else split_units(text)
+        self.priority = priority
+        self.keep = keep
+        self.required = required
+        self.separator = separator if units is not None else ""
+
+
+def _fit(units: List[str], budget: int, keep: str, separator: str, count_fn) -> List[str]:
+    """Longest head/tail run of units within budget; a unit that alone overflows is split further."""
+    ordered = units if keep == "head" else units[::-1]
+    kept, used = [], 0
+    for unit in ordered:
+        cost = count_fn(unit) + (count_fn(separator) if kept and separator else 0)
+        if used + cost <= budget:
+            kept.append(unit)
+            used += cost
+            continue
+        sub_units = split_units(unit)
+        if len(sub_units) > 1:
+            # Keep the part of the boundary unit that still fits (e.g. the start of a long message)
+            partial = _fit(sub_units, budget - used - (count_fn(separator) if kept and separator else 0),
+                           "head", "", count_fn)
+            if partial:
+                kept.append("".join(partial))
+        break
+    return kept if keep == "head" else kept[::-1]
+
+
+def pack_context(segments: List[Segment], budget_tokens: int, label: str = "",
+                 count_fn: Callable[[str], int] = count_tokens) -> dict:
+    """
+    Packs segments into budget_tokens. Returns {"segments": {name: text},
+    "units": {name: kept units}, "tokens": used, "budget": budget_tokens,
+    "dropped": {name: {"units", "tokens"}}}.
+    """
+    order = sorted(segments, key=lambda s: (not s.required, s.priority))
+    packed: Dict[str, str] = {}
+    kept_units: Dict[str, List[str]] = {}
+    dropped: Dict[str, dict] = {}
+    used = 0
+    for segment in order:
+        allowance = max(0, budget_tokens - used)
+        if segment.max_tokens is not None:
+            allowance = min(allowance, segment.max_tokens)
+        kept = _fit(segment.units, allowance, segment.keep, segment.separator, count_fn)
+        text = segment.separator.join(kept)
+        packed[segment.name] = text
+        kept_units[segment.name] = kept
+        used += count_fn(text)
+        full_tokens = count_fn(segment.separator.join(segment.units))
+        if len(kept) < len(segment.units) or count_fn(text) < full_tokens:
+            dropped[segment.name] = {
+                "units": len(segment.units) - len(kept),
+                "tokens": full_tokens - count_fn(text),
+            }
+
+    if dropped:
+        print(f"DEBUG [context_packer]{' ' + label if label else ''}: {used}/{budget_tokens} tokens, dropped {dropped}")
+    return {"segments": packed, "units": kept_units, "tokens": used, "budget": budget_tokens, "dropped": dropped}
+
+
+def context_budget(node: str, model: str = None) -> int:
+    """
+    Prompt token budget of a node: its CONTEXT_TOKEN_BUDGETS entry, bounded by the
+    model's context window minus the completion reserve.
+    """
+    model = model or Config.MODEL_NAME
+    window = Config.MODEL_CONTEXT_WINDOWS.get(model, Config.MODEL_CONTEXT_WINDOWS["default"])
+    return min(Config.CONTEXT_TOKEN_BUDGETS.get(node, window), window - Config.MIN_COMPLETION_TOKENS)
+
+
+def prompt_budget(state: dict, node: str, overhead_tokens: int, reserve_tokens: int, min_tokens: int = 250) -> int:
+    """
+    Token budget for a node's packed context: its context_budget, shrunk to what the
+    run's token budget still allows after the fixed prompt and the reserved tokens.
+    """
+    allowance = remaining_budget(state) - overhead_tokens - reserve_tokens
+    return max(min_tokens, min(context_budget(node), allowance))
@@ -0,0 +1,49 @@
+"""
+Shared FastEmbed text embedding model (the same model Qdrant memory uses).
+"""
+import re
+import threading
+import zlib
+from typing import List
+
+import numpy as np
+
+from config import Config
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_embedding_model():
+    """Get or load the shared fastembed TextEmbedding model."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            from fastembed import TextEmbedding
+            _model = TextEmbedding(model_name=Config.EMBEDDING_MODEL)
+    return _model
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """
+    Embed texts into an (n, dim) float32 matrix of L2-normalized rows,
+    so a plain dot product is the cosine similarity.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    vectors = np.array(list(get_embedding_model().embed(texts)), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def hashing_embed(texts: List[str], dim: int = 512) -> np.ndarray:
+    """
+    Model-free fallback: L2-normalized hashed term-frequency vectors.
+    Cheap and deterministic, but only captures shared words.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for word in re.findall(r"\w{3,}", text.lower()):
+            vectors[i, zlib.crc32(word.encode("utf-8")) % dim] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
@@ -0,0 +1,222 @@
+"""
+Pool of Ollama hosts: per-host model availability from periodic /api/tags
+probes, least-outstanding-requests routing, and sticky routing per conversation
+thread so a thread's model and KV cache stay warm on one host. Hosts that fail
+are ejected for a while and retried later.
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, List, Optional, Set
+
+import httpx
+from ollama import ResponseError
+
+from config import Config
+
+_routing_key: ContextVar[Optional[str]] = ContextVar("ollama_routing_key", default=None)
+
+
+@contextmanager
+def sticky_routing(key: str):
+    """Routes the LLM calls made inside the block as one thread (outside a LangGraph run)."""
+    token = _routing_key.set(key)
+    try:
+        yield
+    finally:
+        _routing_key.reset(token)
+
+
+def routing_key() -> Optional[str]:
+    """Sticky-routing key of the current call: sticky_routing(), else the LangGraph thread_id."""
+    key = _routing_key.get()
+    if key is not None:
+        return key
+    try:
+        from langgraph.config import get_config
+        thread_id = get_config().get("configurable", {}).get("thread_id")
+    except Exception:
+        return None  # Not inside a graph run
+    return str(thread_id) if thread_id is not None else None
+
+
+def _retryable(error: Exception) -> bool:
+    """Errors that say the host, not the request, is the problem."""
+    if isinstance(error, ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+
+class Endpoint:
+    def __init__(self, host: str):
+        self.host = host
+        self.models: Optional[Set[str]] = None  # Unknown until the first probe
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0                       # Consecutive failed requests / probes
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def has_model(self, model: str) -> bool:
+        return self.models is None or model in self.models or f"{model}:latest" in self.models
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "healthy": self.available(now),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "models": sorted(self.models) if self.models is not None else None,
+        }
+
+
+class EndpointPool:
+    """
+    Picks a host for each LLM call. Among available hosts that have the model,
+    a thread's call goes to the host it used before unless that host has more
+    than `sticky_slack` requests outstanding over the least-loaded one; otherwise
+    to the least-loaded host. `eject_after` consecutive failures (or one failed
+    probe) eject a host for `eject_seconds`, after which it is tried again.
+    """
+
+    def __init__(self, hosts: List[str], client_for: Callable = None, probe_interval: float = None,
+                 probe_timeout: float = None, eject_seconds: float = None, eject_after: int = None,
+                 sticky_slack: int = None, max_sticky_keys: int = 1000):
+        self.endpoints = [Endpoint(host) for host in dict.fromkeys(hosts)]
+        self.client_for = client_for
+        self.probe_interval = probe_interval if probe_interval is not None else Config.OLLAMA_PROBE_INTERVAL_SECONDS
+        self.probe_timeout = probe_timeout or Config.OLLAMA_PROBE_TIMEOUT_SECONDS
+        self.eject_seconds = eject_seconds if eject_seconds is not None else Config.OLLAMA_EJECT_SECONDS
+        self.eject_after = eject_after or Config.OLLAMA_EJECT_AFTER_FAILURES
+        self.sticky_slack = sticky_slack if sticky_slack is not None else Config.OLLAMA_STICKY_SLACK
+        self.max_sticky_keys = max_sticky_keys
+        self._sticky: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def hosts(self) -> List[str]:
+        return [e.host for e in self.endpoints]
+
+    def pick(self, model: str, exclude: Set[str] = frozenset()) -> Optional[Endpoint]:
+        """Reserves a host for one call (release() it afterwards); None when every host was excluded."""
+        now = time.monotonic()
+        key = routing_key()
+        with self._lock:
+            untried = [e for e in self.endpoints if e.host not in exclude]
+            if not untried:
+                return None
+            live = [e for e in untried if e.available(now)]
+            # Every host ejected: try the one due back first rather than fail outright
+            candidates = [e for e in live if e.has_model(model)] or live or [min(untried, key=lambda e: e.ejected_until)]
+            least = min(e.outstanding for e in candidates)
+            bound = self._sticky.get((key, model)) if key is not None else None
+            home = next((e for e in candidates if e.host == bound), None)
+            if home is not None and home.outstanding <= least + self.sticky_slack:
+                chosen = home
+            else:
+                # A busy home host only spills this call; the thread stays bound to it
+                chosen = min(candidates, key=lambda e: (e.outstanding, e.requests))
+                if key is not None and home is None:
+                    self._sticky[(key, model)] = chosen.host
+            if key is not None:
+                self._sticky.move_to_end((key, model))
+                while len(self._sticky) > self.max_sticky_keys:
+                    self._sticky.popitem(last=False)
+            chosen.outstanding += 1
+            chosen.requests += 1
+            return chosen
+
+    def release(self, endpoint: Endpoint, error: Exception = None):
+        """Ends a call; a host-side error counts towards ejecting the host."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if error is None:
+                endpoint.failures = 0
+            elif _retryable(error):
+                self._fail(endpoint, f"{type(error).__name__}: {error}")
+
+    def _fail(self, endpoint: Endpoint, reason: str, eject: bool = False):
+        endpoint.failures += 1
+        if eject or endpoint.failures >= self.eject_after:
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+            endpoint.ejections += 1
+            print(f"⚠️ Ollama host {endpoint.host} ejected for {self.eject_seconds:g}s ({reason})")
+
+    def stream(self, model: str, chat_params: dict) -> Iterator:
+        """
+        Runs one /api/chat call on a picked host and yields its response parts.
+        A host-side failure before the first part is retried on another host.
+        """
+        tried: Set[str] = set()
+        while True:
+            endpoint = self.pick(model, tried)
+            tried.add(endpoint.host)
+            started = False
+            error = None
+            try:
+                response = self.client_for(endpoint.host).chat(**chat_params)
+                for part in (response if chat_params.get("stream") else [response]):
+                    started = True
+                    yield part
+                return
+            except Exception as e:
+                error = e
+                if started or not _retryable(e) or len(tried) == len(self.endpoints):
+                    raise
+                print(f"DEBUG [endpoint_pool]: {endpoint.host} failed ({type(e).__name__}), retrying on another host")
+            finally:
+                self.release(endpoint, error)
+
+    def probe(self, endpoint: Endpoint) -> bool:
+        """Checks one host with GET /api/tags and refreshes its model list."""
+        try:
+            response = httpx.get(f"{endpoint.host}/api/tags", timeout=self.probe_timeout)
+            response.raise_for_status()
+            models = {m.get("model") or m.get("name") for m in response.json().get("models", [])}
+        except Exception as e:
+            with self._lock:
+                self._fail(endpoint, f"probe failed: {type(e).__name__}", eject=True)
+            return False
+        with self._lock:
+            endpoint.models = models
+            endpoint.failures = 0
+            if endpoint.ejected_until:
+                print(f"DEBUG [endpoint_pool]: {endpoint.host} is healthy again")
+            endpoint.ejected_until = 0.0
+        return True
+
+    def probe_all(self) -> int:
+        """Probes every host not currently serving an ejection; returns how many are healthy."""
+        for endpoint in self.endpoints:
+            if endpoint.available(time.monotonic()):
+                self.probe(endpoint)
+        now = time.monotonic()
+        return sum(e.available(now) for e in self.endpoints)
+
+    def _run(self):
+        self.probe_all()
+        while not self._stop.wait(self.probe_interval):
+            self.probe_all()
+
+    def start(self) -> "EndpointPool":
+        """Probes in a background thread; idempotent, and a no-op for a single host."""
+        if self._thread is None and len(self.endpoints) > 1 and self.probe_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="ollama-probe", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {e.host: e.snapshot(now) for e in self.endpoints}
@@ -0,0 +1,152 @@
+"""
+Near-duplicate elimination for search evidence (URL canonicalization + SimHash).
+"""
+import hashlib
+import re
+from typing import List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that never change page content
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src", "source", "igshid"}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonical form of a URL so syndicated/tracked links to the same page compare equal:
+    https scheme, lower-case host without 'www.', no fragment, no tracking params,
+    sorted query, no trailing slash or AMP suffix.
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host.startswith("m.") or host.startswith("amp."):
+        host = host.split(".", 1)[1]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"/+", "/", parts.path or "/")
+    path = re.sub(r"/(amp|index\.html?)/?$", "/", path)
+    path = path.rstrip("/") or "/"
+
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def _shingles(text: str, size: int = 3) -> List[str]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text: str, bits: int = 64) -> int:
+    """64-bit SimHash over word 3-shingles; similar texts differ in few bits."""
+    weights = [0] * bits
+    for shingle in _shingles(text):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(bits):
+            weights[i] += 1 if (h >> i) & 1 else -1
+    return sum(1 << i for i in range(bits) if weights[i] > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+class EvidenceDeduplicator:
+    """
+    Filters normalized search results ({title, url, content}) against everything
+    seen so far in the run. Fingerprints can be exported into graph state and
+    passed back in on the next iteration.
+    """
+
+    def __init__(self, fingerprints: Optional[List[dict]] = None, max_distance: int = 6, min_words: int = 8):
+        self.max_distance = max_distance
+        self.min_words = min_words
+        self.seen_urls = set()
+        self.seen_hashes = []
+        for fp in fingerprints or []:
+            if fp.get("url"):
+                self.seen_urls.add(fp["url"])
+            if fp.get("simhash"):
+                self.seen_hashes.append(int(fp["simhash"], 16))
+        self.new_fingerprints = []
+        self.dropped = 0
+        self.merged = 0
+        self.bytes_saved = 0
+        self.tokens_saved = 0
+
+    def _is_near_duplicate(self, fingerprint: int) -> bool:
+        return any(hamming_distance(fingerprint, seen) <= self.max_distance for seen in self.seen_hashes)
+
+    def _record_saving(self, result: dict):
+        text = result.get("content", "")
+        self.bytes_saved += len(text.encode("utf-8"))
+        self.tokens_saved += estimate_tokens(text)
+
+    def filter(self, results: List[dict]) -> List[dict]:
+        """
+        Returns the results that are new. A near-duplicate within the same batch is
+        merged into the first copy (its URL is kept as an extra source); a repeat of
+        evidence from an earlier batch is dropped.
+        """
+        kept = []
+        batch_hashes = []
+        for result in results:
+            url = canonicalize_url(result.get("url", ""))
+            text = result.get("content", "")
+            fingerprint = simhash(text) if len(text.split()) >= self.min_words else None
+
+            if url and url in self.seen_urls:
+                self.dropped += 1
+                self._record_saving(result)
+                continue
+
+            if fingerprint is not None:
+                match = next(
+                    (i for i, h in batch_hashes if hamming_distance(fingerprint, h) <= self.max_distance),
+                    None,
+                )
+                if match is not None:
+                    also = kept[match].setdefault("also_reported_by", [])
+                    if result.get("url"):
+                        also.append(result["url"])
+                    self.merged += 1
+                    self._record_saving(result)
+                    if url:
+                        self.seen_urls.add(url)
+                        self.new_fingerprints.append({"url": url, "simhash": None})
+                    continue
+                if self._is_near_duplicate(fingerprint):
+                    self.dropped += 1
+                    self._record_saving(result)
+                    continue
+
+            if url:
+                self.seen_urls.add(url)
+            if fingerprint is not None:
+                self.seen_hashes.append(fingerprint)
+                batch_hashes.append((len(kept), fingerprint))
+            # Stored as hex: graph state is serialized and 64-bit ints are not portable
+            self.new_fingerprints.append({"url": url, "simhash": f"{fingerprint:016x}" if fingerprint is not None else None})
+            kept.append(dict(result))
+        return kept
+
+    def stats(self) -> dict:
+        return {
+            "dropped": self.dropped,
+            "merged": self.merged,
+            "bytes_saved": self.bytes_saved,
+            "tokens_saved": self.tokens_saved,
+        }
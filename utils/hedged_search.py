@@ -0,0 +1,246 @@
+"""
+Hedged search across several providers with per-provider circuit breakers.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from typing import Callable, List, Optional, Tuple
+
+
+class LatencyStats:
+    """Rolling latency window plus success/error counters for one provider."""
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.successes = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            if ok:
+                self.latencies.append(latency)
+                self.successes += 1
+            else:
+                self.errors += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Latency at the given percentile (0-100), or None without samples."""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self) -> dict:
+        total = self.successes + self.errors
+        return {
+            "successes": self.successes,
+            "errors": self.errors,
+            "error_rate": self.errors / total if total else 0.0,
+            "samples": len(self.latencies),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+        }
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+    Opens after `failure_threshold` consecutive failures (slow calls count as failures)
+    and lets a single trial call through once `cooldown_seconds` have passed.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, cooldown_seconds: float = 30.0, slow_call_seconds: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may be sent to the provider now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record(self, latency: float, ok: bool):
+        ok = ok and latency < self.slow_call_seconds
+        with self._lock:
+            if ok:
+                self.state = self.CLOSED
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+                if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                    self.state = self.OPEN
+                    self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self):
+        """Give back a half-open trial slot that was claimed but never used."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class HedgedSearch:
+    """
+    Sends a query to the first healthy provider and, if it has not answered within
+    its own latency percentile, also to the next one. The first non-empty result wins;
+    an empty one is a successful answer for the breaker and is returned if no
+    provider has hits.
+
+    Calls run on worker threads, so the losing call cannot be interrupted; it is
+    cancelled if it has not started yet and otherwise left to finish in the
+    background, where its outcome still feeds the provider's stats and breaker.
+    """
+
+    name = "hedged"
+
+    def __init__(
+        self,
+        providers: List[Tuple[str, Callable[[str], list]]],
+        hedge_percentile: float = 90,
+        default_hedge_delay: float = 2.0,
+        min_samples: int = 5,
+        timeout_seconds: float = 20.0,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+        slow_call_seconds: float = 10.0,
+        acquire: Optional[Callable[[str], object]] = None,
+    ):
+        self.providers = providers
+        self.acquire = acquire
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.timeout_seconds = timeout_seconds
+        self.latency = {name: LatencyStats() for name, _ in providers}
+        self.breakers = {
+            name: CircuitBreaker(failure_threshold, cooldown_seconds, slow_call_seconds)
+            for name, _ in providers
+        }
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+        self._pool = ThreadPoolExecutor(max_workers=max(4, 4 * len(providers)), thread_name_prefix="search")
+
+    def _hedge_delay(self, name: str) -> float:
+        stats = self.latency[name]
+        if len(stats.latencies) < self.min_samples:
+            return self.default_hedge_delay
+        return stats.percentile(self.hedge_percentile)
+
+    def _call(self, name: str, fn: Callable[[str], list], query: str) -> list:
+        if self.acquire:
+            # Rate-limit queueing is our own back-pressure, not provider latency
+            try:
+                self.acquire(name)
+            except Exception:
+                self.breakers[name].release()  # The claimed half-open trial was never sent
+                raise
+        start = time.monotonic()
+        try:
+            results = fn(query)
+            if not isinstance(results, list):
+                raise ValueError(f"{name} returned {type(results).__name__}, not a result list")
+        except Exception:
+            latency = time.monotonic() - start
+            self.latency[name].record(latency, ok=False)
+            self.breakers[name].record(latency, ok=False)
+            raise
+        latency = time.monotonic() - start
+        self.latency[name].record(latency, ok=True)
+        self.breakers[name].record(latency, ok=True)
+        return results
+
+    def _cancel(self, pending: dict):
+        for future, name in pending.items():
+            if future.cancel():
+                self.breakers[name].release()
+
+    def invoke(self, query: str) -> list:
+        deadline = time.monotonic() + self.timeout_seconds
+        remaining = list(self.providers)
+        pending = {}
+        errors = []
+        answered_empty = False
+
+        def launch():
+            # Breakers are consulted only at launch so an unused half-open trial is never claimed
+            while remaining:
+                name, fn = remaining.pop(0)
+                if self.breakers[name].allow():
+                    # The caller's context goes along so the rate limiter sees its conversation thread
+                    pending[self._pool.submit(copy_context().run, self._call, name, fn, query)] = name
+                    return name
+            return None
+
+        primary = launch()
+        if primary is None:
+            raise RuntimeError("All search providers are unavailable (circuit open)")
+        hedge_at = time.monotonic() + self._hedge_delay(primary)
+
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wait_until = min(hedge_at, deadline) if remaining else deadline
+            done, _ = wait(list(pending), timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    errors.append(f"{name}: {e}")
+                    continue
+                if not results:
+                    answered_empty = True  # A healthy answer, but another provider may have hits
+                    continue
+                if name != primary:
+                    self.hedge_wins += 1
+                self._cancel(pending)
+                return results
+
+            # Primary is slow or every in-flight call failed or came back empty: bring in the next provider
+            if remaining and (not pending or time.monotonic() >= hedge_at):
+                hedged = launch()
+                if hedged:
+                    print(f"DEBUG [hedged_search]: Hedging {query!r} to {hedged}")
+                    self.hedges_fired += 1
+                    hedge_at = time.monotonic() + self._hedge_delay(hedged)
+
+        self._cancel(pending)
+        if answered_empty:
+            return []
+        if errors and not pending:
+            raise RuntimeError("All search providers failed: " + "; ".join(errors))
+        raise TimeoutError(f"Search timed out after {self.timeout_seconds}s")
+
+    def stats(self) -> dict:
+        """Per-provider latency/error stats and breaker state."""
+        return {
+            "hedges_fired": self.hedges_fired,
+            "hedge_wins": self.hedge_wins,
+            "providers": {
+                name: dict(self.latency[name].snapshot(), circuit=self.breakers[name].state)
+                for name, _ in self.providers
+            },
+        }
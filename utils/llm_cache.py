@@ -0,0 +1,250 @@
+"""
+Persistent exact + semantic response cache for deterministic LLM calls
+(intent classification and quick/deep planning).
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.messages import AIMessage, BaseMessage
+
+from config import Config
+from utils.embeddings import embed_texts
+
+_CACHED_PARAMS = ("model", "temperature", "num_predict", "num_ctx", "top_k", "top_p",
+                  "repeat_penalty", "seed", "format", "stop")
+
+
+def llm_params(llm) -> str:
+    """Stable string of the client parameters that change the model's answer."""
+    return json.dumps({p: getattr(llm, p, None) for p in _CACHED_PARAMS}, sort_keys=True, default=str)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def call_params(llm, messages: List[BaseMessage]) -> str:
+    """
+    llm_params plus the client's role and a hash of the system prompt, so
+    answers are only reused by the same caller and prompt template.
+    """
+    system = "\n".join(str(m.content) for m in messages if m.type == "system")
+    return json.dumps({"llm": llm_params(llm), "role": getattr(llm, "role", ""), "system": _digest(system)},
+                      sort_keys=True)
+
+
+class LLMResponseCache:
+    """
+    Two tiers, both persisted in SQLite with per-entry TTL and LRU eviction:
+    - exact: keyed by call parameters (model, role, system prompt) + the full prompt.
+    - semantic: within a scope (call parameters + everything in the prompt
+      except the query), reuses the answer of a stored query whose embedding
+      is at least semantic_threshold cosine-similar.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: int, max_entries: int,
+                 semantic_threshold: Optional[float] = None,
+                 embed_fn: Callable[[List[str]], np.ndarray] = embed_texts):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self.embed_fn = embed_fn
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # scope -> {key: unit vector}, loaded lazily from the database
+        self._vectors: Dict[str, Dict[str, np.ndarray]] = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                scope TEXT NOT NULL,
+                content TEXT NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_scope ON llm_cache(scope)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(params: str, messages: List[BaseMessage]) -> str:
+        """Exact-tier key from model parameters and the rendered prompt."""
+        return _digest(params, json.dumps([(m.type, m.content) for m in messages]))
+
+    @staticmethod
+    def make_scope(params: str, scope: str) -> str:
+        """Semantic-tier scope from model parameters and the non-query prompt context."""
+        return _digest(params, scope)
+
+    def _scope_vectors(self, scope_key: str) -> Dict[str, np.ndarray]:
+        """In-memory vectors of a scope (caller holds the lock)."""
+        if scope_key not in self._vectors:
+            rows = self._conn.execute(
+                "SELECT key, embedding FROM llm_cache WHERE scope = ? AND embedding IS NOT NULL",
+                (scope_key,),
+            ).fetchall()
+            self._vectors[scope_key] = {k: np.frombuffer(blob, dtype=np.float32) for k, blob in rows}
+        return self._vectors[scope_key]
+
+    def _fetch(self, key: str, now: float) -> Optional[str]:
+        """Fresh content for a key, dropping it if expired (caller holds the lock)."""
+        row = self._conn.execute(
+            "SELECT content, expires_at, scope FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+            self._vectors.get(row[2], {}).pop(key, None)
+            return None
+        self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        return row[0]
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Unit query vector for the semantic tier, or None if it is off or embedding fails."""
+        if self.semantic_threshold is None or not text:
+            return None
+        try:
+            vector = np.asarray(self.embed_fn([text])[0], dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️ LLM cache: query embedding failed, semantic tier skipped: {e}")
+            return None
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, params: str, messages: List[BaseMessage], semantic_text: str = None,
+               scope: str = "") -> Tuple[Optional[Tuple[str, str]], Optional[np.ndarray]]:
+        """
+        Returns ((content, tier), vector) where tier is 'exact' or 'semantic',
+        or (None, vector) on a miss. The query vector is only computed after an
+        exact miss and is returned so update() can store it.
+        """
+        with self._lock:
+            content = self._fetch(self.make_key(params, messages), time.time())
+            if content is not None:
+                self.exact_hits += 1
+                return (content, "exact"), None
+
+        vector = self.embed(semantic_text)
+        with self._lock:
+            if vector is not None:
+                vectors = self._scope_vectors(self.make_scope(params, scope))
+                if vectors:
+                    keys = list(vectors)
+                    sims = np.stack([vectors[k] for k in keys]) @ vector
+                    for idx in np.argsort(-sims):
+                        if sims[idx] < self.semantic_threshold:
+                            break
+                        content = self._fetch(keys[idx], time.time())
+                        if content is not None:
+                            self.semantic_hits += 1
+                            return (content, "semantic"), vector
+            self.misses += 1
+        return None, vector
+
+    def update(self, params: str, messages: List[BaseMessage], content: str,
+               vector: Optional[np.ndarray] = None, scope: str = "", ttl_seconds: Optional[int] = None):
+        """Stores a response, evicting least recently used entries past max_entries."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        key = self.make_key(params, messages)
+        scope_key = self.make_scope(params, scope)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_cache
+                    (key, scope, content, embedding, created_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, scope_key, content, vector.tobytes() if vector is not None else None, now, now + ttl, now),
+            )
+            if vector is not None and scope_key in self._vectors:
+                self._vectors[scope_key][key] = vector
+            evicted = self._conn.execute(
+                "SELECT key, scope FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                (self.max_entries,),
+            ).fetchall()
+            for old_key, old_scope in evicted:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (old_key,))
+                self._vectors.get(old_scope, {}).pop(old_key, None)
+            self._conn.commit()
+
+    def invoke(self, llm, messages: List[BaseMessage], semantic_text: str = None, scope: str = ""):
+        """
+        llm.invoke(messages) through the cache. semantic_text is the part of the
+        prompt that may vary between reusable answers (the query); scope is the
+        rest of the variable prompt context (e.g. earlier history).
+        Non-zero temperature calls are never cached.
+        """
+        if getattr(llm, "temperature", None):
+            return llm.invoke(messages)
+        params = call_params(llm, messages)
+        hit, vector = self.lookup(params, messages, semantic_text=semantic_text, scope=scope)
+        if hit is not None:
+            content, tier = hit
+            print(f"DEBUG: LLM cache {tier} hit ({getattr(llm, 'role', 'llm')})")
+            return AIMessage(content=content, response_metadata={"cache": tier})
+
+        response = llm.invoke(messages)
+        self.update(params, messages, response.content, vector=vector, scope=scope)
+        return response
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._vectors.clear()
+            self.exact_hits = self.semantic_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters per tier and current entry count."""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": size,
+        }
+
+
+# Process-wide cache shared by all graph runs
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMResponseCache:
+    """Get or create the shared LLM response cache."""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache(
+                Config.LLM_CACHE_PATH,
+                ttl_seconds=Config.LLM_CACHE_TTL_SECONDS,
+                max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+                semantic_threshold=Config.LLM_CACHE_SEMANTIC_THRESHOLD if Config.LLM_CACHE_SEMANTIC_ENABLED else None,
+            )
+    return _llm_cache
+
+
+def cached_invoke(llm, messages: List[BaseMessage], semantic_text: str = None, scope: str = ""):
+    """llm.invoke through the shared cache when LLM_CACHE_ENABLED, otherwise directly."""
+    if not Config.LLM_CACHE_ENABLED:
+        return llm.invoke(messages)
+    return get_llm_cache().invoke(llm, messages, semantic_text=semantic_text, scope=scope)
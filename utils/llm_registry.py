@@ -0,0 +1,234 @@
+"""
+Central registry of LLM clients: one configured ChatOllama per role, sharing a
+single keep-alive HTTP pool per Ollama host and a process-wide in-flight limit
+that is scheduled by priority lane (see utils/llm_scheduler.py). With several
+hosts, each call is routed through the endpoint pool (see utils/endpoint_pool.py).
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from langchain_ollama import ChatOllama
+from ollama import Client
+from pydantic import PrivateAttr
+
+from config import Config
+from utils.endpoint_pool import EndpointPool
+from utils.llm_scheduler import LLMScheduler
+
+
+def ollama_host(url: str) -> str:
+    """Strips an API path (e.g. '/api/generate') so only scheme://host:port remains."""
+    parts = urlsplit(url if "://" in url else f"http://{url}")
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+
+class _RoleStats:
+    def __init__(self, window: int):
+        self.calls = 0
+        self.errors = 0
+        self.queue_waits = deque(maxlen=window)
+        self.first_token = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_queue_wait": _percentile(self.queue_waits, 50),
+            "p95_queue_wait": _percentile(self.queue_waits, 95),
+            "p50_first_token": _percentile(self.first_token, 50),
+            "p50_latency": _percentile(self.latencies, 50),
+            "p95_latency": _percentile(self.latencies, 95),
+        }
+
+
+class PooledChatOllama(ChatOllama):
+    """
+    ChatOllama whose requests go through the registry: every call (invoke or
+    stream) holds one in-flight slot until its response stream is finished.
+    Pooled clients pick their Ollama host per call instead of using `_client`.
+    """
+
+    role: str = "default"
+    lane: str = "research"
+    _registry: Optional["LLMRegistry"] = PrivateAttr(default=None)
+    _pool: Optional[EndpointPool] = PrivateAttr(default=None)
+
+    def _create_chat_stream(self, messages, stop=None, **kwargs):
+        if self._registry is None:
+            yield from super()._create_chat_stream(messages, stop, **kwargs)
+            return
+        with self._registry.slot(self.role, self.lane) as call:
+            if self._pool is None:
+                parts = super()._create_chat_stream(messages, stop, **kwargs)
+            else:
+                parts = self._pool.stream(self.model, self._chat_params(messages, stop, **kwargs))
+            for part in parts:
+                call.first_token()
+                yield part
+
+
+class _Call:
+    def __init__(self, started: float):
+        self.started = started
+        self.first_token_at = None
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+
+
+class LLMRegistry:
+    """
+    Hands out one cached client per role. All clients talking to the same host
+    share one ollama.Client (and so one httpx keep-alive pool), and at most
+    max_in_flight requests run at once across the whole process, granted by
+    lane priority. Roles on the default host are spread over `base_urls` when
+    more than one host is given.
+    """
+
+    def __init__(self, base_url: str = None, max_in_flight: int = None, pool_size: int = None,
+                 timeout: float = None, window: int = 500, lane_caps: Dict[str, int] = None,
+                 aging_seconds: float = None, base_urls: List[str] = None):
+        hosts = [ollama_host(u) for u in base_urls or ([base_url] if base_url else Config.OLLAMA_BASE_URLS)]
+        self.base_url = hosts[0]
+        self.max_in_flight = max_in_flight or Config.LLM_MAX_IN_FLIGHT
+        self.pool_size = pool_size or Config.LLM_HTTP_POOL_SIZE
+        self.timeout = timeout or Config.LLM_REQUEST_TIMEOUT_SECONDS
+        self.window = window
+        self._lock = threading.Lock()
+        self.scheduler = LLMScheduler(self.max_in_flight, lane_caps, aging_seconds, window)
+        self._clients: Dict[tuple, PooledChatOllama] = {}
+        self._http: Dict[str, Client] = {}
+        self.pool = EndpointPool(hosts, client_for=self._http_client)
+        self._stats: Dict[str, _RoleStats] = {}
+        self.waiting = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def _http_client(self, host: str) -> Client:
+        """One ollama.Client per host; its httpx pool keeps connections alive between calls."""
+        with self._lock:
+            if host not in self._http:
+                self._http[host] = Client(
+                    host=host,
+                    timeout=self.timeout,
+                    limits=httpx.Limits(
+                        max_connections=self.pool_size,
+                        max_keepalive_connections=self.pool_size,
+                    ),
+                )
+            return self._http[host]
+
+    def get(self, role: str = "default", lane: str = None, **overrides) -> PooledChatOllama:
+        """
+        Get or create the client for a role; overrides are ChatOllama fields (model,
+        num_predict, ...). `lane` defaults to Config.LLM_ROLE_LANES[role].
+        """
+        lane = lane or Config.LLM_ROLE_LANES.get(role, "research")
+        params = {
+            "model": Config.MODEL_NAME,
+            "temperature": Config.TEMPERATURE,
+            "base_url": self.base_url,
+            "keep_alive": Config.OLLAMA_KEEP_ALIVE,
+            **Config.LLM_ROLE_OPTIONS.get(role, {}),
+            **overrides,
+        }
+        key = (role, lane, tuple(sorted((k, repr(v)) for k, v in params.items())))
+        with self._lock:
+            client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        client = PooledChatOllama(role=role, lane=lane, **params)
+        client._client = self._http_client(ollama_host(params["base_url"]))
+        client._registry = self
+        if len(self.pool.endpoints) > 1 and ollama_host(params["base_url"]) == self.base_url:
+            client._pool = self.pool  # Roles pinned to another base_url keep their host
+        with self._lock:
+            return self._clients.setdefault(key, client)
+
+    @contextmanager
+    def slot(self, role: str, lane: str = None):
+        """Waits for an in-flight slot in the lane and records queue wait and latency for the role."""
+        lane = lane or Config.LLM_ROLE_LANES.get(role, "research")
+        start = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+            stats = self._stats.setdefault(role, _RoleStats(self.window))
+        acquired = False
+        try:
+            self.scheduler.acquire(lane)
+            acquired = True
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                if acquired:
+                    self.in_flight += 1
+                    self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        call = _Call(time.monotonic())
+        failed = False
+        try:
+            yield call
+        except GeneratorExit:
+            raise  # Caller stopped reading the stream early; not an error
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.scheduler.release(lane)
+            end = time.monotonic()
+            with self._lock:
+                self.in_flight -= 1
+                stats.calls += 1
+                stats.errors += failed
+                stats.queue_waits.append(call.started - start)
+                stats.latencies.append(end - call.started)
+                if call.first_token_at is not None:
+                    stats.first_token.append(call.first_token_at - call.started)
+
+    def stats(self) -> dict:
+        """Queue depth, in-flight count, per-role latency and per-lane queue-wait metrics."""
+        lanes = self.scheduler.stats()
+        with self._lock:
+            return {
+                "base_url": self.base_url,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "queue_depth": self.waiting,
+                "roles": {role: s.snapshot() for role, s in self._stats.items()},
+                "lanes": lanes,
+                "endpoints": self.pool.stats(),
+            }
+
+
+# Singleton instance
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_llm_registry() -> LLMRegistry:
+    """Get or create the process-wide LLM registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = LLMRegistry()
+    return _registry
+
+
+def get_llm(role: str = "default", lane: str = None, **overrides) -> PooledChatOllama:
+    """Shortcut for get_llm_registry().get(role, lane, ...)."""
+    return get_llm_registry().get(role, lane, **overrides)
@@ -0,0 +1,139 @@
+"""
+Priority scheduler for LLM calls: requests wait in lanes (interactive, routing,
+research, background), each with its own concurrency cap. A free slot goes to
+the highest-priority eligible waiter; waiting time raises priority so lower
+lanes are never starved.
+"""
+import bisect
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from config import Config
+
+# Highest priority first
+LANES = ("interactive", "routing", "research", "background")
+
+# Upper bounds (seconds) of the queue-wait histogram buckets; the last bucket is +Inf
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+
+class _Lane:
+    def __init__(self, name: str, cap: int, window: int):
+        self.name = name
+        self.cap = cap
+        self.in_flight = 0
+        self.queued = 0
+        self.calls = 0
+        self.buckets = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_sum = 0.0
+        self.waits = deque(maxlen=window)
+
+    def observe(self, wait: float):
+        self.calls += 1
+        self.buckets[bisect.bisect_left(WAIT_BUCKETS, wait)] += 1
+        self.wait_sum += wait
+        self.waits.append(wait)
+
+    def snapshot(self) -> dict:
+        cumulative = list(itertools.accumulate(self.buckets))
+        return {
+            "cap": self.cap,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "calls": self.calls,
+            "wait_sum": self.wait_sum,
+            "wait_histogram": {
+                **{str(bound): count for bound, count in zip(WAIT_BUCKETS, cumulative)},
+                "+Inf": cumulative[-1],
+            },
+            "p50_wait": _percentile(self.waits, 50),
+            "p95_wait": _percentile(self.waits, 95),
+        }
+
+
+class _Waiter:
+    __slots__ = ("lane", "enqueued", "seq")
+
+    def __init__(self, lane: str, seq: int):
+        self.lane = lane
+        self.enqueued = time.monotonic()
+        self.seq = seq
+
+
+class LLMScheduler:
+    """
+    Grants at most max_in_flight slots in total and at most lane_caps[lane] per
+    lane. Among eligible waiters the lowest effective rank wins: the lane's
+    index in LANES minus one level per aging_seconds waited, then arrival order.
+    """
+
+    def __init__(self, max_in_flight: int = None, lane_caps: Dict[str, int] = None,
+                 aging_seconds: float = None, window: int = 500):
+        self.max_in_flight = max_in_flight or Config.LLM_MAX_IN_FLIGHT
+        caps = {**Config.LLM_LANE_CAPS, **(lane_caps or {})}
+        self.aging_seconds = aging_seconds or Config.LLM_LANE_AGING_SECONDS
+        self._lanes = {name: _Lane(name, caps.get(name, self.max_in_flight), window) for name in LANES}
+        self._cond = threading.Condition()
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self.in_flight = 0
+
+    def _lane(self, name: str) -> _Lane:
+        if name not in self._lanes:
+            raise ValueError(f"Unknown LLM lane '{name}' (expected one of {', '.join(LANES)})")
+        return self._lanes[name]
+
+    def _rank(self, waiter: _Waiter, now: float):
+        aged = int((now - waiter.enqueued) / self.aging_seconds)
+        return LANES.index(waiter.lane) - aged, waiter.seq
+
+    def _next(self) -> Optional[_Waiter]:
+        if self.in_flight >= self.max_in_flight:
+            return None
+        eligible = [w for w in self._waiters if self._lanes[w.lane].in_flight < self._lanes[w.lane].cap]
+        if not eligible:
+            return None
+        now = time.monotonic()
+        return min(eligible, key=lambda w: self._rank(w, now))
+
+    def acquire(self, lane: str) -> float:
+        """Blocks until the lane gets a slot; returns the time spent waiting."""
+        with self._cond:
+            stats = self._lane(lane)
+            waiter = _Waiter(lane, next(self._seq))
+            self._waiters.append(waiter)
+            stats.queued += 1
+            try:
+                while self._next() is not waiter:
+                    # Re-checked on every release, and periodically so aging takes effect
+                    self._cond.wait(self.aging_seconds)
+            finally:
+                self._waiters.remove(waiter)
+                stats.queued -= 1
+            stats.in_flight += 1
+            self.in_flight += 1
+            wait = time.monotonic() - waiter.enqueued
+            stats.observe(wait)
+            self._cond.notify_all()  # Another waiter may still fit in a different lane
+            return wait
+
+    def release(self, lane: str):
+        with self._cond:
+            self._lanes[lane].in_flight -= 1
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """Per-lane cap, in-flight and queued counts, and queue-wait histogram (cumulative buckets)."""
+        with self._cond:
+            return {name: lane.snapshot() for name, lane in self._lanes.items()}
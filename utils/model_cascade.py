@@ -0,0 +1,91 @@
+"""
+Per-node model assignment and escalation: a node's call goes to the first
+(smallest) model of its NODE_MODELS entry and moves to the next one only when
+the answer fails to parse, reports low confidence, or the call errors.
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Tuple, TypeVar
+
+from config import Config
+
+T = TypeVar("T")
+
+
+def node_models(role: str) -> List[str]:
+    """Models tried for a role, smallest first; only the last one when the cascade is off."""
+    models = Config.NODE_MODELS.get(role) or [Config.MODEL_NAME]
+    return list(models) if Config.MODEL_CASCADE_ENABLED else [models[-1]]
+
+
+class _NodeStats:
+    def __init__(self, window: int):
+        self.calls = 0
+        self.escalations = 0
+        self.reasons: Dict[str, int] = {}
+        self.latencies: Dict[str, deque] = {}
+        self.window = window
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "escalations": self.escalations,
+            "escalation_rate": self.escalations / self.calls if self.calls else 0.0,
+            "reasons": dict(self.reasons),
+            "p50_latency": {m: sorted(s)[len(s) // 2] for m, s in self.latencies.items() if s},
+        }
+
+
+class ModelCascade:
+    """Runs calls through a role's model list and records latency per model and escalation rates."""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _NodeStats] = {}
+
+    def run(self, role: str, attempt: Callable[[str], T], accept: Callable[[T], bool]) -> Tuple[T, str]:
+        """
+        Calls attempt(model) for each model of the role until accept(result) is true;
+        the last model's result is returned as-is. Returns (result, model used).
+        """
+        models = node_models(role)
+        with self._lock:
+            stats = self._stats.setdefault(role, _NodeStats(self.window))
+            stats.calls += 1
+        for i, model in enumerate(models):
+            last = i == len(models) - 1
+            start = time.monotonic()
+            try:
+                result = attempt(model)
+                reason = None if last or accept(result) else "rejected"
+            except Exception as e:
+                if last:
+                    raise
+                result, reason = None, type(e).__name__
+            with self._lock:
+                stats.latencies.setdefault(model, deque(maxlen=self.window)).append(time.monotonic() - start)
+                if reason:
+                    stats.escalations += 1
+                    stats.reasons[reason] = stats.reasons.get(reason, 0) + 1
+            if reason is None:
+                return result, model
+            print(f"DEBUG [model_cascade]: {role} escalating from {model} to {models[i + 1]} ({reason})")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {role: s.snapshot() for role, s in self._stats.items()}
+
+
+# Singleton instance
+_cascade = None
+_cascade_lock = threading.Lock()
+
+def get_model_cascade() -> ModelCascade:
+    """Get or create the process-wide model cascade."""
+    global _cascade
+    with _cascade_lock:
+        if _cascade is None:
+            _cascade = ModelCascade()
+    return _cascade
@@ -0,0 +1,126 @@
+"""
+Ollama model warm-up and keep-alive: loads every configured model before the
+first query, optionally evaluates the first prompt's static prefix so its KV
+cache is ready, and reloads models that Ollama evicted while idle.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from utils.llm_registry import LLMRegistry, get_llm_registry, ollama_host
+from utils.model_cascade import node_models
+
+
+def configured_models(registry: LLMRegistry) -> List[Tuple[str, str]]:
+    """
+    (host, model) pairs used by any role: the default model and NODE_MODELS on
+    every pooled host, plus LLM_ROLE_OPTIONS overrides.
+    """
+    models = [Config.MODEL_NAME] + [model for role in Config.NODE_MODELS for model in node_models(role)]
+    pairs = [(host, model) for host in registry.pool.hosts for model in models]
+    for options in Config.LLM_ROLE_OPTIONS.values():
+        pairs.append((ollama_host(options.get("base_url", registry.base_url)), options.get("model", Config.MODEL_NAME)))
+    return list(dict.fromkeys(pairs))
+
+
+def _prefix_messages() -> List[dict]:
+    """System message of the first LLM call of every query (intent triage)."""
+    from prompts.clarification_prompts import FUSED_TRIAGE_PROMPT, INTENT_ORCHESTRATOR_PROMPT
+
+    prompt = FUSED_TRIAGE_PROMPT if Config.FUSED_PREPROCESSING_ENABLED else INTENT_ORCHESTRATOR_PROMPT
+    system = prompt.format_messages(history="", query="")[0]
+    return [{"role": "system", "content": system.content}]
+
+
+class ModelWarmup:
+    """
+    Preloads models with an empty /api/generate call (keep_alive set so they stay
+    resident), then checks /api/ps every `interval` seconds and reloads any model
+    that is no longer loaded.
+    """
+
+    def __init__(self, registry: LLMRegistry = None, keep_alive=None, interval: float = None,
+                 prime_prefix: bool = None):
+        self.registry = registry or get_llm_registry()
+        self.keep_alive = keep_alive if keep_alive is not None else Config.OLLAMA_KEEP_ALIVE
+        self.interval = interval or Config.OLLAMA_KEEPALIVE_INTERVAL_SECONDS
+        self.prime_prefix = Config.OLLAMA_WARMUP_PRIME_PREFIX if prime_prefix is None else prime_prefix
+        self.load_seconds: Dict[str, float] = {}
+        self.reloads = 0
+        self.errors = 0
+        self.ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def warm(self, host: str, model: str) -> bool:
+        """Loads one model (and primes the triage prefix); returns False if Ollama is unreachable."""
+        client = self.registry._http_client(host)
+        start = time.monotonic()
+        try:
+            with self.registry.slot("warmup", "background"):
+                client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+                if self.prime_prefix:
+                    client.chat(model=model, messages=_prefix_messages(), options={"num_predict": 1},
+                                keep_alive=self.keep_alive)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Model warm-up failed for {model} at {host}: {e}")
+            return False
+        self.load_seconds[f"{host}/{model}"] = time.monotonic() - start
+        print(f"DEBUG [model_warmup]: {model} ready in {self.load_seconds[f'{host}/{model}']:.2f}s")
+        return True
+
+    def refresh(self) -> int:
+        """Reloads configured models that Ollama no longer has loaded; returns how many were reloaded."""
+        reloaded = 0
+        for host, model in configured_models(self.registry):
+            try:
+                loaded = {m.model for m in self.registry._http_client(host).ps().models}
+            except Exception as e:
+                print(f"⚠️ Could not list loaded models at {host}: {e}")
+                continue
+            if model not in loaded and f"{model}:latest" not in loaded and self.warm(host, model):
+                reloaded += 1
+        self.reloads += reloaded
+        return reloaded
+
+    def _run(self):
+        for host, model in configured_models(self.registry):
+            self.warm(host, model)
+        self.ready.set()
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def start(self) -> "ModelWarmup":
+        """Warms up in a background thread so startup is not blocked; idempotent."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready.is_set(),
+            "load_seconds": dict(self.load_seconds),
+            "reloads": self.reloads,
+            "errors": self.errors,
+        }
+
+
+# Singleton instance
+_warmup = None
+_warmup_lock = threading.Lock()
+
+def start_model_warmup() -> Optional[ModelWarmup]:
+    """Starts the process-wide warm-up/keep-alive thread once (no-op when disabled)."""
+    global _warmup
+    if not Config.OLLAMA_WARMUP_ENABLED:
+        return None
+    with _warmup_lock:
+        if _warmup is None:
+            _warmup = ModelWarmup().start()
+    return _warmup
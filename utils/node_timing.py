@@ -0,0 +1,16 @@
+"""
+Wall-clock timing of graph nodes, recorded in the state's node_timings.
+"""
+import functools
+import time
+
+
+def timed_node(name: str, fn):
+    """Wraps a node so its update also carries {name: seconds} in node_timings."""
+    @functools.wraps(fn)
+    def wrapper(state):
+        start = time.perf_counter()
+        result = dict(fn(state) or {})
+        result["node_timings"] = {**result.get("node_timings", {}), name: time.perf_counter() - start}
+        return result
+    return wrapper
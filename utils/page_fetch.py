@@ -0,0 +1,231 @@
+"""
+Page fetching and main-text extraction for search result URLs.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+import httpx
+
+from config import Config
+
+
+class _MainTextParser(HTMLParser):
+    """Collects readable text, skipping scripts, navigation and other page chrome."""
+
+    SKIP_TAGS = {"script", "style", "noscript", "svg", "nav", "header", "footer", "aside", "form", "iframe"}
+    BLOCK_TAGS = {"p", "li", "pre", "blockquote", "td", "th", "dd", "dt", "div", "section", "article", "main",
+                  "h1", "h2", "h3", "h4", "h5", "h6", "br", "tr"}
+    MAIN_TAGS = {"article", "main"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._pre_depth = 0
+        self.blocks = []        # text blocks from the whole page
+        self.main_blocks = []   # text blocks inside <article>/<main>
+        self._current = []
+
+    def _flush(self):
+        text = "".join(self._current)
+        self._current = []
+        if self._pre_depth:
+            text = text.strip("\n")
+        else:
+            text = " ".join(text.split())
+        if text:
+            self.blocks.append(text)
+            if self._main_depth:
+                self.main_blocks.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+        if tag in self.MAIN_TAGS:
+            self._main_depth += 1
+        if tag == "pre":
+            self._pre_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+        if tag in self.MAIN_TAGS:
+            self._main_depth = max(0, self._main_depth - 1)
+        if tag == "pre":
+            self._pre_depth = max(0, self._pre_depth - 1)
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._current.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def extract_main_text(html: str, min_block_chars: int = 40) -> str:
+    """
+    Extracts the main readable text of an HTML page.
+    Prefers <article>/<main> content and drops short boilerplate blocks (menus, buttons).
+    """
+    if not re.search(r"<[a-zA-Z!/]", html[:2000]):
+        return html.strip()  # Plain text body
+
+    parser = _MainTextParser()
+    parser.feed(html)
+    parser.close()
+
+    blocks = parser.main_blocks or parser.blocks
+    kept = [b for b in blocks if len(b) >= min_block_chars or "\n" in b]
+    return "\n\n".join(kept or blocks)
+
+
+class PageFetcher:
+    """
+    Fetches pages over one shared keep-alive connection pool.
+    Bodies are streamed with size and time caps; extracted text is cached on disk
+    by URL and revalidated with the server's ETag.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 1_000_000,
+        timeout_seconds: float = 5.0,
+        max_workers: int = 4,
+        cache_ttl_seconds: int = 24 * 60 * 60,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.timeout_seconds = timeout_seconds
+        self.max_workers = max_workers
+        self.cache_ttl_seconds = cache_ttl_seconds
+        os.makedirs(cache_dir, exist_ok=True)
+        self.client = httpx.Client(
+            follow_redirects=True,
+            timeout=httpx.Timeout(timeout_seconds),
+            limits=httpx.Limits(max_connections=max_workers * 2, max_keepalive_connections=max_workers),
+            headers={"User-Agent": "Mozilla/5.0 (compatible; DeveloperResearchAgent/0.1)"},
+        )
+        self.stats = {"fetched": 0, "cache_hits": 0, "revalidated": 0, "truncated": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _load_cached(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._cache_path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store_cached(self, url: str, etag: Optional[str], text: str):
+        entry = {"url": url, "etag": etag, "text": text, "fetched_at": time.time()}
+        tmp_path = self._cache_path(url) + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._cache_path(url))
+        except OSError as e:
+            print(f"⚠️ Page cache write failed: {e}")
+
+    def fetch(self, url: str) -> Optional[str]:
+        """Return the extracted main text of a page, or None if it could not be fetched."""
+        cached = self._load_cached(url)
+        if cached and time.time() - cached.get("fetched_at", 0) < self.cache_ttl_seconds:
+            self._count("cache_hits")
+            return cached["text"]
+
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+
+        deadline = time.monotonic() + self.timeout_seconds
+        chunks = []
+        size = 0
+        try:
+            with self.client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and cached:
+                    self._count("revalidated")
+                    self._store_cached(url, cached.get("etag"), cached["text"])
+                    return cached["text"]
+                if response.status_code != 200:
+                    self._count("failed")
+                    return None
+                content_type = response.headers.get("content-type", "")
+                if content_type and not content_type.startswith(("text/", "application/xhtml")):
+                    self._count("failed")
+                    return None
+
+                try:
+                    for chunk in response.iter_bytes():
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= self.max_bytes or time.monotonic() >= deadline:
+                            self._count("truncated")
+                            break
+                except httpx.TimeoutException:
+                    # Keep whatever arrived before the read timed out
+                    if not chunks:
+                        raise
+                    self._count("truncated")
+
+                etag = response.headers.get("etag")
+                encoding = response.charset_encoding or "utf-8"
+        except httpx.HTTPError as e:
+            print(f"DEBUG [page_fetch]: {url} failed: {e}")
+            self._count("failed")
+            return None
+
+        body = b"".join(chunks)[: self.max_bytes].decode(encoding, errors="replace")
+        text = extract_main_text(body)
+        self._count("fetched")
+        self._store_cached(url, etag, text)
+        return text
+
+    def fetch_many(self, urls: List[str]) -> Dict[str, str]:
+        """Fetch several URLs concurrently; returns {url: text} for pages that succeeded."""
+        urls = list(dict.fromkeys(u for u in urls if u))
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as pool:
+            texts = list(pool.map(self.fetch, urls))
+        return {url: text for url, text in zip(urls, texts) if text}
+
+    def close(self):
+        self.client.close()
+
+
+# Process-wide fetcher so every graph run shares one connection pool
+_page_fetcher = None
+_page_fetcher_lock = threading.Lock()
+
+def get_page_fetcher() -> PageFetcher:
+    """Get or create the shared page fetcher."""
+    global _page_fetcher
+    with _page_fetcher_lock:
+        if _page_fetcher is None:
+            _page_fetcher = PageFetcher(
+                Config.PAGE_CACHE_DIR,
+                max_bytes=Config.PAGE_FETCH_MAX_BYTES,
+                timeout_seconds=Config.PAGE_FETCH_TIMEOUT_SECONDS,
+                max_workers=Config.PAGE_FETCH_MAX_CONCURRENCY,
+                cache_ttl_seconds=Config.PAGE_CACHE_TTL_SECONDS,
+            )
+    return _page_fetcher
@@ -0,0 +1,197 @@
+"""
+Passage-level re-ranking of research evidence for the synthesis prompt.
+"""
+import re
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from config import Config
+from utils.embeddings import embed_texts
+
+_SOURCE_LINE = re.compile(r"^Source: (https?://\S+|\[S\d+\])", re.MULTILINE)
+
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    """Splits text on paragraph, then sentence boundaries into chunks of at most max_chars."""
+    if len(text) <= max_chars:
+        return [text]
+    units = []
+    for para in re.split(r"\n\s*\n", text):
+        if len(para) <= max_chars:
+            units.append(para)
+        else:
+            units.extend(re.split(r"(?<=[.!?])\s+", para))
+
+    chunks, current = [], ""
+    for unit in units:
+        unit = unit.strip()
+        if not unit:
+            continue
+        if current and len(current) + len(unit) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{unit}" if current else unit[:max_chars]
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_passages(research_data: List[dict], max_chars: int = 800) -> List[dict]:
+    """
+    Splits research_data entries into passages. Each search result becomes one or
+    more passages; the result's 'Source: <url or [ID]>' line is repeated on every chunk so
+    citations survive re-ordering.
+    """
+    passages = []
+    for item_index, item in enumerate(research_data):
+        content = item.get("content", "")
+        for result in content.split("\n---\n"):
+            result = result.strip()
+            if not result:
+                continue
+            source_match = _SOURCE_LINE.search(result)
+            chunks = _split_long(result, max_chars)
+            for chunk in chunks:
+                if source_match and source_match.group(1) not in chunk:
+                    chunk = f"{chunk}\nSource: {source_match.group(1)}"
+                passages.append({
+                    "text": chunk,
+                    "item_index": item_index,
+                    "source": item.get("source", "Unknown"),
+                    "order": len(passages),
+                })
+    return passages
+
+
+def _lexical_scores(targets: List[str], texts: List[str]) -> np.ndarray:
+    """Term-overlap fallback when the embedding model is unavailable."""
+    def terms(t):
+        return set(re.findall(r"\w{3,}", t.lower()))
+    target_terms = [terms(t) for t in targets]
+    scores = np.zeros((len(texts), len(targets)), dtype=np.float32)
+    for i, text in enumerate(texts):
+        words = terms(text)
+        for j, target in enumerate(target_terms):
+            if target:
+                scores[i, j] = len(words & target) / len(target)
+    return scores
+
+
+class PassageRanker:
+    """
+    Scores passages against the query and outstanding gaps with fastembed
+    embeddings, optionally re-ranks the best candidates with a local
+    cross-encoder, and packs the winners into a character budget.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], np.ndarray] = embed_texts,
+        cross_encoder_model: Optional[str] = None,
+        gap_weight: float = 0.5,
+        rerank_candidates: int = 30,
+    ):
+        self.embed_fn = embed_fn
+        self.cross_encoder_model = cross_encoder_model
+        self.gap_weight = gap_weight
+        self.rerank_candidates = rerank_candidates
+        self._cross_encoder = None
+        self._lock = threading.Lock()
+
+    def _similarities(self, targets: List[str], texts: List[str]) -> np.ndarray:
+        try:
+            vectors = self.embed_fn(targets + texts)
+            return vectors[len(targets):] @ vectors[:len(targets)].T
+        except Exception as e:
+            print(f"⚠️ Passage embedding failed, using term overlap: {e}")
+            return _lexical_scores(targets, texts)
+
+    def _cross_encode(self, query: str, texts: List[str]) -> Optional[List[float]]:
+        try:
+            with self._lock:
+                if self._cross_encoder is None:
+                    from fastembed.rerank.cross_encoder import TextCrossEncoder
+                    self._cross_encoder = TextCrossEncoder(model_name=self.cross_encoder_model)
+            return list(self._cross_encoder.rerank(query, texts))
+        except Exception as e:
+            print(f"⚠️ Cross-encoder re-rank skipped: {e}")
+            return None
+
+    def rank(self, query: str, gaps: List[str], passages: List[dict]) -> List[dict]:
+        """Returns passages sorted best-first, each with a 'score'."""
+        if not passages:
+            return []
+        targets = [query] + [g for g in gaps if g]
+        sims = self._similarities(targets, [p["text"] for p in passages])
+        scores = sims[:, 0].copy()
+        if sims.shape[1] > 1:
+            scores += self.gap_weight * sims[:, 1:].max(axis=1)
+
+        ranked = [dict(p, score=float(s)) for p, s in zip(passages, scores)]
+        ranked.sort(key=lambda p: p["score"], reverse=True)
+
+        if self.cross_encoder_model:
+            head = ranked[:self.rerank_candidates]
+            ce_scores = self._cross_encode(query, [p["text"] for p in head])
+            if ce_scores is not None:
+                for p, s in zip(head, ce_scores):
+                    p["score"] = float(s)
+                head.sort(key=lambda p: p["score"], reverse=True)
+                ranked = head + ranked[self.rerank_candidates:]
+        return ranked
+
+    @staticmethod
+    def pack(ranked: List[dict], budget_chars: int) -> List[dict]:
+        """
+        Greedily keeps the best passages that fit the budget, then restores document
+        order so passages from the same source stay together.
+        """
+        kept, used = [], 0
+        for p in ranked:
+            cost = len(p["text"]) + 2
+            if used + cost > budget_chars:
+                continue
+            kept.append(p)
+            used += cost
+        kept.sort(key=lambda p: p["order"])
+        return kept
+
+
+def build_ranked_context(research_data: List[dict], query: str, gaps: List[str], budget_chars: int,
+                         ranker: Optional["PassageRanker"] = None) -> str:
+    """
+    Splits, ranks and packs research_data into a context string of at most
+    budget_chars, grouped under the same '[Source N: ...]' headers as before.
+    """
+    ranker = ranker or get_passage_ranker()
+    passages = split_passages(research_data, Config.PASSAGE_MAX_CHARS)
+    # Reserve room for the per-source headers so the result stays within budget
+    header_chars = sum(len(f"[Source {i + 1}: {d.get('source', 'Unknown')}]") + 2 for i, d in enumerate(research_data))
+    kept = ranker.pack(ranker.rank(query, gaps, passages), budget_chars - min(header_chars, budget_chars // 4))
+
+    print(f"DEBUG [passage_rank]: Packed {len(kept)}/{len(passages)} passages "
+          f"({sum(len(p['text']) for p in kept)} chars, budget {budget_chars})")
+
+    sections = []
+    current_item = None
+    for p in kept:
+        if p["item_index"] != current_item:
+            current_item = p["item_index"]
+            sections.append(f"[Source {current_item + 1}: {p['source']}]")
+        sections.append(p["text"])
+    return "\n\n".join(sections)
+
+
+_passage_ranker = None
+
+def get_passage_ranker() -> PassageRanker:
+    """Get or create the shared passage ranker."""
+    global _passage_ranker
+    if _passage_ranker is None:
+        _passage_ranker = PassageRanker(
+            cross_encoder_model=Config.PASSAGE_CROSS_ENCODER_MODEL,
+            gap_weight=Config.PASSAGE_GAP_WEIGHT,
+        )
+    return _passage_ranker
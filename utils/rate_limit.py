@@ -0,0 +1,137 @@
+"""
+Process-wide token-bucket rate limiting for search providers.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from config import Config
+
+
+class RateLimitTimeout(RuntimeError):
+    """Raised when a caller waited longer than the limiter's max wait."""
+
+
+class TokenBucket:
+    """
+    Token bucket with a sustained refill rate and a burst capacity.
+    Waiters queue per caller (e.g. a conversation thread) and the caller queues
+    are served round-robin, one token per turn, so one session's fan-out cannot
+    starve searches from other sessions. Calls without a caller each queue alone,
+    which serves them first-come first-served.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int, max_wait_seconds: Optional[float] = None,
+                 window: int = 500):
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self.max_wait_seconds = max_wait_seconds
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._cond = threading.Condition()
+        self._queues: "OrderedDict[object, deque]" = OrderedDict()  # caller -> tickets, in serving order
+        self._next_ticket = 0
+        # Metrics
+        self.acquired = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.waits = deque(maxlen=window)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def _head(self) -> int:
+        """Ticket served next: the oldest of the caller whose turn it is."""
+        return next(iter(self._queues.values()))[0]
+
+    def acquire(self, caller: Optional[str] = None) -> float:
+        """Block until a token is available; returns the time spent queued."""
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            key = caller if caller is not None else ("anonymous", ticket)
+            self._queues.setdefault(key, deque()).append(ticket)
+            served = False
+            try:
+                while True:
+                    self._refill()
+                    if self._head() == ticket and self.tokens >= 1:
+                        self.tokens -= 1
+                        served = True
+                        break
+                    waited = time.monotonic() - start
+                    if self.max_wait_seconds is not None and waited >= self.max_wait_seconds:
+                        self.timeouts += 1
+                        raise RateLimitTimeout(f"Rate limit wait exceeded {self.max_wait_seconds}s")
+                    # Head of the queue sleeps until the next token; others wait to be notified
+                    timeout = (1 - self.tokens) / self.rate if self._head() == ticket else None
+                    if self.max_wait_seconds is not None:
+                        remaining = self.max_wait_seconds - waited
+                        timeout = remaining if timeout is None else min(timeout, remaining)
+                    self._cond.wait(timeout=timeout)
+            finally:
+                queue = self._queues[key]
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[key]
+                elif served:
+                    self._queues.move_to_end(key)  # The caller's next waiter goes behind the others
+                self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            self.acquired += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.waits.append(waited)
+        return waited
+
+    def _percentile(self, samples, pct):
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+    def stats(self) -> dict:
+        """Queue depth and queue-wait metrics."""
+        with self._cond:
+            samples = sorted(self.waits)
+            return {
+                "rate_per_second": self.rate,
+                "burst": self.capacity,
+                "queue_depth": sum(len(q) for q in self._queues.values()),
+                "waiting_callers": len(self._queues),
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+                "p50_wait": self._percentile(samples, 50),
+                "p95_wait": self._percentile(samples, 95),
+                "max_wait": self.max_wait,
+            }
+
+
+# One bucket per provider, shared by every thread in the process
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+def get_rate_limiter(provider: str) -> TokenBucket:
+    """Get or create the token bucket for a search provider."""
+    with _buckets_lock:
+        if provider not in _buckets:
+            limits = Config.SEARCH_RATE_LIMITS.get(provider, Config.SEARCH_RATE_LIMIT_DEFAULT)
+            _buckets[provider] = TokenBucket(
+                rate_per_second=limits["rate_per_second"],
+                burst=limits["burst"],
+                max_wait_seconds=Config.SEARCH_RATE_LIMIT_MAX_WAIT_SECONDS,
+            )
+        return _buckets[provider]
+
+
+def rate_limit_stats() -> dict:
+    """Metrics for every provider bucket created so far."""
+    with _buckets_lock:
+        buckets = dict(_buckets)
+    return {name: bucket.stats() for name, bucket in buckets.items()}
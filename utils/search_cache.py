@@ -0,0 +1,150 @@
+"""
+Persistent SQLite cache for web search results.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import List, Optional
+
+from config import Config
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a search query: case, spacing and most punctuation removed.
+    Characters that change meaning in tech names (C++, C#, .NET, node.js) are kept.
+    """
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = re.sub(r"[^\w\s+#./-]", " ", text)
+    text = re.sub(r"(?<!\w)[./-]+|[./-]+(?!\w)", " ", text)
+    return " ".join(text.split())
+
+
+class SearchCache:
+    """Thread-safe search result cache with per-entry TTL and LRU eviction."""
+
+    def __init__(self, db_path: str, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_cache (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                query TEXT NOT NULL,
+                results TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_search_cache_access ON search_cache(last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(query: str, provider: str) -> str:
+        """Cache key from provider and normalized query."""
+        raw = f"{provider}\x00{normalize_query(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, query: str, provider: str) -> Optional[List[dict]]:
+        """Return cached results if a fresh entry exists, otherwise None."""
+        key = self.make_key(query, provider)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, expires_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE search_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, query: str, provider: str, results: List[dict], ttl_seconds: Optional[int] = None):
+        """Store results for a query, evicting least recently used entries past max_entries."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO search_cache
+                    (key, provider, query, results, created_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    self.make_key(query, provider),
+                    provider,
+                    normalize_query(query),
+                    json.dumps(results),
+                    now,
+                    now + ttl,
+                    now,
+                ),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM search_cache WHERE key IN (
+                    SELECT key FROM search_cache
+                    ORDER BY last_access DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current entry count."""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": size,
+        }
+
+
+# Process-wide cache shared by all graph runs
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+def get_search_cache() -> SearchCache:
+    """Get or create the shared search cache."""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache(
+                Config.SEARCH_CACHE_PATH,
+                ttl_seconds=Config.SEARCH_CACHE_TTL_SECONDS,
+                max_entries=Config.SEARCH_CACHE_MAX_ENTRIES,
+            )
+    return _search_cache
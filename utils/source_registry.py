@@ -0,0 +1,89 @@
+"""
+Registry of the sources found during deep research: one compact ID (S1, S2, ...)
+per canonical URL or local corpus file, kept across iterations in the state. The LLM cites the IDs
+and the Evidence Trace is rendered from the registry instead of by the LLM.
+"""
+import re
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from utils.evidence_dedup import canonicalize_url
+
+CITATION = re.compile(r"\[(S\d+)\]")
+_TRACE_SECTION = re.compile(r"^#{1,3}\s*Evidence Trace\b.*?(?=^#{1,3}\s|\Z)", re.MULTILINE | re.DOTALL)
+
+
+def _domain(url: str) -> str:
+    if url.startswith("file://"):
+        return "local corpus"
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class SourceRegistry:
+    """
+    Deduplicated sources as {"id", "url", "canonical_url", "title", "domain"};
+    built from (and saved back to) the state's `source_registry` list.
+    """
+
+    def __init__(self, entries: Optional[List[dict]] = None):
+        self.entries = [dict(e) for e in entries or []]
+        self._by_canonical = {e["canonical_url"]: e for e in self.entries}
+        self._by_id = {e["id"]: e for e in self.entries}
+
+    def add(self, url: str, title: str = "") -> Optional[str]:
+        """
+        Registers a URL (once per canonical form) and returns its ID. Local
+        corpus files (file://) are registered by path; None for other sources.
+        """
+        if not url or not url.startswith(("http://", "https://", "file://")):
+            return None
+        canonical = url if url.startswith("file://") else canonicalize_url(url)
+        entry = self._by_canonical.get(canonical)
+        if entry is None:
+            entry = {
+                "id": f"S{len(self.entries) + 1}",
+                "url": url,
+                "canonical_url": canonical,
+                "title": (title or "").strip() or _domain(url),
+                "domain": _domain(url),
+            }
+            self.entries.append(entry)
+            self._by_canonical[canonical] = entry
+            self._by_id[entry["id"]] = entry
+        elif title and entry["title"] == entry["domain"]:
+            entry["title"] = title.strip()  # A later result may carry the real page title
+        return entry["id"]
+
+    def get(self, source_id: str) -> Optional[dict]:
+        return self._by_id.get(source_id)
+
+    def cited_ids(self, text: str) -> List[str]:
+        """Registered IDs cited in the text, in order of first citation."""
+        return list(dict.fromkeys(sid for sid in CITATION.findall(text) if sid in self._by_id))
+
+    def link_citations(self, text: str) -> str:
+        """Turns each [S3] citation of a registered source into a link to its URL."""
+        def link(match):
+            entry = self._by_id.get(match.group(1))
+            return f"[[{entry['id']}]]({entry['url']})" if entry else match.group(0)
+        return CITATION.sub(link, text)
+
+    def render_trace(self, ids: Optional[Iterable[str]] = None) -> str:
+        """Markdown Evidence Trace for the given IDs (default: every source)."""
+        entries = [self._by_id[i] for i in ids if i in self._by_id] if ids is not None else self.entries
+        lines = ["# Evidence Trace"]
+        lines += [f"- **[{e['id']}]** [{e['title']}]({e['url']}) — {e['domain']}" for e in entries]
+        if len(lines) == 1:
+            lines.append("- LLM Knowledge Base (no URL available)")
+        return "\n".join(lines)
+
+    def finalize_report(self, report: str) -> str:
+        """
+        Replaces any Evidence Trace the LLM wrote with one rendered from the
+        registry (cited sources in citation order, or all if none were cited)
+        and links the inline citations.
+        """
+        body = _TRACE_SECTION.sub("", report).rstrip()
+        cited = self.cited_ids(body)
+        return self.link_citations(body) + "\n\n" + self.render_trace(cited or None)
@@ -0,0 +1,87 @@
+"""
+Incremental parser for a JSON object streamed by an LLM: reads top-level
+fields as soon as each value is complete, skipping any prose or code fence
+around the object.
+"""
+import json
+from typing import Any, Dict
+
+
+class IncrementalJSONObject:
+    """
+    Feed text chunks with feed(); `fields` holds every top-level key whose value
+    has been fully received, and `done` turns True at the object's closing brace.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._buffer = []      # Text of the current top-level key or value
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._key = None
+        self._started = False
+
+    def feed(self, text: str) -> Dict[str, Any]:
+        """Consumes a chunk and returns the fields completed so far."""
+        for char in text:
+            if self.done:
+                break
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+            self._consume(char)
+        return self.fields
+
+    def _consume(self, char: str):
+        if self._in_string:
+            self._buffer.append(char)
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 1 and self._key is not None:
+                    self._end_value()  # A string value is complete at its closing quote
+            return
+
+        if char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+
+        if self._depth == 0:
+            self._end_value()
+            self.done = True
+        elif self._depth == 1 and char == ":" and self._key is None:
+            self._key = self._decode("".join(self._buffer))
+            self._buffer = []
+        elif self._depth == 1 and char == ",":
+            self._end_value()
+        else:
+            self._buffer.append(char)
+            if self._depth == 1 and char in "}]":
+                self._end_value()  # A nested object/array is complete at its closing bracket
+
+    def _end_value(self):
+        text = "".join(self._buffer).strip()
+        if self._key is not None and text:
+            try:
+                self.fields[self._key] = json.loads(text)
+            except ValueError:
+                pass  # Malformed value; the caller falls back to the raw text
+        self._key = None
+        self._buffer = []
+
+    @staticmethod
+    def _decode(text: str):
+        try:
+            return json.loads(text.strip())
+        except ValueError:
+            return text.strip().strip('"')
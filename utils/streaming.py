@@ -37,6 +37,45 @@ class StreamingBuffer:
         return self.full_content
 
 
+class OrderedSectionWriter:
+    """
+    Streams sections that are generated concurrently into one buffer in
+    document order: the first unfinished section streams live, later ones are
+    held back and flushed as soon as every section before them is done.
+    """
+
+    def __init__(self, buffer: Optional[StreamingBuffer], count: int, separator: str = "\n\n"):
+        self.buffer = buffer
+        self.separator = separator
+        self.sections = [""] * count
+        self._pending = [[] for _ in range(count)]
+        self._done = [False] * count
+        self._head = 0
+        self._lock = threading.Lock()
+
+    def _write(self, chunk: str):
+        if self.buffer and chunk:
+            self.buffer.add_chunk(chunk)
+
+    def add_chunk(self, index: int, chunk: str):
+        with self._lock:
+            self.sections[index] += chunk
+            if index == self._head:
+                self._write(chunk)
+            else:
+                self._pending[index].append(chunk)
+
+    def finish(self, index: int):
+        """Marks a section complete and flushes every section that is now at the head."""
+        with self._lock:
+            self._done[index] = True
+            while self._head < len(self.sections) and self._done[self._head]:
+                self._head += 1
+                if self._head < len(self.sections):
+                    self._write(self.separator + "".join(self._pending[self._head]))
+                    self._pending[self._head] = []
+
+
 # Global streaming buffer (shared across nodes and Streamlit)
 _streaming_buffers = {}
 
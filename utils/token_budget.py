@@ -0,0 +1,99 @@
+"""
+Token accounting for LLM calls and enforcement of the per-run token budget.
+"""
+import threading
+from typing import List, Tuple
+
+from config import Config
+from utils.evidence_dedup import estimate_tokens
+
+CHARS_PER_TOKEN = 4  # Used to turn a token allowance into a prompt character budget
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """Opt-in tiktoken encoding (TOKENIZER_ENCODING) if installed and loadable, otherwise None (tried once)."""
+    global _encoding, _encoding_failed
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed and Config.TOKENIZER_ENCODING:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(Config.TOKENIZER_ENCODING)
+            except Exception as e:
+                print(f"⚠️ Local tokenizer unavailable, estimating tokens from length: {e}")
+                _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Length-based token estimate, or the count from the opt-in local tokenizer."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List) -> int:
+    """Prompt tokens of a chat message list (content plus a few tokens of framing each)."""
+    return sum(count_tokens(m.content if isinstance(m.content, str) else str(m.content)) + 4 for m in messages)
+
+
+def call_usage(messages: List, response) -> Tuple[int, int]:
+    """
+    (prompt_tokens, completion_tokens) of one LLM call: Ollama's usage metadata
+    when present, the local tokenizer otherwise. Cache hits cost nothing.
+    """
+    if response is None or getattr(response, "response_metadata", {}).get("cache"):
+        return 0, 0
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    return count_message_tokens(messages), count_tokens(response.content)
+
+
+def record_usage(state: dict, node: str, prompt_tokens: int, completion_tokens: int) -> dict:
+    """State update adding one call's tokens to the run total and to the node's entry."""
+    by_node = dict(state.get("token_usage_by_node") or {})
+    entry = dict(by_node.get(node, {"prompt": 0, "completion": 0, "calls": 0}))
+    entry["prompt"] += prompt_tokens
+    entry["completion"] += completion_tokens
+    entry["calls"] += 1
+    by_node[node] = entry
+    return {
+        "token_usage": state.get("token_usage", 0) + prompt_tokens + completion_tokens,
+        "token_usage_by_node": by_node,
+    }
+
+
+def record_calls(state: dict, node: str, usages: List[Tuple[int, int]]) -> dict:
+    """record_usage for several calls of one node (e.g. a small model, then the escalation)."""
+    update = {}
+    for prompt_tokens, completion_tokens in usages:
+        update = record_usage({**state, **update}, node, prompt_tokens, completion_tokens)
+    return update
+
+
+def remaining_budget(state: dict) -> int:
+    """Tokens left in this run's budget (budget_limit, or MAX_TOKENS_PER_QUERY)."""
+    limit = state.get("budget_limit") or Config.MAX_TOKENS_PER_QUERY
+    return limit - state.get("token_usage", 0)
+
+
+def budget_exhausted(state: dict, reserve: int = 0) -> bool:
+    """True once fewer than `reserve` tokens remain."""
+    return remaining_budget(state) < reserve
+
+
+def completion_cap(state: dict, prompt_tokens: int) -> int:
+    """
+    num_predict for a call: the tokens left after the prompt, bounded by
+    COMPLETION_TOKEN_CAP and floored at MIN_COMPLETION_TOKENS. Rounded down to a
+    multiple of 256 so few distinct client configurations are created.
+    """
+    headroom = min(Config.COMPLETION_TOKEN_CAP, remaining_budget(state) - prompt_tokens)
+    return max(Config.MIN_COMPLETION_TOKENS, headroom // 256 * 256)